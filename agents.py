@@ -1,38 +1,360 @@
 from model import *
-import random
+from events import PrintSink, NULL_SINK
+from belief import BeliefState
+from profiling import NULL_PROFILER
 import math
 
 
-def simulate_game(player1_name, player2_name, probability_method, starting_num_dice=5, verbose = True):
+AGENTS = {} #keys are agent names, values are agent classes (see `register_agent`)
+
+
+def register_agent(name):
+    """
+    name: str the agent is made by in `make_agent`
+
+    Return class decorator adding the agent class to AGENTS
+    """
+    def decorator(agent_class):
+        AGENTS[name] = agent_class
+        return agent_class
+    return decorator
+
+
+def make_agent(name, *args, **kwargs):
+    """
+    name: str of a registered agent (e.g. "heuristic", or "cfr" once cfr.py is imported)
+
+    Return a new agent of class AGENTS[name] initalized with `args` and `kwargs`
+    """
+    if name not in AGENTS:
+        raise NameError(f"Unknown agent. You chose {name}, registered agents are {sorted(AGENTS)}.")
+    return AGENTS[name](*args, **kwargs)
+
+
+class DecisionState:
+    __slots__ = ("hand", "last_bid", "rng", "belief")
+
+    def __init__(self, hand, last_bid, rng=None, belief=None):
+        """
+        hand: LiarsDiceHand of the deciding player (holds their dice, the opponent's number of dice and their challenge threshold)
+        last_bid: Bid object of the last bid of the round (the bid to raise or challenge). None if no bid has been made
+        rng: numpy Generator of the deciding player's random choices. None if the player makes none (agents that draw raise ValueError)
+        belief: BeliefState of the deciding player over the opponent's hand, updated with every opponent bid this round. None if not tracked
+
+        Initalize everything a player knows when deciding
+        """
+        self.hand = hand
+        self.last_bid = last_bid
+        self.rng = rng
+        self.belief = belief
+
+
+class DecisionBatch:
+    __slots__ = ("counts", "num_dice", "opponent_num_dice", "last_quantity", "last_value", "challenge_threshold", "rules", "bluff_model")
+
+    def __init__(self, counts, opponent_num_dice, last_quantity, last_value, challenge_threshold=0.51, rules=STANDARD_RULES, bluff_model=DEFAULT_BLUFF_MODEL):
+        """
+        counts: (K, 6) int array of the quantity of 1,2,..,6 in each deciding player's hand
+        opponent_num_dice: (K,) int array of each opponent's number of dice
+        last_quantity: (K,) int array of the quantity of the last bid
+        last_value: (K,) int array of the value of the last bid. 0 if no bid has been made
+        challenge_threshold: float or (K,) float array of each deciding player's challenge threshold
+        rules: Rules every decision is made under
+        bluff_model: BluffModel of every deciding player (see bluff.py)
+
+        Initalize K decision states held as arrays
+        """
+        self.counts = np.asarray(counts)
+        self.num_dice = self.counts.sum(axis=1)
+        self.opponent_num_dice = np.asarray(opponent_num_dice)
+        self.last_quantity = np.asarray(last_quantity)
+        self.last_value = np.asarray(last_value)
+        self.challenge_threshold = np.broadcast_to(np.asarray(challenge_threshold, dtype=float), self.num_dice.shape)
+        self.rules = rules
+        self.bluff_model = bluff_model
+
+    @classmethod
+    def from_states(cls, states):
+        """
+        states: list of DecisionState objects (played under the same rules, by players with the same bluff model)
+
+        Return DecisionBatch of `states`
+        """
+        counts = np.array([state.hand.counts for state in states], dtype=np.int8).reshape(len(states), 6)
+        last_bids = [(0, 0) if state.last_bid is None else (state.last_bid.bid_quantity, state.last_bid.bid_value) for state in states]
+        last_quantity, last_value = np.array(last_bids, dtype=np.int64).reshape(len(states), 2).T
+        rules, bluff_model = (states[0].hand.rules, states[0].hand.bluff_model) if states else (STANDARD_RULES, DEFAULT_BLUFF_MODEL)
+        return cls(counts, [state.hand.opponent_num_dice for state in states], last_quantity, last_value,
+                   [state.hand.user_challenge_threshold for state in states], rules, bluff_model)
+
+    def state(self, index, rng=None):
+        """
+        index: int of the decision
+        rng: numpy Generator of the deciding player's random choices
+
+        Return DecisionState of decision `index`
+        """
+        hand = LiarsDiceHand("", self.counts[index], int(self.opponent_num_dice[index]), float(self.challenge_threshold[index]), rules=self.rules,
+                             bluff_model=self.bluff_model)
+        last_bid = None if self.last_value[index] == 0 else Bid(int(self.last_quantity[index]), int(self.last_value[index]))
+        return DecisionState(hand, last_bid, rng)
+
+    def __len__(self):
+        return len(self.num_dice)
+
+
+class Agent:
+    """
+    Decision maker of one player. Subclasses implement `bid` and `challenge`, and can override `bid_batch` and `challenge_batch`
+    with vectorized versions so simulators can make many decisions in one call
+    """
+    def bid(self, state):
+        """
+        state: DecisionState of the bidding player
+
+        Return Bid object raising `state.last_bid`
+        """
+        raise NotImplementedError
+
+    def challenge(self, state):
+        """
+        state: DecisionState of the observing player, `state.last_bid` is the opponent's bid
+
+        Return boolean, does the player challenge `state.last_bid`
+        """
+        raise NotImplementedError
+
+    def bid_batch(self, batch, rng=None):
+        """
+        batch: DecisionBatch of the bidding players
+        rng: numpy Generator of every player's random choices, passed to each state when deciding one state at a time
+
+        Return tuple of (K,) int arrays (bid quantities, bid values)
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        bids = [self.bid(batch.state(index, rng)) for index in range(len(batch))]
+        return (np.array([bid.bid_quantity for bid in bids], dtype=np.int64), np.array([bid.bid_value for bid in bids], dtype=np.int64))
+
+    def challenge_batch(self, batch, rng=None):
+        """
+        batch: DecisionBatch of the observing players
+        rng: numpy Generator of every player's random choices, passed to each state when deciding one state at a time
+
+        Return (K,) boolean array, does each player challenge their last bid
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        return np.array([self.challenge(batch.state(index, rng)) for index in range(len(batch))], dtype=bool)
+
+
+# memoized in the "probability_correct_tables" LRU cache (see cache.py), keys are
+# (probability method, max dice, opponent bluff scale, opponent bluff exponent)
+@memoize("probability_correct_tables", key=lambda probability_method, max_dice=MAX_DICE, bluff_model=DEFAULT_BLUFF_MODEL: (
+    probability_method, max_dice, bluff_model.opponent_scale, bluff_model.opponent_exponent), maxsize=16, persistent=False)
+def probability_correct_table(probability_method, max_dice=MAX_DICE, bluff_model=DEFAULT_BLUFF_MODEL):
+    """
+    probability_method: str. "truthful" or "conditional"
+    max_dice: int of the largest number of dice per player
+    bluff_model: BluffModel of the observer, the conditional probabilities use its expected opponent bluff probability
+
+    Return (max_dice + 1, max_dice + 1, max_dice + 1, 2 * max_dice + 2) array where entry [k, n, m, q] is the observer's probability
+    that a bid of quantity q is correct when they hold k dice of the bid value out of n dice and the opponent has m dice.
+    Both probabilities only depend on the bid value through k (conditional with the observer's expected opponent bluff probability)
+    """
+    table = np.zeros((max_dice + 1, max_dice + 1, max_dice + 1, 2 * max_dice + 2))
+    for user_num_dice in range(1, max_dice + 1):
+        for opponent_num_dice in range(1, max_dice + 1):
+            for value_count in range(user_num_dice + 1):
+                # k dice of value 1 (the bid value), the rest of value 2
+                hand = LiarsDiceHand("", [value_count, user_num_dice - value_count, 0, 0, 0, 0], opponent_num_dice, bluff_model=bluff_model)
+                for bid_quantity in range(1, user_num_dice + opponent_num_dice + 1):
+                    if probability_method == "truthful":
+                        prob_bid_correct = hand.compute_truthful_probability_correct(Bid(bid_quantity, 1))
+                    else:
+                        prob_bid_correct = hand.compute_conditional_probability_correct(Bid(bid_quantity, 1), hand.expected_opponent_bluff_prob())
+                    table[value_count, user_num_dice, opponent_num_dice, bid_quantity] = prob_bid_correct
+                # bids above every die on the board are never correct (left at 0)
+    return table
+
+
+@register_agent("heuristic")
+class HeuristicAgent(Agent):
+    def __init__(self, probability_method="conditional"):
+        """
+        probability_method: str. "truthful" uses compute_truthful_probability(), "conditional" uses compute_conditional_probability(),
+            "belief" uses the state's BeliefState, which accounts for every opponent bid of the round (see belief.py)
+
+        Initalize the original heuristic player: bids are drawn from `LiarsDiceHand.bid_distribution` and bids are challenged when
+        their probability of being correct is at or below the hand's `user_challenge_threshold` (or when no higher bid exists)
+        """
+        if probability_method not in ("truthful", "conditional", "belief"):
+            raise NameError(f"Incorrect probability method. You chose {probability_method}.")
+        self.probability_method = probability_method
+
+    def probability_correct(self, state):
+        """
+        Return the observer's probability that `state.last_bid` is correct
+        """
+        hand = state.hand
+        if self.probability_method == "truthful":
+            return hand.compute_truthful_probability_correct(state.last_bid)
+        if self.probability_method == "belief":
+            belief = state.belief
+            if belief is None:
+                # untracked round: the belief after the last bid alone
+                belief = BeliefState(hand)
+                belief.update(state.last_bid)
+            return belief.probability_correct(state.last_bid)
+        return hand.compute_conditional_probability_correct(state.last_bid, hand.expected_opponent_bluff_prob())
+
+    def bid(self, state):
+        bid_options = state.hand.bid_distribution(state.last_bid)
+        if len(bid_options) == 1:
+            return bid_options[0][1]
+
+        bid_probs, bids = zip(*bid_options)
+        return weighted_choice(bids, bid_probs, state.rng)
+
+    def challenge(self, state):
+        return self.challenge_given_probability(state, self.probability_correct(state))
+
+    def challenge_given_probability(self, state, prob_bid_correct):
+        """
+        state: DecisionState of the observing player
+        prob_bid_correct: float `probability_correct` of `state`, for callers that already computed it
+
+        Return boolean, does the player challenge `state.last_bid`
+        """
+        if prob_bid_correct <= state.hand.user_challenge_threshold:
+            return True
+        total_dice_on_board = len(state.hand) + state.hand.opponent_num_dice
+        # the player is forced to challenge, because there are no more possible bids
+        return state.hand.rules.is_max_bid(state.last_bid, total_dice_on_board)
+
+    def bid_batch(self, batch, rng=None):
+        """
+        Vectorized `LiarsDiceHand.bid_distribution` followed by a draw from it (see Agent.bid_batch). Standard rules only,
+        other rules decide one state at a time
+        """
+        if batch.rules.wild_ones:
+            return super().bid_batch(batch, rng)
+        rng = np.random.default_rng() if rng is None else rng
+        rows = np.arange(len(batch))
+        counts = batch.counts.astype(np.int64)
+        num_dice = batch.num_dice
+        expected_board = counts + (batch.opponent_num_dice / 6)[:, np.newaxis]
+        last_value_index = np.maximum(batch.last_value - 1, 0)
+        uniform_draws = rng.random(len(batch))
+
+        # opening bid: value drawn proportional to the quantity of each value in the hand
+        opening_value = 1 + np.argmax(np.cumsum(counts, axis=1) > (uniform_draws * num_dice)[:, np.newaxis], axis=1)
+
+        # keep the value if it is 6 or more than the last quantity is expected on the board
+        keep_value = (batch.last_value == 6) | (expected_board[rows, last_value_index] > batch.last_quantity)
+
+        # otherwise the nearest higher value in the hand, or a uniformly random higher value if the hand has none
+        higher = (np.arange(1, 7)[np.newaxis, :] > batch.last_value[:, np.newaxis]) & (counts > 0)
+        has_higher = higher.any(axis=1)
+        nearest_higher_value = 1 + np.argmax(higher, axis=1)
+        random_higher_value = batch.last_value + 1 + np.floor(uniform_draws * (6 - batch.last_value)).astype(np.int64)
+
+        opening = batch.last_value == 0
+        values = np.where(opening, opening_value, np.where(keep_value, batch.last_value, np.where(has_higher, nearest_higher_value, random_higher_value)))
+        min_quantity = np.where(~opening & keep_value, batch.last_quantity + 1, 1)
+
+        value_counts = counts[rows, values - 1]
+        bluff_model = batch.bluff_model
+        # vectorized `BluffModel.bluff_prob`
+        bluff_probs = np.minimum(bluff_model.scale * (1 / num_dice) ** bluff_model.exponent, 1.0)
+        bluff_quantity = bluff_probs * (num_dice - value_counts)
+        quantities = np.maximum(np.round(expected_board[rows, values - 1] + bluff_quantity), min_quantity).astype(np.int64)
+        return quantities, values
+
+    def challenge_batch(self, batch, rng=None):
+        """
+        Vectorized `challenge` reading `probability_correct_table` (see Agent.challenge_batch). Standard rules and the truthful
+        and conditional methods only, otherwise decides one state at a time
+        """
+        if batch.rules.wild_ones or self.probability_method == "belief":
+            return super().challenge_batch(batch, rng)
+        table = probability_correct_table(self.probability_method, bluff_model=batch.bluff_model)
+        rows = np.arange(len(batch))
+        value_counts = batch.counts[rows, batch.last_value - 1]
+        total_dice_on_board = batch.num_dice + batch.opponent_num_dice
+        quantities = np.minimum(batch.last_quantity, table.shape[3] - 1)
+        prob_bid_correct = np.where(batch.last_quantity > total_dice_on_board, 0.0,
+                                    table[value_counts, batch.num_dice, batch.opponent_num_dice, quantities])
+        forced = (batch.last_value == 6) & (batch.last_quantity == total_dice_on_board)
+        return (prob_bid_correct <= batch.challenge_threshold) | forced
+
+
+def simulate_game(player1_name, player2_name, probability_method, starting_num_dice=5, verbose = True, player1_challenge_threshold=0.51, player2_challenge_threshold=0.51, event_sink=None, game_log=None, agents=None, seed=None, common_random_numbers=False, rules=STANDARD_RULES, profiler=None,
+                  player1_bluff_model=DEFAULT_BLUFF_MODEL, player2_bluff_model=DEFAULT_BLUFF_MODEL):
     """
     player1_name: str of player name. This is the starting player in round 1
     player2_name: str of player name
-    probability_method: str. "truthful" uses compute_truthful_probability(), "conditional" uses compute_conditional_probability()
+    probability_method: str. "truthful" uses compute_truthful_probability(), "conditional" uses compute_conditional_probability(),
+        "belief" tracks every opponent bid of the round in a BeliefState
     starting_num_dice: int of number of dice to start game with for each player (default 5)
+    player1_challenge_threshold: float `user_challenge_threshold` of player1
+    player2_challenge_threshold: float `user_challenge_threshold` of player2
+    event_sink: object with an `emit(event, **fields)` method that receives every game event (see events.py). 
+        None prints every event if `verbose` and drops them otherwise
+    game_log: GameLogWriter the finished game is appended to (see game_log.py). None if the game is not logged
+    agents: dictionary of player name to the Agent making that player's decisions (e.g. a trained CFRPolicy, see cfr.py).
+        Other players are HeuristicAgent(probability_method)
+    seed: int or numpy SeedSequence the game's random streams are spawned from. None draws a fresh seed from the operating system
+    common_random_numbers: boolean. If False a seeded game draws dice and decisions from one stream. If True every player has its own
+        dice stream and decision stream, and every roll draws `starting_num_dice` dice, so round r's dice only depend on the seed,
+        r and how many dice each player has left. Games with the same seed then face the same dice whatever the players decide
+    rules: Rules the game is played with (see rules.py), e.g. WILD_ONES_RULES
+    profiler: Profiler timing bid construction, probability evaluation, challenges, rerolls and printing (see profiling.py). None times nothing
+    player1_bluff_model: BluffModel of player1 (see bluff.py)
+    player2_bluff_model: BluffModel of player2
 
     Simulate one full game
     """
+    # Random streams: (player1 dice, player2 dice, player1 decisions, player2 decisions)
+    game_seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    if common_random_numbers:
+        streams = tuple(np.random.default_rng(stream_seed) for stream_seed in game_seed.spawn(4))
+    else:
+        streams = (np.random.default_rng(game_seed),) * 4
+    num_rolled = starting_num_dice if common_random_numbers else None
+
     # Set Up
-    hand1_dict = create_hand(starting_num_dice)
-    hand2_dict = create_hand(starting_num_dice)
+    hand1_dict = create_hand(starting_num_dice, streams[0], num_rolled)
+    hand2_dict = create_hand(starting_num_dice, streams[1], num_rolled)
+
+    hand1 = LiarsDiceHand(player1_name, hand1_dict, len(dice_dict_to_sorted_list(hand2_dict)), player1_challenge_threshold, streams[0], num_rolled, rules, player1_bluff_model)
+    hand2 = LiarsDiceHand(player2_name, hand2_dict, len(dice_dict_to_sorted_list(hand1_dict)), player2_challenge_threshold, streams[1], num_rolled, rules, player2_bluff_model)
+    decision_rngs = {player1_name: streams[2], player2_name: streams[3]}
+
+    if event_sink is None:
+        event_sink = PrintSink() if verbose else NULL_SINK
 
-    hand1 = LiarsDiceHand(player1_name, hand1_dict, len(dice_dict_to_sorted_list(hand2_dict)))
-    hand2 = LiarsDiceHand(player2_name, hand2_dict, len(dice_dict_to_sorted_list(hand1_dict)))
+    if profiler is None:
+        profiler = NULL_PROFILER
 
-    game = LiarsDiceGame(hand1, hand2)
+    game = LiarsDiceGame(hand1, hand2, event_sink, streams[2] if not common_random_numbers else None, profiler)
+    default_agent = HeuristicAgent(probability_method)
+    agents = {player1_name: (agents or {}).get(player1_name, default_agent), player2_name: (agents or {}).get(player2_name, default_agent)}
+    track_beliefs = any(getattr(agent, "probability_method", None) == "belief" for agent in agents.values())
 
     # Game Simulation
     round_number = 1   
 
     while not game.game_over:
-        if verbose:
-            print(f'Round #{round_number}')
-            print(game.access_hand(player1_name))
-            print(game.access_hand(player2_name))
+        if event_sink.enabled:
+            start = perf_counter()
+            event_sink.emit("round_start", round_number=round_number, 
+                            hands={player1_name: game.access_hand(player1_name).user_dice_dict, player2_name: game.access_hand(player2_name).user_dice_dict})
+            if profiler.enabled:
+                profiler.record("events", perf_counter() - start)
         bidder_name = game.turn
 
         # Opening Bid
         previous_bid = None
+        beliefs = {player1_name: BeliefState(game.player1_hand_object), player2_name: BeliefState(game.player2_hand_object)} if track_beliefs else {}
         round_over = False
         while not round_over:
             bidder_name = game.turn
@@ -47,27 +369,31 @@ def simulate_game(player1_name, player2_name, probability_method, starting_num_d
 
             
             #make a bid
-            bid = game.construct_bid(bidder_name, previous_bid) 
+            if profiler.enabled:
+                start = perf_counter()
+            bid = agents[bidder_name].bid(DecisionState(bidder_hand_object, previous_bid, decision_rngs[bidder_name], beliefs.get(bidder_name)))
+            if profiler.enabled:
+                profiler.record("construct_bid", perf_counter() - start)
             game.declare_bid(bidder_name, bid)
 
             #determine if challenge bid
-
-            #compute the probability of a bid being correct
-            if probability_method == "truthful":
-                prob_bid_correct = observer_hand_object.compute_truthful_probability_correct(bid)
-            elif probability_method == "conditional":
-                prob_bid_correct = observer_hand_object.compute_conditional_probability_correct(bid, observer_hand_object.expected_opponent_bluff_prob())
-            else:
-                raise NameError(f"Incorrect probability method. You chose {probability_method}.")
-
-
-            print(f"{observer_name}'s estimated ({probability_method}) probability {bidder_name}'s bid Correct : {round(prob_bid_correct, 3)}")
-            if prob_bid_correct > observer_hand_object.user_challenge_threshold: # bid likely enough to not challenging
-                total_dice_on_board = len(bidder_hand_object) + len(observer_hand_object)
-                if bid.bid_value == 6 and bid.bid_quantity == total_dice_on_board: # the player is forced to challenge, because there are no more possible bids
-                    game.challenge_bid(bid, observer_name)
-                    round_over = True
+            if profiler.enabled:
+                start = perf_counter()
+            if track_beliefs:
+                beliefs[observer_name].update(bid)
+            observer_state = DecisionState(observer_hand_object, bid, decision_rngs[observer_name], beliefs.get(observer_name))
+            observer_agent = agents[observer_name]
+            if event_sink.enabled and isinstance(observer_agent, HeuristicAgent):
+                # the reported probability is the one the challenge is decided with
+                prob_bid_correct = observer_agent.probability_correct(observer_state)
+                event_sink.emit("probability", observer=observer_name, bidder=bidder_name, method=observer_agent.probability_method,
+                                probability=prob_bid_correct)
+                challenges = observer_agent.challenge_given_probability(observer_state, prob_bid_correct)
             else:
+                challenges = observer_agent.challenge(observer_state)
+            if profiler.enabled:
+                profiler.record("probability", perf_counter() - start)
+            if challenges:
                 game.challenge_bid(bid, observer_name)
                 round_over = True
             
@@ -78,6 +404,8 @@ def simulate_game(player1_name, player2_name, probability_method, starting_num_d
 
     if verbose:
         game.get_game_history()
+    if game_log is not None:
+        game_log.write(game)
     return game
 
 
@@ -0,0 +1,156 @@
+from game_state import grow
+from collections.abc import Mapping
+import numpy as np
+
+
+class GroupedStats(Mapping):
+    """
+    Streaming collection of (key, value) observations, e.g. (total dice on the board, number of bids in the round), held in typed
+    arrays that grow on demand. Statistics are computed for every key at once and returned as arrays aligned with `groups()`.
+
+    Reads like the dictionary of lists it replaces: keys are the groups, values are arrays of each group's observations
+    """
+
+    def __init__(self, capacity=1024, key_dtype=np.int64, value_dtype=np.float64):
+        """
+        capacity: int of number of observations to preallocate
+        key_dtype: numpy dtype of the keys
+        value_dtype: numpy dtype of the values
+        """
+        self.group_keys = np.zeros(capacity, dtype=key_dtype)
+        self.group_values = np.zeros(capacity, dtype=value_dtype)
+        self.num_values = 0
+
+    def extend(self, keys, values):
+        """
+        keys: int or array of the key of each value
+        values: float or array of observations
+
+        Add observations. A single key is shared by every value
+        """
+        values = np.atleast_1d(np.asarray(values, dtype=self.group_values.dtype))
+        stop = self.num_values + len(values)
+        self.group_keys = grow(self.group_keys, stop)
+        self.group_values = grow(self.group_values, stop)
+        self.group_keys[self.num_values:stop] = keys
+        self.group_values[self.num_values:stop] = values
+        self.num_values = stop
+
+    def add(self, key, value):
+        self.extend(key, value)
+
+    def update_from_dict(self, dict_):
+        """
+        dict_: dictionary of lists of observations per key
+        """
+        for key, values in dict_.items():
+            self.extend(key, values)
+
+    def merge(self, other):
+        """
+        Add every observation of the GroupedStats `other`
+        """
+        self.extend(other.group_keys[:other.num_values], other.group_values[:other.num_values])
+
+    def grouped(self):
+        """
+        Return (sorted unique keys, index of each observation's key in them)
+        """
+        return np.unique(self.group_keys[:self.num_values], return_inverse=True)
+
+    def groups(self):
+        """
+        Return array of the sorted keys
+        """
+        return np.unique(self.group_keys[:self.num_values])
+
+    def counts(self):
+        """
+        Return array of the number of observations of each key
+        """
+        _, inverse = self.grouped()
+        return np.bincount(inverse)
+
+    def means(self):
+        """
+        Return array of the mean observation of each key
+        """
+        _, inverse = self.grouped()
+        return np.bincount(inverse, weights=self.group_values[:self.num_values]) / np.bincount(inverse)
+
+    def variances(self, ddof=1):
+        """
+        ddof: int delta degrees of freedom (1 is the sample variance)
+
+        Return array of the variance of each key's observations, nan for keys with at most `ddof` observations
+        """
+        _, inverse = self.grouped()
+        values = self.group_values[:self.num_values]
+        counts = np.bincount(inverse)
+        means = np.bincount(inverse, weights=values) / counts
+        squared_deviations = np.bincount(inverse, weights=(values - means[inverse]) ** 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts > ddof, squared_deviations / (counts - ddof), np.nan)
+
+    def sorted_groups(self):
+        """
+        Return (observations sorted by key then value, index of the first observation of each key, number of observations of each key)
+        """
+        _, inverse = self.grouped()
+        values = self.group_values[:self.num_values]
+        sorted_values = values[np.lexsort((values, inverse))]
+        counts = np.bincount(inverse)
+        return sorted_values, np.cumsum(counts) - counts, counts
+
+    def quantiles(self, q):
+        """
+        q: float or array of quantiles in [0, 1]
+
+        Return (G,) or (G, Q) array of each key's quantiles, linearly interpolated like np.quantile
+        """
+        sorted_values, starts, counts = self.sorted_groups()
+        positions = (counts - 1)[:, np.newaxis] * np.atleast_1d(q)[np.newaxis, :]
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.ceil(positions).astype(np.int64)
+        fraction = positions - lower
+        quantiles = (1 - fraction) * sorted_values[starts[:, np.newaxis] + lower] + fraction * sorted_values[starts[:, np.newaxis] + upper]
+        return quantiles[:, 0] if np.ndim(q) == 0 else quantiles
+
+    def bootstrap_ci(self, confidence=0.95, num_resamples=1000, rng=None, max_draws=10**7):
+        """
+        confidence: float confidence level of the intervals
+        num_resamples: int of number of bootstrap resamples per key
+        rng: numpy Generator the resamples are drawn from (default a new unseeded Generator)
+        max_draws: int of the most values drawn at once, resamples are drawn in chunks when there are more
+
+        Return (G, 2) array of each key's percentile bootstrap confidence interval of the mean. Every key is resampled in the same draw:
+        each observation's slot is filled with a random observation of its own key, and slots are summed per key
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        sorted_values, starts, counts = self.sorted_groups()
+        if len(counts) == 0:
+            return np.zeros((0, 2))
+        observation_groups = np.repeat(np.arange(len(counts)), counts)
+        chunk_size = max(1, max_draws // max(len(sorted_values), 1))
+        resampled_means = []
+        for first in range(0, num_resamples, chunk_size):
+            indices = starts[observation_groups] + rng.integers(0, counts[observation_groups], size=(min(chunk_size, num_resamples - first), len(sorted_values)))
+            # observations are sorted by key, so each key's slots are one contiguous run
+            resampled_means.append(np.add.reduceat(sorted_values[indices], starts, axis=1) / counts)
+        tail = (1 - confidence) / 2
+        return np.quantile(np.concatenate(resampled_means), [tail, 1 - tail], axis=0).T
+
+    def __getitem__(self, key):
+        """
+        Return array of the observations of `key`
+        """
+        mask = self.group_keys[:self.num_values] == key
+        if not mask.any():
+            raise KeyError(key)
+        return self.group_values[:self.num_values][mask]
+
+    def __iter__(self):
+        return iter(self.groups().tolist())
+
+    def __len__(self):
+        return len(self.groups())
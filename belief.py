@@ -0,0 +1,61 @@
+from probability import hand_space, bid_likelihoods
+import numpy as np
+
+
+class BeliefState:
+    def __init__(self, hand, s2_expected_bluff_prob=None):
+        """
+        IMPORTANT: `hand` is s1, the observing player
+
+        hand: LiarsDiceHand of the observer
+        s2_expected_bluff_prob: probability that s1 assigned to s2 bluffing (default `hand.expected_opponent_bluff_prob()`)
+
+        Initalize the observer's belief over every hand s2 the opponent can hold in this round: a posterior vector over the
+        opponent's HandSpace starting at the prior p(s2). Each opponent bid multiplies in its likelihood p(b|s2, p(s1)), so
+            p(s2|b_1,..,b_t) is proportional to p(s2) * p(b_1|s2) * .. * p(b_t|s2)
+        Updates and probabilities cost O(H) for H opponent hands. After a single bid the belief gives the same probabilities
+        as `compute_conditional_probability_correct`
+        """
+        self.hand = hand
+        self.s2_expected_bluff_prob = hand.expected_opponent_bluff_prob() if s2_expected_bluff_prob is None else s2_expected_bluff_prob
+        self.space = hand_space(hand.opponent_num_dice)
+        rules = hand.rules
+
+        # quantity of the opponent's dice that count towards each value, (H, 6)
+        self.matching_counts = self.space.counts.astype(np.int64)
+        if rules.wild_ones:
+            self.matching_counts[:, 1:] += self.matching_counts[:, :1]
+        self.observer_matching_counts = np.array([hand.quantity_of_value(value) for value in range(1, 7)])
+        self.match_probs = [rules.match_prob(value) for value in range(1, 7)]
+
+        self.posterior = self.space.probs.copy()
+        self.num_bids = 0
+
+    def update(self, bid):
+        """
+        bid: Bid object made by the opponent
+
+        Multiply the bid's likelihood into the posterior. A bid no opponent hand would make under the model leaves the belief unchanged
+        """
+        value_likelihoods = bid_likelihoods(bid.bid_quantity, self.hand.opponent_num_dice, len(self.hand), self.s2_expected_bluff_prob,
+                                            self.match_probs[bid.bid_value - 1])
+        posterior = self.posterior * value_likelihoods[self.matching_counts[:, bid.bid_value - 1]]
+        total = posterior.sum()
+        if total > 0:
+            self.posterior = posterior / total
+            self.num_bids += 1
+
+    def probability_correct(self, bid):
+        """
+        bid: Bid object
+
+        Return the observer's probability that `bid` is correct under the current belief
+        """
+        board_quantities = self.matching_counts[:, bid.bid_value - 1] + self.observer_matching_counts[bid.bid_value - 1]
+        return float(self.posterior[board_quantities >= bid.bid_quantity].sum() / self.posterior.sum())
+
+    def expected_opponent_quantities(self):
+        """
+        Return (6,) array of the expected quantity of the opponent's dice counting towards each value under the current belief
+        """
+        return self.posterior @ self.matching_counts / self.posterior.sum()
@@ -0,0 +1,191 @@
+from model import Bid, LiarsDiceGame, LiarsDiceHand, all_possible_toy_hand_objects, clear_conditional_tables, create_hand
+from agents import simulate_game
+from parse import parse_game
+from cache import clear_caches
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import numpy as np
+
+
+benchmark_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Benchmarks')
+baseline_path = os.path.join(benchmark_folder, 'baseline.json')
+results_path = os.path.join(benchmark_folder, 'results.json')
+human_data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'HumanData', '30OrganizedData.csv')
+
+BENCHMARKS = {} #keys are benchmark names, values are setup functions (see `register_benchmark`)
+
+def register_benchmark(name):
+    """
+    Return decorator registering a setup function under `name`. The setup function takes no arguments and returns
+    (function, number of calls) where `function` runs the timed work once and makes that many calls to the code under test
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def bench_hands(max_dice):
+    """
+    Return list of (hand, bids) of every hand with up to `max_dice` dice against every opponent hand size, along with every bid on the board
+    """
+    hands_bids = []
+    for user_num_dice in range(1, max_dice + 1):
+        for opponent_num_dice in range(1, max_dice + 1):
+            bids = [Bid(quantity, value) for quantity in range(1, user_num_dice + opponent_num_dice + 1) for value in range(1, 7)]
+            for hand in all_possible_toy_hand_objects(user_num_dice, opponent_num_dice):
+                hands_bids.append((hand, bids))
+    return hands_bids
+
+@register_benchmark("conditional_probability_correct")
+def bench_conditional_probability_correct(max_dice=5):
+    hands_bids = bench_hands(max_dice)
+    def run():
+        for hand, bids in hands_bids:
+            bluff_prob = hand.expected_opponent_bluff_prob()
+            for bid in bids:
+                hand.compute_conditional_probability_correct(bid, bluff_prob)
+    return run, sum(len(bids) for _, bids in hands_bids)
+
+@register_benchmark("truthful_probability_correct")
+def bench_truthful_probability_correct(max_dice=5):
+    hands_bids = bench_hands(max_dice)
+    def run():
+        for hand, bids in hands_bids:
+            for bid in bids:
+                hand.compute_truthful_probability_correct(bid)
+    return run, sum(len(bids) for _, bids in hands_bids)
+
+@register_benchmark("construct_bid")
+def bench_construct_bid(num_games=500):
+    rng = np.random.default_rng(0)
+    games = [LiarsDiceGame(LiarsDiceHand("Me", create_hand(5, rng), 5, rng=rng), LiarsDiceHand("Subject", create_hand(5, rng), 5, rng=rng), rng=rng)
+             for _ in range(num_games)]
+    def run():
+        for game in games:
+            previous_bid = None
+            # a few raises per game, alternating players like a round
+            for bidder in ("Me", "Subject", "Me", "Subject"):
+                previous_bid = game.construct_bid(bidder, previous_bid)
+    return run, 4 * num_games
+
+@register_benchmark("simulate_game")
+def bench_simulate_game(num_games=200):
+    def run():
+        for seed in range(num_games):
+            simulate_game("Me", "Subject", "conditional", verbose=False, seed=seed)
+    return run, num_games
+
+@register_benchmark("parse_game")
+def bench_parse_game():
+    def run():
+        parse_game(human_data_path)
+    return run, 1
+
+@register_benchmark("plot_games")
+def bench_plot_games():
+    # imported here, so the other benchmarks don't load the plotting module
+    from human_model_comp import plot_games
+    human_games = parse_game(human_data_path)
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            plot_games(human_games, benchmark_folder, human = True, render = False)
+    return run, len(human_games)
+
+
+def time_benchmark(name, repeat=5):
+    """
+    name: str of a registered benchmark
+    repeat: int of number of timed runs. Every memo and loaded conditional table is cleared before each run, so runs measure cold caches
+
+    Return dictionary of the run times in seconds, the time per call in microseconds of the fastest run (the least sensitive to other
+    load on the machine) and of the median run, and the spread of the runs (slowest over fastest, minus 1)
+    """
+    run, num_calls = BENCHMARKS[name]()
+    times = []
+    for _ in range(repeat):
+        clear_caches()
+        clear_conditional_tables()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    return {"calls": num_calls, "repeat": repeat, "min_s": min(times), "median_s": median, "per_call_us": 1e6 * min(times) / num_calls,
+            "median_per_call_us": 1e6 * median / num_calls, "spread": max(times) / min(times) - 1}
+
+def run_benchmarks(names=None, repeat=5):
+    """
+    names: list of benchmark names to run. None runs every benchmark
+    repeat: int of number of timed runs per benchmark
+
+    Return dictionary of the machine and every benchmark's timings (see `time_benchmark`), ready to be saved as json
+    """
+    names = list(BENCHMARKS) if names is None else names
+    return {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+            "benchmarks": {name: time_benchmark(name, repeat) for name in names}}
+
+def save_results(results, path=results_path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+def load_results(path=baseline_path):
+    """
+    Return dictionary of results saved by `save_results`, None if there is no file
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def compare_results(results, baseline, tolerance=0.5):
+    """
+    results: dictionary returned by `run_benchmarks`
+    baseline: dictionary of stored results to compare against
+    tolerance: float of the smallest allowed slowdown of the median time per call (0.5 allows 50% slower). Whole benchmark runs
+        on a shared machine differ by up to about 1.5x from one run to the next, so smaller tolerances flag noise
+
+    Compare the median time per call of every benchmark. The allowed slowdown is the larger of `tolerance` and the spread of the
+    baseline's or the current repeats, so noisier benchmarks need a larger slowdown to be flagged.
+    Return list of (name, baseline us per call, current us per call, ratio) of every benchmark slower than allowed
+    """
+    regressions = []
+    for name, timings in results["benchmarks"].items():
+        baseline_timings = baseline["benchmarks"].get(name)
+        if baseline_timings is None:
+            continue
+        # baselines saved before medians were stored only have the median run time
+        baseline_us = baseline_timings.get("median_per_call_us", 1e6 * baseline_timings["median_s"] / baseline_timings["calls"])
+        ratio = timings["median_per_call_us"] / baseline_us
+        allowed = max(tolerance, timings["spread"], baseline_timings.get("spread", 0.0))
+        if ratio > 1 + allowed:
+            regressions.append((name, baseline_us, timings["median_per_call_us"], ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    # `python benchmark.py --save-baseline` stores the run as the new baseline
+    results = run_benchmarks()
+    for name, timings in results["benchmarks"].items():
+        print(f"{name}: {timings['median_s']:.3f}s median of {timings['repeat']}, {timings['per_call_us']:.2f}us per call")
+
+    if "--save-baseline" in sys.argv:
+        save_results(results, baseline_path)
+        print(f"saved baseline to {baseline_path}")
+        sys.exit(0)
+
+    save_results(results)
+    baseline = load_results()
+    if baseline is None:
+        print(f"no baseline at {baseline_path}")
+        sys.exit(0)
+    regressions = compare_results(results, baseline)
+    for name, baseline_us, current_us, ratio in regressions:
+        print(f"REGRESSION {name}: {baseline_us:.2f}us -> {current_us:.2f}us per call ({ratio:.2f}x)")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,34 @@
+class BluffModel:
+    def __init__(self, scale=1.0, exponent=2.0, opponent_scale=1.0, opponent_exponent=2.0):
+        """
+        scale, exponent: floats of the player's own bluffing, scale * (1 / player's dice)^exponent per die they don't have of the bid value
+        opponent_scale, opponent_exponent: floats of the bluff probability the player expects from their opponent,
+            opponent_scale * (1 / opponent's dice)^opponent_exponent
+
+        Initalize a player's bluff model. The default is the original (1 / dice)^2 for both. Probabilities are capped at 1
+        """
+        self.scale = scale
+        self.exponent = exponent
+        self.opponent_scale = opponent_scale
+        self.opponent_exponent = opponent_exponent
+
+    def is_default(self):
+        return (self.scale, self.exponent, self.opponent_scale, self.opponent_exponent) == (1.0, 2.0, 1.0, 2.0)
+
+    def bluff_prob(self, num_dice):
+        """
+        Return the probability the player bluffs on each of their `num_dice` dice
+        """
+        return min(self.scale * (1 / num_dice) ** self.exponent, 1.0)
+
+    def expected_opponent_bluff_prob(self, opponent_num_dice):
+        """
+        Return the probability the player assigns to an opponent with `opponent_num_dice` dice bluffing
+        """
+        return min(self.opponent_scale * (1 / opponent_num_dice) ** self.opponent_exponent, 1.0)
+
+    def __repr__(self):
+        return f"BluffModel(scale={self.scale}, exponent={self.exponent}, opponent_scale={self.opponent_scale}, opponent_exponent={self.opponent_exponent})"
+
+
+DEFAULT_BLUFF_MODEL = BluffModel()
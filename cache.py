@@ -0,0 +1,174 @@
+from collections import OrderedDict
+import functools
+import os
+import pickle
+
+
+MISSING = object() #returned by `LRUCache.get` on a miss, since None can be a cached value
+cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Tables', 'memo_cache.pkl')
+
+
+class LRUCache:
+    def __init__(self, name, maxsize=1024, persistent=True):
+        """
+        name: str the cache is registered under
+        maxsize: int of the largest number of entries held. None never evicts
+        persistent: boolean. If True `save_caches` writes the entries to disk (values must be plain data, not hand objects)
+
+        Initalize a bounded memo of a pure function. Once full, every new entry evicts the least recently used one, so a
+        long running process reaches a steady state hit rate without growing its memory
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.persistent = persistent
+        self.entries = OrderedDict() #keys are canonical hashable keys, values are the memoized results
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        """
+        Return the value stored under `key` (marking it most recently used), or MISSING
+        """
+        value = self.entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Store `value` under `key`, evicting the least recently used entries beyond `maxsize`
+        """
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        self.evict()
+
+    def evict(self):
+        if self.maxsize is None:
+            return
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        """
+        maxsize: int of the new largest number of entries. None never evicts
+        """
+        self.maxsize = maxsize
+        self.evict()
+
+    def clear(self):
+        """
+        Drop every entry and reset the statistics
+        """
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        Return dictionary of the cache's size, bound, hits, misses, evictions and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {"size": len(self), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def __repr__(self):
+        return f"LRUCache({self.name!r}, size={len(self)}, maxsize={self.maxsize})"
+
+
+caches = {} #keys are cache names, values are LRUCache objects
+
+def register_cache(name, maxsize=1024, persistent=True):
+    """
+    Return the LRUCache registered under `name`, creating it (see LRUCache) if needed
+    """
+    if name not in caches:
+        caches[name] = LRUCache(name, maxsize, persistent)
+    return caches[name]
+
+def memoize(name, key, maxsize=1024, persistent=True, copy=None):
+    """
+    name: str of the cache (see `register_cache`)
+    key: function of the memoized function's arguments returning its canonical hashable key. Keyword arguments are passed to it by
+        name, so its parameters must be named like the function's
+    maxsize: int LRU bound of the cache
+    persistent: boolean, is the cache written by `save_caches`
+    copy: function applied to cached values before they are returned, for mutable results. None returns them as is
+
+    Return decorator memoizing a pure function (or method) in a registered LRUCache. The cache is the wrapper's `cache` attribute
+    """
+    cache = register_cache(name, maxsize, persistent)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs)
+            value = cache.get(cache_key)
+            if value is MISSING:
+                value = func(*args, **kwargs)
+                cache.put(cache_key, value)
+            return value if copy is None else copy(value)
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+def configure_caches(**maxsizes):
+    """
+    maxsizes: new LRU bound of each named cache, e.g. configure_caches(conditional_bid_prob=4096)
+    """
+    for name, maxsize in maxsizes.items():
+        if name not in caches:
+            raise NameError(f"No cache named {name}. Caches are {sorted(caches)}.")
+        caches[name].resize(maxsize)
+
+def cache_stats():
+    """
+    Return dictionary of `LRUCache.stats` of every registered cache, keyed by name
+    """
+    return {name: cache.stats() for name, cache in caches.items()}
+
+def clear_caches():
+    for cache in caches.values():
+        cache.clear()
+
+def save_caches(path=cache_path):
+    """
+    path: str of the pickle file to write
+
+    Save the entries of every persistent cache, least recently used first
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    entries = {name: list(cache.entries.items()) for name, cache in caches.items() if cache.persistent}
+    with open(path, 'wb') as f:
+        pickle.dump(entries, f)
+
+def warm_caches(path=cache_path):
+    """
+    path: str of a pickle file written by `save_caches`
+
+    Load the saved entries into the registered caches (within their bounds, without counting hits or misses).
+    Return the number of entries inserted that are still held (entries already cached or evicted by the bound are not counted), 0 if there is no file
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb') as f:
+        entries = pickle.load(f)
+    num_loaded = 0
+    for name, items in entries.items():
+        cache = caches.get(name)
+        if cache is None:
+            continue
+        new_keys = [key for key, _ in items if key not in cache]
+        for key, value in items:
+            cache.put(key, value)
+        num_loaded += sum(key in cache for key in new_keys)
+    return num_loaded
@@ -0,0 +1,366 @@
+from model import *
+from agents import Agent, register_agent
+from probability import hand_space
+from multiprocessing import shared_memory
+import math
+import multiprocessing
+import numpy as np
+
+
+def num_bid_ids(total_dice):
+    """
+    Return the number of bids with quantity 1..total_dice and value 1..6
+    """
+    return 6 * total_dice
+
+
+def bid_id(bid_quantity, bid_value, total_dice):
+    """
+    Return the integer id of the bid (bid_quantity, bid_value). Ids are ordered like bids: value major, then quantity,
+    so every bid that can follow bid id b has an id greater than b
+    """
+    return (bid_value - 1) * total_dice + bid_quantity - 1
+
+
+def bid_from_id(bid_id, total_dice):
+    """
+    Return tuple (bid_quantity, bid_value) of integer `bid_id`
+    """
+    return bid_id % total_dice + 1, bid_id // total_dice + 1
+
+
+def infoset_row(hand_index, last_bid_id, total_dice):
+    """
+    hand_index: int row of the acting player's hand in hand_space(own dice)
+    last_bid_id: int id of the bid being responded to. -1 if no bid has been made
+
+    Return the row of the information set in the regret and strategy tables of (own dice, opponent dice).
+    An information set is the acting player's hand and the last bid of the round (the previous bids are forgotten). This is an
+    imperfect recall abstraction: a round's bids are an increasing sequence of bid ids, so keying on the full bid history needs
+    2^(6 * total dice) rows per hand (2^60 at 5 against 5 dice), while the last bid needs 6 * total dice + 1. The legal actions and
+    the payoff of a challenge only depend on the last bid, so only the players' inferences from the earlier bids are lost.
+    CFR's convergence guarantee to a Nash equilibrium does not hold under imperfect recall, so the average policy is a strong
+    heuristic player, not an equilibrium
+    """
+    return hand_index * (num_bid_ids(total_dice) + 1) + last_bid_id + 1
+
+
+def legal_actions(last_bid_id, total_dice):
+    """
+    Return slice of the legal action ids after `last_bid_id`. Actions 0..6 * total_dice - 1 are bids and
+    action 6 * total_dice challenges the last bid (only legal once a bid has been made)
+    """
+    num_bids = num_bid_ids(total_dice)
+    return slice(last_bid_id + 1, num_bids + 1 if last_bid_id >= 0 else num_bids)
+
+
+def regret_matching(regrets):
+    """
+    regrets: array of cumulative regrets of the legal actions
+
+    Return array of the current strategy: proportional to the positive regrets, uniform if none are positive
+    """
+    positive_regrets = np.maximum(regrets, 0)
+    total = positive_regrets.sum()
+    if total > 0:
+        return positive_regrets / total
+    return np.full(len(regrets), 1 / len(regrets))
+
+
+class CFRTrainer:
+    def __init__(self, exploration=0.6):
+        """
+        exploration: float of probability the traversing player samples a uniformly random action
+
+        Initalize an outcome sampling Monte Carlo CFR trainer for single rounds of two player Liar's Dice.
+        The round winner gets utility 1 and the loser -1. The regret and strategy tables of every (own dice, opponent dice)
+        are (infosets, actions) arrays indexed by `infoset_row` and action id, shared by both players
+        """
+        self.exploration = exploration
+        self.regret_sums = {} #keys are (own dice, opponent dice), values are arrays of cumulative regrets
+        self.strategy_sums = {} #keys are (own dice, opponent dice), values are arrays of cumulative average strategy weights
+        self.num_iterations = 0
+
+    def tables(self, user_num_dice, opponent_num_dice):
+        """
+        Return tuple (regret sums, strategy sums) of the player with `user_num_dice` dice, creating them if needed
+        """
+        key = (user_num_dice, opponent_num_dice)
+        if key not in self.regret_sums:
+            shape = table_shape(user_num_dice, opponent_num_dice)
+            self.regret_sums[key] = np.zeros(shape)
+            self.strategy_sums[key] = np.zeros(shape)
+        return self.regret_sums[key], self.strategy_sums[key]
+
+    def iterate(self, player1_num_dice, player2_num_dice, rng):
+        """
+        rng: numpy Generator
+
+        Sample both hands and the opening player, then traverse the round once for each player
+        """
+        num_dice = (player1_num_dice, player2_num_dice)
+        hand_indexes = tuple(rng.choice(len(hand_space(n).probs), p=hand_space(n).probs) for n in num_dice)
+        counts = tuple(hand_space(n).counts[index] for n, index in zip(num_dice, hand_indexes))
+        opener = int(rng.integers(2))
+        round_state = (num_dice, hand_indexes, counts)
+        for traverser in (0, 1):
+            self.walk(round_state, opener, -1, traverser, 1.0, 1.0, rng)
+        self.num_iterations += 1
+
+    def walk(self, round_state, player, last_bid_id, traverser, opponent_reach, sample_prob, rng):
+        """
+        round_state: tuple (dice of each player, hand index of each player, counts of each player)
+        player: int (0 or 1) of the acting player
+        last_bid_id: int id of the last bid. -1 if no bid has been made
+        traverser: int (0 or 1) of the player whose regrets are updated
+        opponent_reach: float probability the non traversing player's strategy reaches this point
+        sample_prob: float probability this point was sampled
+
+        Sample one action and continue the round. Update the regrets of the traverser's information sets and the
+        average strategy of the other player's.
+        Return tuple (sampled utility of the traverser, probability of playing from after the sampled action to the end of the round)
+        """
+        num_dice, hand_indexes, counts = round_state
+        total_dice = num_dice[0] + num_dice[1]
+        regret_sums, strategy_sums = self.tables(num_dice[player], num_dice[1 - player])
+        row = infoset_row(hand_indexes[player], last_bid_id, total_dice)
+        legal = legal_actions(last_bid_id, total_dice)
+
+        strategy = regret_matching(regret_sums[row, legal])
+        if player == traverser:
+            sample_probs = self.exploration / len(strategy) + (1 - self.exploration) * strategy
+        else:
+            sample_probs = strategy
+        choice = min(int(np.searchsorted(np.cumsum(sample_probs), rng.random() * sample_probs.sum(), side='right')), len(strategy) - 1)
+        action = legal.start + choice
+
+        if action == num_bid_ids(total_dice):
+            # challenge: the challenger loses if the bid is correct
+            bid_quantity, bid_value = bid_from_id(last_bid_id, total_dice)
+            actual_quantity = int(counts[0][bid_value - 1]) + int(counts[1][bid_value - 1])
+            loser = player if actual_quantity >= bid_quantity else 1 - player
+            utility = (1.0 if loser != traverser else -1.0) / (sample_prob * sample_probs[choice])
+            tail_reach = 1.0
+        else:
+            next_opponent_reach = opponent_reach if player == traverser else opponent_reach * strategy[choice]
+            utility, tail_reach = self.walk(round_state, 1 - player, action, traverser, next_opponent_reach, sample_prob * sample_probs[choice], rng)
+
+        if player == traverser:
+            weight = utility * opponent_reach * tail_reach
+            regrets = -weight * strategy[choice] * np.ones(len(strategy))
+            regrets[choice] += weight
+            regret_sums[row, legal] += regrets
+        else:
+            strategy_sums[row, legal] += opponent_reach * strategy / sample_prob
+        return utility, tail_reach * strategy[choice]
+
+    def train(self, configurations, num_iterations, rng):
+        """
+        configurations: list of (player1 dice, player2 dice) tuples, trained in turn
+        num_iterations: int of number of sampled rounds
+        rng: numpy Generator
+        """
+        for iteration in range(num_iterations):
+            self.iterate(*configurations[iteration % len(configurations)], rng)
+
+    def merge(self, row_deltas, num_iterations):
+        """
+        row_deltas: dictionary keyed like `regret_sums` of tuples (changed rows, regret changes of those rows, strategy changes of those rows)
+        num_iterations: int of number of iterations trained elsewhere
+
+        Add the table changes of `num_iterations` iterations trained elsewhere
+        """
+        for key, (rows, regret_deltas, strategy_deltas) in row_deltas.items():
+            regret_sums, strategy_sums = self.tables(*key)
+            regret_sums[rows] += regret_deltas
+            strategy_sums[rows] += strategy_deltas
+        self.num_iterations += num_iterations
+
+    def average_policy(self):
+        """
+        Return CFRPolicy of the average strategy of every trained (own dice, opponent dice)
+        """
+        strategies = {}
+        for key, strategy_sums in self.strategy_sums.items():
+            total_dice = sum(key)
+            strategy = np.zeros_like(strategy_sums)
+            for last_bid_id in range(-1, num_bid_ids(total_dice)):
+                rows = slice(last_bid_id + 1, None, num_bid_ids(total_dice) + 1) # this bid in every hand
+                legal = legal_actions(last_bid_id, total_dice)
+                weights = strategy_sums[rows, legal]
+                totals = weights.sum(axis=1, keepdims=True)
+                uniform = np.full(weights.shape, 1 / weights.shape[1])
+                strategy[rows, legal] = np.where(totals > 0, weights / np.where(totals > 0, totals, 1), uniform)
+            strategies[key] = strategy
+        return CFRPolicy(strategies)
+
+
+shared_tables = {} #keys are (own dice, opponent dice), values are (regret sums, strategy sums) views of shared memory in a worker process
+shared_blocks = [] #SharedMemory blocks the views of `shared_tables` read, kept open for the life of the worker
+
+def table_shape(user_num_dice, opponent_num_dice):
+    """
+    Return the shape of the regret and strategy tables of the player with `user_num_dice` dice (see `CFRTrainer.tables`)
+    """
+    total_dice = user_num_dice + opponent_num_dice
+    return (len(hand_space(user_num_dice).probs) * (num_bid_ids(total_dice) + 1), num_bid_ids(total_dice) + 1)
+
+def attach_shared_tables(table_blocks):
+    """
+    table_blocks: dictionary keyed like `shared_tables` of (regret block name, strategy block name, table shape)
+
+    Pool initializer: map the trainer's shared tables into this worker, so shards never pickle them
+    """
+    for key, (regret_name, strategy_name, shape) in table_blocks.items():
+        views = []
+        for name in (regret_name, strategy_name):
+            block = shared_memory.SharedMemory(name=name)
+            shared_blocks.append(block)
+            views.append(np.ndarray(shape, dtype=np.float64, buffer=block.buf))
+        shared_tables[key] = tuple(views)
+
+def train_shard(shard):
+    """
+    shard: tuple (configurations, num_iterations, seed, exploration)
+
+    Train a copy of the shared tables for `num_iterations` iterations and return dictionary keyed like `shared_tables` of
+    (changed rows, regret changes of those rows, strategy changes of those rows), see `CFRTrainer.merge`. Runs inside a worker process
+    """
+    configurations, num_iterations, seed, exploration = shard
+    trainer = CFRTrainer(exploration)
+    trainer.regret_sums = {key: regret_sums.copy() for key, (regret_sums, _) in shared_tables.items()}
+    trainer.strategy_sums = {key: strategy_sums.copy() for key, (_, strategy_sums) in shared_tables.items()}
+    trainer.train(configurations, num_iterations, np.random.default_rng(seed))
+    row_deltas = {}
+    for key, (regret_sums, strategy_sums) in shared_tables.items():
+        regret_deltas = trainer.regret_sums[key] - regret_sums
+        strategy_deltas = trainer.strategy_sums[key] - strategy_sums
+        rows = np.flatnonzero(regret_deltas.any(axis=1) | strategy_deltas.any(axis=1))
+        if len(rows):
+            row_deltas[key] = (rows, regret_deltas[rows], strategy_deltas[rows])
+    return row_deltas
+
+
+def train_cfr(num_iterations, max_dice=5, seed=0, num_workers=None, iterations_per_shard=2000, exploration=0.6):
+    """
+    num_iterations: int of number of sampled rounds
+    max_dice: int of the largest number of dice per player. Every (player1 dice, player2 dice) up to it is trained
+    seed: int of the training seed. Shard i is always seeded from the i-th child of this seed
+    num_workers: int of number of worker processes (default os.cpu_count())
+    iterations_per_shard: int of number of iterations a worker runs on its copy of the tables before they are merged
+    exploration: float passed to CFRTrainer
+
+    Train in epochs: every worker starts from the current tables, and the changes of all workers are summed at the end of the epoch.
+    The tables live in shared memory the workers map once, and workers only send back the rows their shard changed.
+    Return the CFRTrainer
+    """
+    configurations = [(player1_num_dice, player2_num_dice) for player1_num_dice in range(1, max_dice + 1) for player2_num_dice in range(1, max_dice + 1)]
+    num_workers = num_workers or multiprocessing.cpu_count()
+    num_shards = math.ceil(num_iterations / iterations_per_shard)
+    shard_seeds = np.random.SeedSequence(seed).spawn(num_shards)
+
+    trainer = CFRTrainer(exploration)
+    blocks = []
+    table_blocks = {}
+    try:
+        for key in configurations:
+            shape = table_shape(*key)
+            names = []
+            for tables in (trainer.regret_sums, trainer.strategy_sums):
+                block = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(np.float64).itemsize)
+                blocks.append(block)
+                tables[key] = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+                tables[key][:] = 0
+                names.append(block.name)
+            table_blocks[key] = (*names, shape)
+
+        with multiprocessing.Pool(num_workers, initializer=attach_shared_tables, initargs=(table_blocks,)) as pool:
+            for first_shard in range(0, num_shards, num_workers):
+                shards = []
+                for shard_index in range(first_shard, min(first_shard + num_workers, num_shards)):
+                    shard_num_iterations = min(iterations_per_shard, num_iterations - shard_index * iterations_per_shard)
+                    shards.append((configurations, shard_num_iterations, shard_seeds[shard_index], exploration))
+                for shard, row_deltas in zip(shards, pool.map(train_shard, shards)):
+                    trainer.merge(row_deltas, shard[1])
+        # copy out of shared memory before it is freed
+        trainer.regret_sums = {key: table.copy() for key, table in trainer.regret_sums.items()}
+        trainer.strategy_sums = {key: table.copy() for key, table in trainer.strategy_sums.items()}
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return trainer
+
+
+@register_agent("cfr")
+class CFRPolicy(Agent):
+    def __init__(self, strategies):
+        """
+        strategies: dictionary of (own dice, opponent dice) to (infosets, actions) array of action probabilities (see CFRTrainer)
+
+        Initalize an agent that plays a trained CFR average strategy
+        """
+        self.strategies = strategies
+
+    def save(self, path):
+        """
+        Save the policy to the .npz file `path`
+        """
+        np.savez_compressed(path, **{f"{user_num_dice}_{opponent_num_dice}": strategy for (user_num_dice, opponent_num_dice), strategy in self.strategies.items()})
+
+    @classmethod
+    def load(cls, path):
+        """
+        Return the CFRPolicy saved at `path`
+        """
+        with np.load(path) as data:
+            return cls({tuple(int(n) for n in key.split("_")): data[key] for key in data.files})
+
+    def action_probabilities(self, hand, previous_bid):
+        """
+        hand: LiarsDiceHand of the acting player
+        previous_bid: Bid object of the last bid. None if no bid has been made
+
+        Return tuple (slice of legal action ids, array of their probabilities)
+        """
+        key = (len(hand), hand.opponent_num_dice)
+        if key not in self.strategies:
+            raise ValueError(f"Policy was not trained for {key[0]} dice against {key[1]} dice.")
+        total_dice = len(hand) + hand.opponent_num_dice
+        last_bid_id = -1 if previous_bid is None else bid_id(previous_bid.bid_quantity, previous_bid.bid_value, total_dice)
+        row = infoset_row(hand_space(len(hand)).hand_index(hand.counts), last_bid_id, total_dice)
+        legal = legal_actions(last_bid_id, total_dice)
+        return legal, self.strategies[key][row, legal]
+
+    def challenge(self, state):
+        """
+        Return boolean, does the player challenge `state.last_bid`. Sampled with the strategy's challenge probability
+        """
+        hand, bid = state.hand, state.last_bid
+        if bid.bid_quantity > len(hand) + hand.opponent_num_dice:
+            return True
+        legal, probs = self.action_probabilities(hand, bid)
+        return require_rng(state.rng, "CFRPolicy.challenge").random() < probs[-1]
+
+    def bid(self, state):
+        """
+        Return Bid object sampled from the strategy's bids (the player has already decided not to challenge `state.last_bid`)
+        """
+        hand, previous_bid = state.hand, state.last_bid
+        legal, probs = self.action_probabilities(hand, previous_bid)
+        total_dice = len(hand) + hand.opponent_num_dice
+        bid_ids = list(range(legal.start, min(legal.stop, num_bid_ids(total_dice))))
+        bid_probs = probs[:len(bid_ids)]
+        if bid_probs.sum() <= 0:
+            bid_probs = np.ones(len(bid_ids))
+        return Bid(*bid_from_id(weighted_choice(bid_ids, bid_probs.tolist(), state.rng), total_dice))
+
+
+if __name__ == "__main__":
+    from agents import simulate_game
+    trainer = train_cfr(200000, max_dice=2)
+    policy = trainer.average_policy()
+    policy.save("cfr_policy.npz")
+    games = [simulate_game("Me", "Subject", "conditional", starting_num_dice=2, verbose=False, agents={"Me": policy}) for _ in range(1000)]
+    wins = sum(game.game_history[game.round_number - 1]["Winner"] == "Me" for game in games)
+    print(f"CFR policy win rate against the conditional heuristic: {wins / len(games):.3f}")
@@ -0,0 +1,83 @@
+class NullSink:
+    """
+    Event sink that drops every event. Default for games so batch runs never format or print anything
+    """
+    enabled = False
+
+    def emit(self, event, **fields):
+        pass
+
+
+NULL_SINK = NullSink()
+
+
+def format_hand(name, hand_dict, opponent_num_dice):
+    """
+    Return the readable description of a hand used by `LiarsDiceHand.__str__`
+    """
+    hand_str = ', '.join(str(die_value) for die_value in sorted(hand_dict) for _ in range(hand_dict[die_value]))
+    return (f"{name}\n"
+            f"Hand: [{hand_str}]\n"
+            f"Number of dice: {sum(hand_dict.values())}\n"
+            f"Opponent's number of dice: {opponent_num_dice}\n")
+
+
+def format_event(event, fields):
+    """
+    event: str of event type
+    fields: dictionary of the event's fields
+
+    Return the readable message of an event
+    """
+    if event == "round_start":
+        total_dice = sum(sum(hand.values()) for hand in fields["hands"].values())
+        return f'Round #{fields["round_number"]}\n' + '\n'.join(format_hand(name, hand, total_dice - sum(hand.values())) for name, hand in fields["hands"].items())
+    if event == "bid":
+        return f'{fields["player"]} bid {fields["quantity"]} dice of value {fields["value"]}. Correct? {fields["correct"]}.'
+    if event == "probability":
+        return f"{fields['observer']}'s estimated ({fields['method']}) probability {fields['bidder']}'s bid Correct : {round(fields['probability'], 3)}"
+    if event == "challenge":
+        lines = [f'{fields["player"]} challenged. Challenge successful? {fields["successful"]}',
+                 f'Winner of challenge: {fields["winner"]}. Loser of challenge: {fields["loser"]}.']
+        for name, remaining_dice in fields["remaining_dice"].items():
+            lines.append(f'{name} has {remaining_dice} dice remaining.')
+        if fields["game_over"]:
+            lines.append(f'Game over. {fields["winner"]} wins, {fields["loser"]} loses.\n')
+        else:
+            lines.append(f'{fields["next_turn"]} has the next turn.\n')
+        return "\n".join(lines)
+    if event == "parsed_round":
+        lines = [f'game {fields["game"]}, {fields["round"]}']
+        for name, hand in fields["hands"].items():
+            lines.append(f'{name} hand: {hand}')
+        return "\n".join(lines)
+    return f'{event}: {fields}'
+
+
+class PrintSink:
+    """
+    Event sink that prints a readable message for every event
+    """
+    enabled = True
+
+    def emit(self, event, **fields):
+        print(format_event(event, fields))
+
+
+class RecordingSink:
+    """
+    Event sink that captures events as dictionaries in `self.events` for later analysis
+    """
+    enabled = True
+
+    def __init__(self, event_types=None):
+        """
+        event_types: iterable of event types to record. None records every event
+        """
+        self.event_types = None if event_types is None else set(event_types)
+        self.events = []
+
+    def emit(self, event, **fields):
+        if self.event_types is None or event in self.event_types:
+            fields["event"] = event
+            self.events.append(fields)
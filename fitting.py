@@ -0,0 +1,328 @@
+from model import *
+from parse import parse_game
+from probability import bid_likelihood_coefficients, binomial_pmf
+from scipy.optimize import minimize
+from scipy.special import expit
+
+
+NUM_POWERS = MAX_DICE + 1 #bid likelihoods are polynomials of the bluff probability of degree at most MAX_DICE
+#keys are the transforms parameters are fitted under, values are (function from the fitted coordinate to the parameter, its derivative)
+PARAMETER_TRANSFORMS = {"identity": (lambda x: x, lambda x: 1.0), "log": (np.exp, np.exp), "logit": (expit, lambda x: expit(x) * (1 - expit(x)))}
+
+# memoized in the "padded_coefficients" LRU cache (see cache.py), keys are (bid quantity, bidder dice, unseen dice)
+@memoize("padded_coefficients", key=lambda bid_quantity, bidder_num_dice, unseen_num_dice: (bid_quantity, bidder_num_dice, unseen_num_dice), maxsize=4096)
+def padded_coefficients(bid_quantity, bidder_num_dice, unseen_num_dice):
+    """
+    Return (bidder_num_dice + 1, NUM_POWERS) array of `bid_likelihood_coefficients`, zero padded so every bid shares the same powers
+    """
+    coefficients = np.zeros((bidder_num_dice + 1, NUM_POWERS))
+    coefficients[:, :bidder_num_dice + 1] = bid_likelihood_coefficients(bid_quantity, bidder_num_dice, unseen_num_dice)
+    return coefficients
+
+def bluff_powers(bluff_probs):
+    """
+    Return (N, NUM_POWERS) array of every power of each bluff probability
+    """
+    return bluff_probs[:, np.newaxis] ** np.arange(NUM_POWERS)
+
+
+class PlayerObservations:
+    def __init__(self, player_name):
+        """
+        player_name: str of the player whose decisions are observed
+
+        Initalize the player's observed bids and responses to bids, stored as the polynomial coefficients the likelihoods are evaluated from:
+            bids: every legal bid the player could have made (a row each), `LiarsDiceHand.conditional_bid_prob` of the row's bid is
+                its coefficients times the powers of the player's bluff probability
+            responses: the numerator and denominator coefficients of `compute_conditional_probability_correct` of the bid the player
+                responded to, and whether they challenged it
+        """
+        self.player_name = player_name
+        self.bid_rows = [] #coefficients of every legal bid
+        self.bid_row_observations = [] #index of the observed bid each row belongs to
+        self.observed_bid_rows = [] #row of the bid the player actually made
+        self.bid_num_dice = [] #player's dice at each observed bid
+        self.response_numerators = []
+        self.response_denominators = []
+        self.response_bidder_num_dice = []
+        self.challenged = []
+
+    def add_bid(self, hand, previous_bid, bid):
+        """
+        hand: LiarsDiceHand of the bidding player
+        previous_bid: Bid object of the bid being raised, None for the opening bid
+        bid: Bid object the player made
+
+        Add a bid. Bids that are not legal (don't raise `previous_bid` or exceed the dice on the board) are left out
+        """
+        total_dice = len(hand) + hand.opponent_num_dice
+        legal_bids = legal_bid_mask(previous_bid, total_dice)
+        if not (1 <= bid.bid_quantity <= total_dice and legal_bids[bid.bid_quantity - 1, bid.bid_value - 1]):
+            return
+        observation = len(self.bid_num_dice)
+        for quantity_index, value_index in np.argwhere(legal_bids).tolist():
+            if (quantity_index + 1, value_index + 1) == (bid.bid_quantity, bid.bid_value):
+                self.observed_bid_rows.append(len(self.bid_rows))
+            value_count = hand.quantity_of_value(value_index + 1)
+            self.bid_rows.append(padded_coefficients(quantity_index + 1, len(hand), hand.opponent_num_dice)[value_count])
+            self.bid_row_observations.append(observation)
+        self.bid_num_dice.append(len(hand))
+
+    def add_response(self, hand, bid, challenged):
+        """
+        hand: LiarsDiceHand of the responding player (the observer)
+        bid: Bid object of the opponent's bid
+        challenged: boolean, did the player challenge `bid`
+
+        Add a response. Responses to the highest possible bid are forced challenges and are left out
+        """
+        if STANDARD_RULES.is_max_bid(bid, len(hand) + hand.opponent_num_dice):
+            return
+        bidder_num_dice = hand.opponent_num_dice
+        value_count = hand.quantity_of_value(bid.bid_value)
+        # p(c) p(b|c) summed over the bidder's count c of the bid value, and the same restricted to the counts that make the bid correct
+        weights = binomial_pmf(bidder_num_dice)[:, np.newaxis] * padded_coefficients(bid.bid_quantity, bidder_num_dice, len(hand))
+        correct = np.arange(bidder_num_dice + 1) + value_count >= bid.bid_quantity
+        self.response_numerators.append(weights[correct].sum(axis=0))
+        self.response_denominators.append(weights.sum(axis=0))
+        self.response_bidder_num_dice.append(bidder_num_dice)
+        self.challenged.append(challenged)
+
+    def arrays(self):
+        """
+        Return dictionary of the observations as numpy arrays
+        """
+        return {"bid_rows": np.array(self.bid_rows).reshape(-1, NUM_POWERS), "bid_row_observations": np.array(self.bid_row_observations, dtype=np.int64),
+                "observed_bid_rows": np.array(self.observed_bid_rows, dtype=np.int64), "bid_num_dice": np.array(self.bid_num_dice, dtype=np.float64),
+                "response_numerators": np.array(self.response_numerators).reshape(-1, NUM_POWERS),
+                "response_denominators": np.array(self.response_denominators).reshape(-1, NUM_POWERS),
+                "response_bidder_num_dice": np.array(self.response_bidder_num_dice, dtype=np.float64), "challenged": np.array(self.challenged, dtype=bool)}
+
+
+def collect_observations(games):
+    """
+    games: list of LiarsDiceGame objects, e.g. from `parse.parse_game`
+
+    Return dictionary of PlayerObservations of every player, keyed by name. Every bid is a bid observation of its bidder, and a response
+    observation of the opponent (who either challenged it or raised it)
+    """
+    observations = {}
+    for game_obj in games:
+        history = game_obj.game_history
+        for round_num in history:
+            round_info = history[round_num]
+            hands_dict = round_info['Hands']
+            actions = round_info['Actions']
+            if not actions or not hands_dict:
+                continue
+            names = list(hands_dict)
+            num_dice = {name: sum(hands_dict[name].values()) for name in names}
+            hands = {name: LiarsDiceHand(name, hands_dict[name], num_dice[other]) for name, other in zip(names, names[::-1])}
+            for name in names:
+                observations.setdefault(name, PlayerObservations(name))
+
+            previous_bid = None
+            for action_index, (action, acting_player_name, quantity, value, _) in enumerate(actions):
+                if action != "Bid":
+                    continue
+                bid = Bid(int(quantity), int(value))
+                observations[acting_player_name].add_bid(hands[acting_player_name], previous_bid, bid)
+                if action_index + 1 < len(actions):
+                    responder_name = actions[action_index + 1][1]
+                    observations[responder_name].add_response(hands[responder_name], bid, actions[action_index + 1][0] == "Challenge")
+                previous_bid = bid
+    return observations
+
+
+def bid_log_likelihood(observations, bluff_scale, bluff_exponent, lapse=0.05):
+    """
+    observations: dictionary from `PlayerObservations.arrays`
+    bluff_scale, bluff_exponent: floats of the player's BluffModel
+    lapse: float probability the player bids uniformly at random over the legal bids instead of following the model
+
+    Return the log likelihood of the player's bids, each bid's `conditional_bid_prob` normalized over every legal bid.
+    Bluff probabilities are capped at 1 like `BluffModel.bluff_prob`, the likelihood is flat in the scale beyond the cap
+    """
+    bluff_probs = np.minimum(bluff_scale * (1 / observations["bid_num_dice"]) ** bluff_exponent, 1.0)
+    row_observations = observations["bid_row_observations"]
+    weights = (observations["bid_rows"] * bluff_powers(bluff_probs)[row_observations]).sum(axis=1)
+    totals = np.bincount(row_observations, weights=weights, minlength=len(bluff_probs))
+    num_legal_bids = np.bincount(row_observations, minlength=len(bluff_probs))
+    observed_weights = weights[observations["observed_bid_rows"]]
+    model_probs = np.divide(observed_weights, totals, out=np.zeros_like(totals), where=totals > 0)
+    return float(np.log((1 - lapse) * model_probs + lapse / num_legal_bids).sum())
+
+def challenge_probabilities(observations, challenge_threshold, temperature, opponent_bluff_scale, opponent_bluff_exponent):
+    """
+    Return array of the probability the player challenged each bid they responded to: a logistic function of how far the bid's
+    conditional probability of being correct is below their threshold. As the temperature goes to 0 the player challenges
+    exactly when the probability is at or below the threshold, like `HeuristicAgent`
+    """
+    bluff_probs = np.minimum(opponent_bluff_scale * (1 / observations["response_bidder_num_dice"]) ** opponent_bluff_exponent, 1.0)
+    powers = bluff_powers(bluff_probs)
+    numerators = (observations["response_numerators"] * powers).sum(axis=1)
+    denominators = (observations["response_denominators"] * powers).sum(axis=1)
+    probs_bid_correct = np.divide(numerators, denominators, out=np.zeros_like(denominators), where=denominators > 0)
+    return expit((challenge_threshold - probs_bid_correct) / temperature)
+
+def challenge_log_likelihood(observations, challenge_threshold, temperature, opponent_bluff_scale, opponent_bluff_exponent):
+    """
+    Return the log likelihood of the player's challenges and raises (see `challenge_probabilities`)
+    """
+    probs = np.clip(challenge_probabilities(observations, challenge_threshold, temperature, opponent_bluff_scale, opponent_bluff_exponent), 1e-12, 1 - 1e-12)
+    challenged = observations["challenged"]
+    return float(np.where(challenged, np.log(probs), np.log(1 - probs)).sum())
+
+
+def numerical_hessian(f, x, step=1e-3):
+    """
+    f: function of a 1d array
+    x: 1d array the hessian is evaluated at
+    step: float central difference step of every coordinate
+
+    Return (len(x), len(x)) array of the central difference second derivatives of f at x
+    """
+    x = np.asarray(x, dtype=float)
+    steps = step * np.eye(len(x))
+    hessian = np.zeros((len(x), len(x)))
+    for i in range(len(x)):
+        for j in range(i, len(x)):
+            hessian[i, j] = hessian[j, i] = (f(x + steps[i] + steps[j]) - f(x + steps[i] - steps[j])
+                                             - f(x - steps[i] + steps[j]) + f(x - steps[i] - steps[j])) / (4 * step ** 2)
+    return hessian
+
+def maximize_likelihood(log_likelihood, names, transforms, start, bounds, bound_tolerance=0.01, max_restarts=5):
+    """
+    log_likelihood: function of the 1d array of fitted coordinates, one per parameter
+    names: list of str parameter names
+    transforms: list of keys of PARAMETER_TRANSFORMS, each parameter is its transform of its fitted coordinate
+    start: list of floats of the starting coordinates
+    bounds: list of (low, high) bounds of each coordinate
+    bound_tolerance: float fraction of a bound's width within which a coordinate is on the bound
+    max_restarts: int of the most times Nelder-Mead is restarted from its last solution
+
+    Maximize the log likelihood with Nelder-Mead and check every parameter is identified. Parameters that end on a bound are flagged
+    "at bound" (the data pushes them out of the searched range). Standard errors of the others come from the inverse hessian of the
+    negative log likelihood over them, mapped to the parameters with the delta method. A parameter whose curvature is not positive or
+    whose standard error is wider than a quarter of its bound is flagged "flat" (the likelihood barely depends on it).
+    Return tuple of (dictionary of parameters, maximized log likelihood, dictionary of standard errors (nan when flagged at bound),
+    dictionary of flags of the parameters that are not identified), all keyed by parameter name
+    """
+    fit = minimize(lambda x: -log_likelihood(x), start, method="Nelder-Mead", bounds=bounds)
+    # Nelder-Mead stalls on the long ridges between the threshold and the bluff parameters, restart it until it stops improving
+    for _ in range(max_restarts):
+        restart = minimize(lambda x: -log_likelihood(x), fit.x, method="Nelder-Mead", bounds=bounds)
+        improved = restart.fun < fit.fun - 1e-6
+        fit = restart if restart.fun < fit.fun else fit
+        if not improved:
+            break
+    x = fit.x
+    widths = np.array([high - low for low, high in bounds])
+    on_bound = np.array([min(value - low, high - value) for value, (low, high) in zip(x, bounds)]) <= bound_tolerance * widths
+    flags = {name: "at bound" for name, bound in zip(names, on_bound) if bound}
+
+    coordinate_errors = np.full(len(x), np.nan)
+    interior = np.flatnonzero(~on_bound)
+    if len(interior):
+        def interior_negative_log_likelihood(interior_x):
+            full_x = x.copy()
+            full_x[interior] = interior_x
+            return -log_likelihood(full_x)
+        hessian = numerical_hessian(interior_negative_log_likelihood, x[interior])
+        variances = np.diag(np.linalg.pinv(hessian))
+        coordinate_errors[interior] = np.sqrt(np.where(variances > 0, variances, np.inf))
+        for index in interior:
+            if not coordinate_errors[index] < widths[index] / 4:
+                flags[names[index]] = "flat"
+
+    params, standard_errors = {}, {}
+    for name, transform, value, error in zip(names, transforms, x, coordinate_errors):
+        function, derivative = PARAMETER_TRANSFORMS[transform]
+        params[name] = float(function(value))
+        standard_errors[name] = float(abs(derivative(value)) * error)
+    return params, -float(fit.fun), standard_errors, flags
+
+
+class FitResult:
+    def __init__(self, player_name, params, bid_log_likelihood, challenge_log_likelihood, num_bids, num_responses, standard_errors=None, flags=None):
+        """
+        player_name: str of the fitted player
+        params: dictionary of the maximum likelihood parameters, keyed like `sweep.DEFAULT_PARAMETERS` plus "temperature"
+        bid_log_likelihood, challenge_log_likelihood: floats of the maximized log likelihoods
+        num_bids, num_responses: ints of number of observations
+        standard_errors: dictionary of the standard error of each parameter, keyed like `params` (see `maximize_likelihood`)
+        flags: dictionary of "at bound" or "flat" for every parameter the data doesn't identify, keyed like `params`
+        """
+        self.player_name = player_name
+        self.params = params
+        self.bid_log_likelihood = bid_log_likelihood
+        self.challenge_log_likelihood = challenge_log_likelihood
+        self.num_bids = num_bids
+        self.num_responses = num_responses
+        self.standard_errors = {} if standard_errors is None else standard_errors
+        self.flags = {} if flags is None else flags
+
+    def bluff_model(self):
+        """
+        Return the fitted BluffModel, e.g. for `simulate_game(..., player1_bluff_model=result.bluff_model())`
+        """
+        return BluffModel(self.params["bluff_scale"], self.params["bluff_exponent"], self.params["opponent_bluff_scale"], self.params["opponent_bluff_exponent"])
+
+    def to_dict(self):
+        return {"player": self.player_name, "params": self.params, "standard_errors": self.standard_errors, "flags": self.flags,
+                "bid_log_likelihood": self.bid_log_likelihood, "challenge_log_likelihood": self.challenge_log_likelihood,
+                "num_bids": self.num_bids, "num_responses": self.num_responses}
+
+    def __str__(self):
+        params = ", ".join(f"{name} {value:.3f} ({self.flags[name]})" if name in self.flags else f"{name} {value:.3f} (se {self.standard_errors.get(name, np.nan):.3f})"
+                           for name, value in self.params.items())
+        return (f"{self.player_name}: {params}. Log likelihood {self.bid_log_likelihood:.1f} over {self.num_bids} bids, "
+                f"{self.challenge_log_likelihood:.1f} over {self.num_responses} responses")
+
+
+def fit_player(observations, lapse=0.05):
+    """
+    observations: PlayerObservations of one player
+    lapse: float, see `bid_log_likelihood`
+
+    Fit the player's bluff model and challenge threshold by maximum likelihood (see `maximize_likelihood`). The bid and challenge
+    parameters appear in separate likelihoods, so they are fitted separately. Scales are fitted on a logit scale, so every fitted
+    bluff probability scale * (1 / dice)^exponent stays strictly inside (0, 1) and never reaches the cap at 1 where the likelihood is flat.
+    The temperature is fitted on a log scale.
+    Return FitResult
+    """
+    arrays = observations.arrays()
+
+    bid_params, bid_fit_log_likelihood, bid_errors, bid_flags = maximize_likelihood(
+        lambda x: bid_log_likelihood(arrays, expit(x[0]), x[1], lapse), ["bluff_scale", "bluff_exponent"], ["logit", "identity"],
+        [0.0, 2.0], [(-10, 10), (0, 6)])
+    challenge_params, challenge_fit_log_likelihood, challenge_errors, challenge_flags = maximize_likelihood(
+        lambda x: challenge_log_likelihood(arrays, x[0], np.exp(x[1]), expit(x[2]), x[3]),
+        ["challenge_threshold", "temperature", "opponent_bluff_scale", "opponent_bluff_exponent"], ["identity", "log", "logit", "identity"],
+        [0.51, np.log(0.1), 0.0, 2.0], [(-1, 2), (-8, 2), (-10, 10), (0, 6)])
+
+    names = ["challenge_threshold", "bluff_scale", "bluff_exponent", "opponent_bluff_scale", "opponent_bluff_exponent", "temperature"]
+    params, standard_errors, flags = {**bid_params, **challenge_params}, {**bid_errors, **challenge_errors}, {**bid_flags, **challenge_flags}
+    return FitResult(observations.player_name, {name: params[name] for name in names}, bid_fit_log_likelihood, challenge_fit_log_likelihood,
+                     len(arrays["bid_num_dice"]), len(arrays["challenged"]), {name: standard_errors[name] for name in names},
+                     {name: flags[name] for name in names if name in flags})
+
+def fit_players(games, player_names=None, lapse=0.05):
+    """
+    games: list of LiarsDiceGame objects, e.g. the sessions of `parse.parse_game`
+    player_names: list of names of the players to fit (default every player)
+    lapse: float, see `bid_log_likelihood`
+
+    Return dictionary of every player's FitResult, keyed by name
+    """
+    observations = collect_observations(games)
+    player_names = list(observations) if player_names is None else player_names
+    return {name: fit_player(observations[name], lapse) for name in player_names}
+
+
+if __name__ == "__main__":
+    human_games = parse_game('./HumanData/30OrganizedData.csv')
+    for name, result in fit_players(human_games).items():
+        print(result)
+        arrays = collect_observations(human_games)[name].arrays()
+        print(f"  default model log likelihood {bid_log_likelihood(arrays, 1.0, 2.0):.1f} (bids), {challenge_log_likelihood(arrays, 0.51, 0.05, 1.0, 2.0):.1f} (responses, temperature 0.05)")
@@ -0,0 +1,209 @@
+import json
+import os
+import numpy as np
+from game_state import GameHistory, ACTION_DTYPE, ROUND_DTYPE
+
+
+GAME_LOG_VERSION = 1
+
+# one row per game. Players index the log's player names, actions/rounds count the game's rows in those tables
+GAME_DTYPE = np.dtype([("game", np.int64), ("player1", np.int32), ("player2", np.int32), ("num_actions", np.int32), ("num_rounds", np.int32)])
+
+TABLE_DTYPES = {"games": GAME_DTYPE, "actions": ACTION_DTYPE, "rounds": ROUND_DTYPE}
+
+
+def column_path(path, table, column):
+    """
+    Return the path of the binary file holding `column` of `table` in the game log at `path`
+    """
+    return os.path.join(path, f"{table}.{column}.bin")
+
+
+class GameLogWriter:
+    """
+    Writes game histories to a columnar game log: a folder holding one raw binary file per column of the
+    "games", "actions" and "rounds" tables (see game_state.py for the record layouts) and a meta.json describing them.
+    Games are appended as they are written, so the writer holds no games in memory. meta.json only counts the games written
+    before the last `flush` or `close`, so use the writer as a context manager (with GameLogWriter(path) as game_log: ...)
+    """
+    def __init__(self, path):
+        """
+        path: str of the game log folder. Games are appended if the log already exists. Rows written after the log's
+            last flush (e.g. by a writer that crashed or was never closed) are not counted by meta.json and are discarded
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            meta = read_meta(path)
+            self.player_names = meta["player_names"]
+            self.num_rows = meta["num_rows"]
+        else:
+            self.player_names = []
+            self.num_rows = {table: 0 for table in TABLE_DTYPES}
+        self.player_indexes = {name: index for index, name in enumerate(self.player_names)}
+
+        self.files = {}
+        for table, dtype in TABLE_DTYPES.items():
+            for column in dtype.names:
+                file_path = column_path(path, table, column)
+                # cut the column back to the rows meta.json counts, so appended rows stay aligned with it
+                column_size = self.num_rows[table] * dtype[column].itemsize
+                if os.path.exists(file_path) and os.path.getsize(file_path) > column_size:
+                    os.truncate(file_path, column_size)
+                self.files[(table, column)] = open(file_path, 'ab')
+
+    def player_index(self, player_name):
+        """
+        Return the index of `player_name` in the log's player names, adding it if new
+        """
+        if player_name not in self.player_indexes:
+            self.player_indexes[player_name] = len(self.player_names)
+            self.player_names.append(player_name)
+        return self.player_indexes[player_name]
+
+    def write_table(self, table, records):
+        """
+        Append every column of the structured array `records` to `table`
+        """
+        for column in records.dtype.names:
+            self.files[(table, column)].write(np.ascontiguousarray(records[column]).tobytes())
+        self.num_rows[table] += len(records)
+
+    def write(self, game):
+        """
+        game: LiarsDiceGame (or any object with a `game_history` GameHistory) or GameHistory
+
+        Append one game to the log
+        """
+        history = getattr(game, "game_history", game)
+        game_number = self.num_rows["games"]
+
+        actions = history.actions_array().copy()
+        actions["game"] = game_number
+        rounds = history.rounds_array().copy()
+        rounds["game"] = game_number
+
+        game_record = np.zeros(1, dtype=GAME_DTYPE)
+        game_record[0] = (game_number, self.player_index(history.player_names[0]), self.player_index(history.player_names[1]), len(actions), len(rounds))
+
+        self.write_table("actions", actions)
+        self.write_table("rounds", rounds)
+        self.write_table("games", game_record)
+
+    def flush(self):
+        """
+        Flush every column and write meta.json, so readers (and reopened writers) see every game written so far
+        """
+        for f in self.files.values():
+            f.flush()
+        meta = {"version": GAME_LOG_VERSION, "player_names": self.player_names, "num_rows": self.num_rows,
+                "columns": {table: {column: [dtype[column].base.str, list(dtype[column].shape)] for column in dtype.names} for table, dtype in TABLE_DTYPES.items()}}
+        # write then rename, so an interrupted flush never leaves a partial meta.json
+        meta_path = os.path.join(self.path, "meta.json")
+        with open(meta_path + ".tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def close(self):
+        """
+        Flush every column, write meta.json and close the column files
+        """
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_meta(path):
+    """
+    Return the meta.json of the game log at `path`. Raise ValueError if it was written by a different `GAME_LOG_VERSION`
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("version") != GAME_LOG_VERSION:
+        raise ValueError(f"Game log {path} has version {meta.get('version')}, expected {GAME_LOG_VERSION}.")
+    return meta
+
+
+class LoggedGame:
+    """
+    Game read back from a game log. Like LiarsDiceGame it exposes `game_history`, so it can be passed to `plot_game`
+    """
+    def __init__(self, game_history):
+        self.game_history = game_history
+        self.player1_name, self.player2_name = game_history.player_names
+
+
+class GameLogReader:
+    """
+    Reads a columnar game log written by GameLogWriter. Every column is memory mapped, so scanning a column
+    (e.g. reader.column("rounds", "hands")) reads straight from the page cache without parsing or copying
+    """
+    def __init__(self, path):
+        """
+        path: str of the game log folder
+        """
+        self.path = path
+        meta = read_meta(path)
+        self.player_names = meta["player_names"]
+        self.num_rows = meta["num_rows"]
+
+        self.columns = {}
+        for table, dtype in TABLE_DTYPES.items():
+            for column in dtype.names:
+                shape = (self.num_rows[table],) + dtype[column].shape
+                if self.num_rows[table] == 0:
+                    self.columns[(table, column)] = np.empty(shape, dtype=dtype[column].base)
+                else:
+                    self.columns[(table, column)] = np.memmap(column_path(path, table, column), dtype=dtype[column].base, mode='r', shape=shape)
+
+        self.game_action_offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        self.game_round_offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(self.column("games", "num_actions"), out=self.game_action_offsets[1:])
+        np.cumsum(self.column("games", "num_rounds"), out=self.game_round_offsets[1:])
+
+    def __len__(self):
+        """
+        Return the number of games in the log
+        """
+        return self.num_rows["games"]
+
+    def column(self, table, column):
+        """
+        Return the memory mapped array of `column` in `table` ("games", "actions" or "rounds")
+        """
+        return self.columns[(table, column)]
+
+    def table(self, table, start=0, stop=None):
+        """
+        Return structured array of rows [start, stop) of `table`, gathered from its columns
+        """
+        dtype = TABLE_DTYPES[table]
+        stop = self.num_rows[table] if stop is None else stop
+        records = np.empty(stop - start, dtype=dtype)
+        for column in dtype.names:
+            records[column] = self.columns[(table, column)][start:stop]
+        return records
+
+    def history(self, game):
+        """
+        Return the GameHistory of game number `game`
+        """
+        actions = self.table("actions", self.game_action_offsets[game], self.game_action_offsets[game + 1])
+        rounds = self.table("rounds", self.game_round_offsets[game], self.game_round_offsets[game + 1])
+        player_names = (self.player_names[self.column("games", "player1")[game]], self.player_names[self.column("games", "player2")[game]])
+        return GameHistory.from_arrays(player_names, actions, rounds, game)
+
+    def games(self):
+        """
+        Yield a LoggedGame for every game in the log
+        """
+        for game in range(len(self)):
+            yield LoggedGame(self.history(game))
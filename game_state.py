@@ -0,0 +1,234 @@
+import numpy as np
+from collections.abc import Mapping
+
+
+ACTION_BID = 0
+ACTION_CHALLENGE = 1
+ACTION_NAMES = ("Bid", "Challenge")
+NO_PLAYER = -1
+
+# fixed width record of one bid/challenge. `player` indexes the game's player names
+ACTION_DTYPE = np.dtype([("game", np.int32), ("round", np.int16), ("action", np.int8), ("player", np.int8),
+                         ("quantity", np.int16), ("value", np.int8), ("correct", np.bool_)])
+
+# fixed width record of one round. `hands` holds the quantity of 1,2,..,6 of each player when the round was challenged
+# and [action_start, action_stop) are the round's rows in the game's actions
+ROUND_DTYPE = np.dtype([("game", np.int32), ("round", np.int16), ("hands", np.int8, (2, 6)), ("has_hands", np.bool_),
+                        ("winner", np.int8), ("loser", np.int8), ("action_start", np.int32), ("action_stop", np.int32)])
+
+
+def grow(records, min_capacity):
+    """
+    records: structured array
+    min_capacity: int of number of records that must fit
+
+    Return `records` if large enough, otherwise a copy with (at least) double the capacity
+    """
+    if len(records) >= min_capacity:
+        return records
+    grown = np.zeros(max(min_capacity, 2 * len(records)), dtype=records.dtype)
+    grown[:len(records)] = records
+    return grown
+
+
+class GameHistory(Mapping):
+    """
+    Game history of a two player game backed by preallocated ACTION_DTYPE and ROUND_DTYPE arrays that grow on demand.
+
+    Reads like the original dictionary of rounds:
+        keys: round #
+        values: dictionary of information in that round
+            keys: "Hands", "Actions", "Winner", "Loser"
+            values:
+                Names and Hands of the players: {"Name" : hand(dict)}
+                Bids: ["Bid", bidding player, bid dice quantity, bid dice value, correct bid?]
+                  / Challenges: ["Challenge", challenging player, bid dice quantity challenged, bid dice value challenged, successful challenge?]
+                Winner: "Winner Name"
+                Loser: "Loser Name"
+    """
+    __slots__ = ("player_names", "game_index", "actions", "num_actions", "rounds", "num_rounds")
+
+    def __init__(self, player_names, game_index=0, action_capacity=32, round_capacity=10):
+        """
+        player_names: tuple of the two player names. Players are stored as their index in this tuple
+        game_index: int stored in the "game" field of every record
+        action_capacity: int of number of actions to preallocate
+        round_capacity: int of number of rounds to preallocate
+        """
+        self.player_names = tuple(player_names)
+        self.game_index = game_index
+        self.actions = np.zeros(action_capacity, dtype=ACTION_DTYPE)
+        self.num_actions = 0
+        self.rounds = np.zeros(round_capacity, dtype=ROUND_DTYPE)
+        self.num_rounds = 0
+
+    @classmethod
+    def from_arrays(cls, player_names, actions, rounds, game_index=0):
+        """
+        player_names: tuple of the two player names
+        actions: ACTION_DTYPE array of the game's actions
+        rounds: ROUND_DTYPE array of the game's rounds
+
+        Return GameHistory viewing (not copying) `actions` and `rounds`
+        """
+        history = cls.__new__(cls)
+        history.player_names = tuple(player_names)
+        history.game_index = game_index
+        history.actions = actions
+        history.num_actions = len(actions)
+        history.rounds = rounds
+        history.num_rounds = len(rounds)
+        return history
+
+    def player_index(self, player_name):
+        """
+        Return the index of `player_name` in self.player_names
+        """
+        return self.player_names.index(player_name)
+
+    def round_record(self, round_number):
+        """
+        Return the ROUND_DTYPE record of `round_number`, adding empty rounds up to it if needed
+        """
+        if round_number > self.num_rounds:
+            self.rounds = grow(self.rounds, round_number)
+            for new_round in range(self.num_rounds + 1, round_number + 1):
+                record = self.rounds[new_round - 1]
+                record["game"] = self.game_index
+                record["round"] = new_round
+                record["winner"] = NO_PLAYER
+                record["loser"] = NO_PLAYER
+                record["action_start"] = self.num_actions
+                record["action_stop"] = self.num_actions
+            self.num_rounds = round_number
+        return self.rounds[round_number - 1]
+
+    def add_action(self, round_number, action, player_name, bid_quantity, bid_value, correct):
+        """
+        round_number: int of round the action is made in (must be the latest round)
+        action: ACTION_BID or ACTION_CHALLENGE
+        player_name: str of acting player
+        bid_quantity: int of bid dice quantity
+        bid_value: int of bid dice value
+        correct: bool, is the bid correct (bids) / is the challenge successful (challenges)
+
+        Append one action record
+        """
+        if round_number != self.num_rounds:
+            self.round_record(round_number)
+        if self.num_actions == len(self.actions):
+            self.actions = grow(self.actions, self.num_actions + 1)
+        self.actions[self.num_actions] = (self.game_index, round_number, action, self.player_index(player_name), bid_quantity, bid_value, correct)
+        self.num_actions += 1
+        self.rounds["action_stop"][round_number - 1] = self.num_actions
+
+    def set_hands(self, round_number, player1_counts, player2_counts):
+        """
+        Store the quantity of 1,2,..,6 in both players' hands for `round_number`
+        """
+        record = self.round_record(round_number)
+        record["hands"][0] = player1_counts
+        record["hands"][1] = player2_counts
+        record["has_hands"] = True
+
+    def set_result(self, round_number, winner_name, loser_name):
+        """
+        Store the winner and loser of `round_number`
+        """
+        record = self.round_record(round_number)
+        record["winner"] = self.player_index(winner_name)
+        record["loser"] = self.player_index(loser_name)
+
+    def actions_array(self):
+        """
+        Return ACTION_DTYPE view of the recorded actions
+        """
+        return self.actions[:self.num_actions]
+
+    def rounds_array(self):
+        """
+        Return ROUND_DTYPE view of the recorded rounds
+        """
+        return self.rounds[:self.num_rounds]
+
+    def __getitem__(self, round_number):
+        """
+        Return dictionary of the information in `round_number` (see class docstring)
+        """
+        if not (isinstance(round_number, (int, np.integer)) and 1 <= round_number <= self.num_rounds):
+            raise KeyError(round_number)
+        record = self.rounds[round_number - 1]
+
+        hands = {}
+        if record["has_hands"]:
+            for player, player_name in enumerate(self.player_names):
+                hands[player_name] = {value: int(record["hands"][player][value - 1]) for value in range(1, 7)}
+
+        actions = []
+        for action in self.actions[record["action_start"]:record["action_stop"]]:
+            actions.append([ACTION_NAMES[action["action"]], self.player_names[action["player"]],
+                            int(action["quantity"]), int(action["value"]), bool(action["correct"])])
+
+        winner = self.player_names[record["winner"]] if record["winner"] != NO_PLAYER else ""
+        loser = self.player_names[record["loser"]] if record["loser"] != NO_PLAYER else ""
+        return {"Hands": hands, "Actions": actions, "Winner": winner, "Loser": loser}
+
+    def __iter__(self):
+        return iter(range(1, self.num_rounds + 1))
+
+    def __len__(self):
+        return self.num_rounds
+
+
+class GameHistoryBatch:
+    """
+    Many game histories stored in one contiguous pair of ACTION_DTYPE and ROUND_DTYPE arrays
+    """
+    def __init__(self, player_names, actions, rounds, game_action_offsets, game_round_offsets):
+        """
+        player_names: list of tuples of the two player names of each game
+        actions: ACTION_DTYPE array of every game's actions, grouped by game
+        rounds: ROUND_DTYPE array of every game's rounds, grouped by game
+        game_action_offsets: (G + 1,) array, game g's actions are actions[game_action_offsets[g]:game_action_offsets[g + 1]]
+        game_round_offsets: (G + 1,) array, game g's rounds are rounds[game_round_offsets[g]:game_round_offsets[g + 1]]
+        """
+        self.player_names = player_names
+        self.actions = actions
+        self.rounds = rounds
+        self.game_action_offsets = game_action_offsets
+        self.game_round_offsets = game_round_offsets
+
+    @classmethod
+    def from_histories(cls, histories):
+        """
+        histories: list of GameHistory objects
+
+        Return GameHistoryBatch holding a copy of every history, numbered in order
+        """
+        game_action_offsets = np.zeros(len(histories) + 1, dtype=np.int64)
+        game_round_offsets = np.zeros(len(histories) + 1, dtype=np.int64)
+        game_action_offsets[1:] = np.cumsum([history.num_actions for history in histories])
+        game_round_offsets[1:] = np.cumsum([history.num_rounds for history in histories])
+
+        actions = np.empty(game_action_offsets[-1], dtype=ACTION_DTYPE)
+        rounds = np.empty(game_round_offsets[-1], dtype=ROUND_DTYPE)
+        for game, history in enumerate(histories):
+            game_actions = actions[game_action_offsets[game]:game_action_offsets[game + 1]]
+            game_actions[:] = history.actions_array()
+            game_actions["game"] = game
+            game_rounds = rounds[game_round_offsets[game]:game_round_offsets[game + 1]]
+            game_rounds[:] = history.rounds_array()
+            game_rounds["game"] = game
+
+        return cls([history.player_names for history in histories], actions, rounds, game_action_offsets, game_round_offsets)
+
+    def __len__(self):
+        return len(self.player_names)
+
+    def __getitem__(self, game):
+        """
+        Return GameHistory viewing game number `game` of the batch
+        """
+        actions = self.actions[self.game_action_offsets[game]:self.game_action_offsets[game + 1]]
+        rounds = self.rounds[self.game_round_offsets[game]:self.game_round_offsets[game + 1]]
+        return GameHistory.from_arrays(self.player_names[game], actions, rounds, game)
@@ -1,15 +1,25 @@
 from model import *
 from agents import *
 from parse import *
+from rendering import render_figures, render_round_figures
+from results_cache import ResultsCache, game_stats_key
+from aggregation import GroupedStats
 import matplotlib.pyplot as plt
 import os
+import sys
 import numpy as np
 
-def plot_games(human_games, main_save_folder, human = True):
+def plot_games(human_games, main_save_folder, human = True, probability_method = "conditional", render = True, num_workers = None, pdf = False, results_cache = None):
     """
     human_games: list of LiarsDiceGame objects
-
-    Wrapper function to plot games in human_games using plot_game()
+    probability_method: str passed to plot_game()
+    render: boolean. If False only the game statistics are computed, no figure is drawn or saved
+    num_workers: int of number of processes drawing the round level figures (default os.cpu_count())
+    pdf: boolean. If True the round level figures are pages of one `round_level.pdf` instead of one png each
+    results_cache: ResultsCache the game_stats of every game are read from and saved to (see results_cache.py). None recomputes every game
+
+    Wrapper function to plot games in human_games using plot_game(). Statistics of every game are computed first, then the round level
+    figures are drawn in a process pool while the aggregate charts are drawn. Round level figures unchanged since the last run are skipped
     """
     # save_root = './Results/'
     # run = 1
@@ -24,43 +34,55 @@ def plot_games(human_games, main_save_folder, human = True):
     non_challenge_values = []
     challenge_implied_bluffs = []
     non_challenge_implied_bluffs = []
-    num_dice_num_bids_dict = {}
-    diff_dice_num_bids_dict = {}
-    info_advantage_dict = {}
+    # observations grouped by total dice on the board, difference in hand sizes and (again) difference in hand sizes
+    num_dice_num_bids_dict = GroupedStats()
+    diff_dice_num_bids_dict = GroupedStats()
+    info_advantage_dict = GroupedStats()
+    round_figures = []
     for game_num, game_obj in enumerate(human_games):
         
         
         readable_game_number = game_num + 1
         print(f"game: {readable_game_number}")
             
-        game_stats = plot_game(game_obj, "Me", "Subject", main_save_folder, readable_game_number, plot = human)
+        plot = human and render
+        if results_cache is None:
+            game_stats = plot_game(game_obj, "Me", "Subject", main_save_folder, readable_game_number, plot = plot, probability_method = probability_method, render = False)
+        else:
+            key = game_stats_key(game_obj, "Me", "Subject", readable_game_number, plot, probability_method, plot_game)
+            game_stats = results_cache.get(key, main_save_folder)
+            if game_stats is None:
+                game_stats = plot_game(game_obj, "Me", "Subject", main_save_folder, readable_game_number, plot = plot, probability_method = probability_method, render = False)
+                results_cache.put(key, game_stats, main_save_folder)
+        round_figures += game_stats["round_figures"]
         challenge_values += game_stats["challenge_probs"]
         non_challenge_values += game_stats["non_challenge_probs"]
         challenge_implied_bluffs += game_stats["challenge_implied_bluffs"]
         non_challenge_implied_bluffs += game_stats["non_challenge_implied_bluffs"]
-        combine_dicts(num_dice_num_bids_dict, game_stats["num_dice_num_bids"])
-        combine_dicts(diff_dice_num_bids_dict, game_stats["diff_dice_num_bids"])
-        combine_dicts(info_advantage_dict, game_stats["info_advantage"])
+        num_dice_num_bids_dict.merge(game_stats["num_dice_num_bids"])
+        diff_dice_num_bids_dict.merge(game_stats["diff_dice_num_bids"])
+        info_advantage_dict.merge(game_stats["info_advantage"])
         # if game_num == 2:
         #     break
     
-    plot_challenge_hist(challenge_values, non_challenge_values, main_save_folder, bluffs = False, human = human)
-    plot_challenge_hist(challenge_implied_bluffs, non_challenge_implied_bluffs, main_save_folder, bluffs = True, human=human)
+    if round_figures:
+        round_level_folder = os.path.join(main_save_folder, 'round_level')
+        os.makedirs(round_level_folder, exist_ok=True)
+        pdf_path = os.path.join(main_save_folder, 'round_level.pdf') if pdf else None
+        render_job = render_round_figures(round_figures, os.path.join(round_level_folder, 'manifest.json'), num_workers, pdf_path)
+    if render:
+        plot_challenge_hist(challenge_values, non_challenge_values, main_save_folder, bluffs = False, human = human)
+        plot_challenge_hist(challenge_implied_bluffs, non_challenge_implied_bluffs, main_save_folder, bluffs = True, human=human)
 
     # plt_name = main_save_folder + f'/num_dice_num_bids.png'
     # plot_dict(num_dice_num_bids_dict, "Human Data: Distribution of Number of Bids (Split by Total Dice on Board)", "Number of Bids", "Frequency", plt_name, "Total Dice on Board")
     # plt_name = main_save_folder + f'/diff_dice_num_bids.png'
     # plot_dict(diff_dice_num_bids_dict, "Human Data: Distribution of Number of Bids (Split by difference in Player Hands lengths)", "Number of Bids", "Frequency", plt_name, "Difference in Hands Length")
+    if round_figures:
+        render_job.wait()
     print(f"saved to {main_save_folder}")
     return (num_dice_num_bids_dict, diff_dice_num_bids_dict, info_advantage_dict)
 
-def combine_dicts(main, addition):
-    for key, values in addition.items():
-        if key in main:
-            main[key].extend(values)
-        else:
-            main[key] = values
-
 def plot_dict(dict_, title, xlabel, ylabel, plt_name, legend_name):
     # Plotting the histogram
     # plt.figure(figsize=(10, 6))
@@ -75,7 +97,7 @@ def plot_dict(dict_, title, xlabel, ylabel, plt_name, legend_name):
 
     # Plotting the mean values with annotations
     plt.figure(figsize=(10, 6))
-    means = {key: np.mean(values) for key, values in dict_.items()}
+    means = dict(zip(dict_.groups().tolist(), dict_.means()))
     bars = plt.bar(range(len(means)), means.values())
     plt.title("Mean of " + title)
     plt.xlabel(legend_name)
@@ -102,20 +124,24 @@ def plot_dicts(dicts, title, xlabel, ylabel, plt_name, legend_names):
     if len(legend_names) != len(dicts):
         raise ValueError("The number of legend names must match the number of dictionaries")
 
+    # every GroupedStats is drawn over the keys of all of them, keys a GroupedStats has no observations of get no bar
+    all_keys = np.unique(np.concatenate([dict_.groups() for dict_ in dicts])) if dicts else np.zeros(0)
     for idx, dict_ in enumerate(dicts):
         # Calculate means
-        means = {key: np.mean(values) for key, values in dict_.items()}
+        means = np.full(len(all_keys), np.nan)
+        means[np.searchsorted(all_keys, dict_.groups())] = dict_.means()
         
         # Create an offset for bars to avoid overlap
         offset = 0.2 * idx
         
         # Create bars for each dictionary
-        bars = plt.bar([x + offset for x in range(len(means))], means.values(), width=0.2, color=colors[idx], label=legend_names[idx])
+        bars = plt.bar([x + offset for x in range(len(means))], means, width=0.2, color=colors[idx], label=legend_names[idx])
         
         # Adding the y-value annotations on top of each bar
         for bar in bars:
             yval = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2, yval, round(yval, 2), ha='center', va='bottom')
+            if not np.isnan(yval):
+                plt.text(bar.get_x() + bar.get_width()/2, yval, round(yval, 2), ha='center', va='bottom')
 
     # Set chart title and labels
     plt.title(title)
@@ -124,7 +150,7 @@ def plot_dicts(dicts, title, xlabel, ylabel, plt_name, legend_names):
 
     # Adjust x-ticks to be in the center of grouped bars
     if dicts:
-        plt.xticks([r + offset/2 for r in range(len(dicts[0]))], list(dicts[0].keys()))
+        plt.xticks([r + offset/2 for r in range(len(all_keys))], all_keys.tolist())
 
     # Add legend
     plt.legend(title="Legend")
@@ -170,33 +196,36 @@ def plot_challenge_hist(challenge_values, non_challenge_values, main_save_folder
 
     plt.legend()
     plt.savefig(plt_name)
+    plt.close()
 
     # Show or save the plot
     # plt.show() 
     print(f"saved to {main_save_folder}")
 
 
-def plot_game(game_obj, player1_name, player2_name, game_save_folder, game_number, plot = True):
+def plot_game(game_obj, player1_name, player2_name, game_save_folder, game_number, plot = True, probability_method = "conditional", render = True):
     """
     game_obj: LiarsDiceGame object
     player1_name: str player1's name
     player2_name: str player2's name
     game_save_folder: str of folder to save to
     game_number: int of the game number being played
+    plot: boolean. If True the round level figures are described in game_stats["round_figures"] (see rendering.py)
+    probability_method: str. "conditional" estimates the observer's probabilities from the latest bid only,
+        "belief" from every bid of the opponent in the round (see belief.py)
+    render: boolean. If True (and `plot`) the round level figures are saved before returning, otherwise the caller renders them
     """
 
     game_stats = {"challenge_probs": [], "non_challenge_probs": [], 
                   "challenge_implied_bluffs": [], "non_challenge_implied_bluffs": [],
-                  "num_dice_num_bids": {},
-                  "diff_dice_num_bids": {},
-                  "info_advantage": {},
+                  "num_dice_num_bids": GroupedStats(capacity=16),
+                  "diff_dice_num_bids": GroupedStats(capacity=16),
+                  "info_advantage": GroupedStats(capacity=16),
+                  "round_figures": [],
                   }
 
     history = game_obj.game_history
     for round_num in history:
-        if plot:
-            plt.figure(figsize=(10, 6))
-
         actions = history[round_num]['Actions']
         if len(actions) > 0:
             
@@ -206,6 +235,7 @@ def plot_game(game_obj, player1_name, player2_name, game_save_folder, game_numbe
             hand_2_num_dice = len(dice_dict_to_sorted_list(hand2_dict))
             hand1 = LiarsDiceHand(player1_name, hand1_dict, hand_2_num_dice)
             hand2 = LiarsDiceHand(player2_name, hand2_dict, hand_1_num_dice)
+            beliefs = {player1_name: BeliefState(hand1), player2_name: BeliefState(hand2)} if probability_method == "belief" else {}
             if round_num == 1:
                 modelGame = LiarsDiceGame(hand1, hand2)
             else:
@@ -214,15 +244,8 @@ def plot_game(game_obj, player1_name, player2_name, game_save_folder, game_numbe
             num_bids = len(actions) - 1
             num_dice = len(hand1) + len(hand2)
             diff_dice = abs(len(hand1) - len(hand2))
-            if num_dice in game_stats["num_dice_num_bids"]:
-                game_stats["num_dice_num_bids"][num_dice].append(num_bids)
-            else:
-                game_stats["num_dice_num_bids"][num_dice] = [num_bids]
-
-            if diff_dice in game_stats["diff_dice_num_bids"]:
-                game_stats["diff_dice_num_bids"][diff_dice].append(num_bids)
-            else:
-                game_stats["diff_dice_num_bids"][diff_dice] = [num_bids]
+            game_stats["num_dice_num_bids"].add(num_dice, num_bids)
+            game_stats["diff_dice_num_bids"].add(diff_dice, num_bids)
             
 
             observing_probabilities = []
@@ -249,13 +272,17 @@ def plot_game(game_obj, player1_name, player2_name, game_save_folder, game_numbe
                     observer_expected_opponent_bluff_prob = observer_hand_object.expected_opponent_bluff_prob()
                     rounded_observer_expected_opponent_bluff_prob = round(observer_expected_opponent_bluff_prob, 2)
                     observing_bluff_probabilities.append(rounded_observer_expected_opponent_bluff_prob)
-                    observer_prob_bid_correct = observer_hand_object.compute_conditional_probability_correct(bid, observer_expected_opponent_bluff_prob)
+                    if beliefs:
+                        beliefs[observer_hand_object.name].update(bid)
+                        observer_prob_bid_correct = beliefs[observer_hand_object.name].probability_correct(bid)
+                    else:
+                        observer_prob_bid_correct = observer_hand_object.compute_conditional_probability_correct(bid, observer_expected_opponent_bluff_prob)
                     observing_probabilities.append(observer_prob_bid_correct)
                     bidder_prob_bid_correct = bidder_hand_object.compute_truthful_probability_correct(bid)
                     bidding_probabilities.append(bidder_prob_bid_correct)
                     
                     # int_implied_bluffs = int(bid.bid_quantity - bidder_hand_object.compute_expected_board_quantities()[bid.bid_value])
-                    int_implied_bluffs = int(bid.bid_quantity - bidder_hand_object.user_dice_dict[bid.bid_value])
+                    int_implied_bluffs = int(bid.bid_quantity - bidder_hand_object.quantity_of_value(bid.bid_value))
                     implied_bluffs_percentage = int_implied_bluffs / (len(bidder_hand_object) + len(observer_hand_object))
                     # bidder_non_value_dice = len(bidder_hand_object) - bidder_hand_object.user_dice_dict[bid.bid_value]
                     # bidder_implied_bluff_prob = implied_bluffs / bidder_non_value_dice
@@ -276,7 +303,10 @@ def plot_game(game_obj, player1_name, player2_name, game_save_folder, game_numbe
                         challanger_hand_object = hand2
                         bidder_hand_object = hand1
                     challenger_bluff_prob = challanger_hand_object.expected_opponent_bluff_prob()
-                    challenger_prob_bid_correct = challanger_hand_object.compute_conditional_probability_correct(bid, challenger_bluff_prob)
+                    if beliefs:
+                        challenger_prob_bid_correct = beliefs[challanger_hand_object.name].probability_correct(bid)
+                    else:
+                        challenger_prob_bid_correct = challanger_hand_object.compute_conditional_probability_correct(bid, challenger_bluff_prob)
                     game_stats["challenge_probs"].append(challenger_prob_bid_correct)
                     game_stats["non_challenge_probs"] += observing_probabilities[:-1]
                     game_stats["challenge_implied_bluffs"].append(implied_bluffs[-1])
@@ -297,39 +327,22 @@ def plot_game(game_obj, player1_name, player2_name, game_save_folder, game_numbe
                         information_advandage_winner = 0
 
                     if diff_dice != 0:
-                        if diff_dice in game_stats["info_advantage"]:
-                            game_stats["info_advantage"][diff_dice].append(information_advandage_winner)
-                        else:
-                            game_stats["info_advantage"][diff_dice] = [information_advandage_winner]
+                        game_stats["info_advantage"].add(diff_dice, information_advandage_winner)
                             
 
                 else:
                     raise NameError(f"Invalid action")
 
             if plot:
-                plt.plot(range(1, len(observing_probabilities) + 1), observing_probabilities, marker='o', label=f"Observer - Observing_player: observer's estimation of bid_player_bluff_probability")
-                plt.plot(range(1, len(bidding_probabilities) + 1), bidding_probabilities, marker='o', label=f'Bidder -  Bidding_player: (bid quantity, bid value, bid true?)')
-                for i, bid_label in enumerate(bidder_label):
-                    x = i + 1  # Adjust x-coordinate for the bid_label
-                    y = bidding_probabilities[i]  # y-coordinate from your data
-                    plt.text(x, y, bid_label, ha='center', va='bottom')  # Adjust alignment as needed
-                for i, obs_label in enumerate(observer_label):
-                    x = i + 1  # Adjust x-coordinate for the obs_label
-                    y = observing_probabilities[i]  # y-coordinate from your data
-                    plt.text(x, y, obs_label, ha='center', va='top')  # Adjust alignment as needed
-
-                plt.xlabel('Bid Number')
-                plt.ylabel('Probability Bid Correct')
-                plt.title(f'Game {game_number}, Round {round_num} Probability Bid Correct. \n {player1_name} hand ({hand_1_num_dice} dice) = {hand1_dict}, \n {player2_name} hand ({hand_2_num_dice} dice) = {hand2_dict}')
-                plt.grid(True)
-                plt.xticks(range(0, 8))
-                plt.yticks([i * 0.1 for i in range(11)])
-                plt.legend()  # This adds the legend with round_num numbers
-                
-                plt_name = os.path.join(game_save_folder, f"round_level/Game_{game_number}_Round_{round_num}_Bid_Probs.png")  # Use an appropriate file extension
-                plt.savefig(plt_name)
-                plt.close()
-           
+                game_stats["round_figures"].append({
+                    "observing_probabilities": observing_probabilities, "bidding_probabilities": bidding_probabilities,
+                    "bidder_label": bidder_label, "observer_label": observer_label,
+                    "title": f'Game {game_number}, Round {round_num} Probability Bid Correct. \n {player1_name} hand ({hand_1_num_dice} dice) = {hand1_dict}, \n {player2_name} hand ({hand_2_num_dice} dice) = {hand2_dict}',
+                    "path": os.path.join(game_save_folder, f"round_level/Game_{game_number}_Round_{round_num}_Bid_Probs.png"),
+                })
+
+    if plot and render:
+        render_figures(game_stats["round_figures"])
     return game_stats
 
 
@@ -337,20 +350,17 @@ def plot_game(game_obj, player1_name, player2_name, game_save_folder, game_numbe
 if __name__ == "__main__":
     # plt.close()
     
-    save_root = './Results/'
-    run = 1
-    main_save_folder = save_root + f'run{run}'
-    while os.path.exists(main_save_folder):
-        run += 1
-        main_save_folder = save_root + f'run{run}'
-    #create save folder
-    os.makedirs(main_save_folder)
-    os.makedirs(f'{main_save_folder}/round_level')
+    # `python human_model_comp.py [folder]`. Every run writes to the same folder, so round level figures already rendered
+    # by an earlier run are skipped (see rendering.py)
+    main_save_folder = sys.argv[1] if len(sys.argv) > 1 else './Results/latest'
+    os.makedirs(f'{main_save_folder}/round_level', exist_ok=True)
     
     file_name = './HumanData/30OrganizedData.csv'
     human_games = parse_game(file_name, True)
 
-    human_num_dice_num_bids_dict, human_diff_dice_num_bids_dict, human_info_advantage_dict = plot_games(human_games, main_save_folder, human = True)
+    # game_stats of games already analyzed in an earlier run are read from the cache
+    results_cache = ResultsCache()
+    human_num_dice_num_bids_dict, human_diff_dice_num_bids_dict, human_info_advantage_dict = plot_games(human_games, main_save_folder, human = True, results_cache = results_cache)
 
     
     player1_name = "Me"
@@ -358,8 +368,10 @@ if __name__ == "__main__":
     simulated_games = []
 
     for i in range(100):
-        simulated_games.append(simulate_game(player1_name, player2_name, "conditional"))
-    simulated_num_dice_num_bids_dict, simulated_diff_dice_num_bids_dict, simulated_info_advantage_dict = plot_games(simulated_games, main_save_folder, human = False)
+        # seeded, so the simulated games are the same every run and their game_stats are cached too
+        simulated_games.append(simulate_game(player1_name, player2_name, "conditional", seed = i))
+    simulated_num_dice_num_bids_dict, simulated_diff_dice_num_bids_dict, simulated_info_advantage_dict = plot_games(simulated_games, main_save_folder, human = False, results_cache = results_cache)
+    print(results_cache)
 
 
     
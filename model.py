@@ -1,10 +1,21 @@
 import numpy as np
-import random
-from scipy.stats import binom
 import math
 import itertools
+import json
+import os
 from collections import Counter
 from math import factorial
+from probability import hand_space, binomial_survival
+from events import NULL_SINK
+from game_state import GameHistory, ACTION_BID, ACTION_CHALLENGE
+from rules import Rules, STANDARD_RULES, WILD_ONES_RULES
+from cache import memoize
+from bluff import BluffModel, DEFAULT_BLUFF_MODEL
+from profiling import NULL_PROFILER
+from time import perf_counter
+
+
+MAX_DICE = 6 # most dice a single player can hold
 
 
 def convert_list_to_dict(hand):
@@ -18,17 +29,40 @@ def convert_list_to_dict(hand):
         res[die] += 1
     return res
 
-def create_hand(num_dice):
+def hand_counts(user_dice_dict):
+    """
+    user_dice_dict: dictionary of the quantity of 1,2,..,6 in a hand, or sequence of the 6 quantities
+    
+    Return the compact (6,) int8 array representation of the hand
+    """
+    if isinstance(user_dice_dict, dict):
+        return np.array([user_dice_dict[value] for value in range(1, 7)], dtype=np.int8)
+    return np.array(user_dice_dict, dtype=np.int8)
+
+def require_rng(rng, caller):
+    """
+    rng: numpy Generator passed to `caller`
+    caller: str name of the drawing function, for the error message
+
+    Return `rng`. Raise ValueError if it is None: every draw comes from a Generator owned by the caller (e.g. a game's seeded
+    streams), never from the process wide `random` module, so seeded games don't depend on anything else in the process
     """
-    num_dice: int [1, 5] of number of dice to roll
+    if rng is None:
+        raise ValueError(f"{caller} needs a numpy Generator to draw from.")
+    return rng
+
+def create_hand(num_dice, rng=None, num_rolled=None):
+    """
+    num_dice: int [1, MAX_DICE] of number of dice to roll
+    rng: numpy Generator the dice are drawn from (required, see `require_rng`)
+    num_rolled: int of number of dice drawn from `rng`, of which the first `num_dice` are kept (default `num_dice`).
+        Drawing the same number every roll keeps `rng` at the same position each round however many dice the player has left
 
     return a return the dictionary representation of `hand` with `num_dice`
     """
-    if not 0 <= num_dice <= 5:
-        raise ValueError(f"Choose number between 0-5 for dice number. You chose {num_dice}.")
-    hand =[]
-    for i in range(num_dice):
-        hand.append(random.randint(1, 6))
+    if not 0 <= num_dice <= MAX_DICE:
+        raise ValueError(f"Choose number between 0-{MAX_DICE} for dice number. You chose {num_dice}.")
+    hand = require_rng(rng, "create_hand").integers(1, 7, size=max(num_dice, num_rolled or 0))[:num_dice].tolist()
     return convert_list_to_dict(hand)
 
 def dice_dict_to_sorted_list(dice_dict):
@@ -43,9 +77,10 @@ def dice_dict_to_sorted_list(dice_dict):
     dice_list.sort()
     return dice_list
 
-def select_random_dice(user_dice_dict):
+def select_random_dice(user_dice_dict, rng=None):
     """
     user_dice_dict: dict with keys from 1 to 6 and values as the count of dice of that value
+    rng: numpy Generator the die is drawn with (required, see `require_rng`)
     returns a randomly selected die from the user's hand
     """
     all_dice = []
@@ -55,65 +90,185 @@ def select_random_dice(user_dice_dict):
     if not all_dice:
         raise ValueError("No dice in hand to select.")
 
-    return random.choice(all_dice)
+    return all_dice[require_rng(rng, "select_random_dice").integers(len(all_dice))]
 
+def weighted_choice(options, weights, rng=None):
+    """
+    options: sequence of options
+    weights: sequence of non-negative relative weights of `options`
+    rng: numpy Generator the option is drawn with (required, see `require_rng`)
 
-memo_list_hands = {}  #keys are `user_num_dice`, values are list of dictionaries of all possible hands of with `user_num_dice` dice
+    Return one option drawn with probability proportional to its weight
+    """
+    cumulative_weights = np.cumsum(weights)
+    index = int(np.searchsorted(cumulative_weights, require_rng(rng, "weighted_choice").random() * cumulative_weights[-1], side='right'))
+    return options[min(index, len(options) - 1)]
 
+
+# memoized in the "list_hands" LRU cache (see cache.py), keys are `user_num_dice`
+@memoize("list_hands", key=lambda user_num_dice: user_num_dice, maxsize=MAX_DICE + 1, persistent=False)
 def all_possible_list_hands(user_num_dice):
     """
-    user_num_dice: int [1, 5] of number of dice to in user hand
+    user_num_dice: int [1, MAX_DICE] of number of dice to in user hand
 
     return a list of all possible lists of `user_num_dice` integers randomly generated between 1 and 6
     """
-    if not 0 <= user_num_dice <= 5:
-        raise ValueError(f"Choose number between 0-5 for dice number. You chose {user_num_dice}.")
-    
-    if user_num_dice in memo_list_hands:
-        return memo_list_hands[user_num_dice]
+    if not 0 <= user_num_dice <= MAX_DICE:
+        raise ValueError(f"Choose number between 0-{MAX_DICE} for dice number. You chose {user_num_dice}.")
 
     dice_range = range(1, 7)  # Dice numbers from 1 to 6
     hands = [convert_list_to_dict(hand) for hand in itertools.combinations_with_replacement(dice_range, user_num_dice)]
 
-    memo_list_hands[user_num_dice] = hands
-
     return hands
 
-memo_toy_hand_objects = {} #keys are tuples (`user_num_dice`, `opponent_num_dice`), values are list of all possible hand_objects
-
+# memoized in the "toy_hand_objects" LRU cache, keys are tuples (`user_num_dice`, `opponent_num_dice`). Bounded since each entry holds up to 462 hands
+@memoize("toy_hand_objects", key=lambda user_num_dice, opponent_num_dice: (user_num_dice, opponent_num_dice), maxsize=16, persistent=False)
 def all_possible_toy_hand_objects(user_num_dice, opponent_num_dice):
     """
-    user_num_dice: int [1, 5] of number of dice in user hand
-    opponent_num_dice: int [1, 5] of number of dice in opponent hand
+    user_num_dice: int [1, MAX_DICE] of number of dice in user hand
+    opponent_num_dice: int [1, MAX_DICE] of number of dice in opponent hand
 
     return a list of all LiarsDiceHand objects with `user_num_dice` and opponent_num_dice
     """
 
-    if not 0 <= user_num_dice <= 5:
-        raise ValueError(f"Choose number between 0-5 for `user_num_dice`. You chose {user_num_dice}.")
-    
-    if not 0 <= opponent_num_dice <= 5:
-        raise ValueError(f"Choose number between 0-5 for `opponent_num_dice`. You chose {opponent_num_dice}.")
+    if not 0 <= user_num_dice <= MAX_DICE:
+        raise ValueError(f"Choose number between 0-{MAX_DICE} for `user_num_dice`. You chose {user_num_dice}.")
     
-    key = (user_num_dice, opponent_num_dice)
-    if key in memo_toy_hand_objects:
-        return memo_toy_hand_objects[key]
+    if not 0 <= opponent_num_dice <= MAX_DICE:
+        raise ValueError(f"Choose number between 0-{MAX_DICE} for `opponent_num_dice`. You chose {opponent_num_dice}.")
 
     hand_objects = []
     for list_hand in all_possible_list_hands(user_num_dice):
         hand_objects.append(LiarsDiceHand('Toy', list_hand, opponent_num_dice))
 
-    memo_toy_hand_objects[key] = hand_objects
-
     return hand_objects
 
 
+CONDITIONAL_TABLE_VERSION = 1
+conditional_table_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Tables', 'conditional_probability_table.json')
+conditional_probability_table = None #loaded lazily from `conditional_table_path`, keys are from `conditional_table_key`
+
+def conditional_table_key(observer_value_count, observer_num_dice, opponent_num_dice, bid_quantity, s2_expected_bluff_prob):
+    """
+    observer_value_count: int of dice in the observer's hand equal to the bid value
+    observer_num_dice: int of number of dice in the observer's hand
+    opponent_num_dice: int of number of dice in the bidding player's hand
+    bid_quantity: int of bidding quantity
+    s2_expected_bluff_prob: probability that the observer assigned to the bidding player bluffing
+
+    Return the canonical key of the conditional probability table.
+    The conditional probability is symmetric over dice values, so the observer's counts collapse to the count of the bid value
+    and the bid collapses to its quantity
+    """
+    return (int(observer_value_count), int(observer_num_dice), int(opponent_num_dice), int(bid_quantity), round(s2_expected_bluff_prob, 12))
+
+def build_conditional_probability_table(max_dice=5, bluff_probs=None, bluff_model=DEFAULT_BLUFF_MODEL):
+    """
+    max_dice: int of the largest hand size (for both observer and bidding player) covered by the table
+    bluff_probs: list of bluff probabilities to cover. None covers the `expected_opponent_bluff_prob` of every observer with `bluff_model`
+    bluff_model: BluffModel of the observers when `bluff_probs` is None (see bluff.py)
+
+    Return dictionary of the exact conditional probability of every bid for every observer state, keyed by `conditional_table_key`
+    """
+    table = {}
+    for observer_num_dice in range(1, max_dice + 1):
+        for opponent_num_dice in range(1, max_dice + 1):
+            if bluff_probs is None:
+                table_bluff_probs = [bluff_model.expected_opponent_bluff_prob(opponent_num_dice)]
+            else:
+                table_bluff_probs = bluff_probs
+            for observer_value_count in range(observer_num_dice + 1):
+                # any hand with `observer_value_count` dice of value 1 represents every hand with that many of the bid value
+                observer_hand = LiarsDiceHand('Toy', {1: observer_value_count, 2: observer_num_dice - observer_value_count, 3: 0, 4: 0, 5: 0, 6: 0}, opponent_num_dice)
+                for bid_quantity in range(1, observer_num_dice + opponent_num_dice + 1):
+                    bid = Bid(bid_quantity, 1)
+                    for s2_expected_bluff_prob in table_bluff_probs:
+                        key = conditional_table_key(observer_value_count, observer_num_dice, opponent_num_dice, bid_quantity, s2_expected_bluff_prob)
+                        table[key] = observer_hand.exact_conditional_probability_correct(bid, s2_expected_bluff_prob)
+    return table
+
+def save_conditional_probability_table(table, path=conditional_table_path):
+    """
+    table: dictionary returned by `build_conditional_probability_table`
+    path: str of the json file to write
+
+    Save `table` along with `CONDITIONAL_TABLE_VERSION`
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    entries = [list(key) + [prob] for key, prob in sorted(table.items())]
+    with open(path, 'w') as f:
+        json.dump({"version": CONDITIONAL_TABLE_VERSION, "entries": entries}, f)
+
+def load_conditional_probability_table(path=conditional_table_path):
+    """
+    path: str of the json file written by `save_conditional_probability_table`
+
+    Return the table stored in `path`. Raise ValueError if it was built by a different `CONDITIONAL_TABLE_VERSION`
+    """
+    with open(path) as f:
+        stored = json.load(f)
+    if stored.get("version") != CONDITIONAL_TABLE_VERSION:
+        raise ValueError(f"Conditional probability table {path} has version {stored.get('version')}, expected {CONDITIONAL_TABLE_VERSION}. Rebuild it with `python model.py`.")
+    
+    table = {}
+    for observer_value_count, observer_num_dice, opponent_num_dice, bid_quantity, s2_expected_bluff_prob, prob in stored["entries"]:
+        key = conditional_table_key(observer_value_count, observer_num_dice, opponent_num_dice, bid_quantity, s2_expected_bluff_prob)
+        table[key] = prob
+    return table
+
+def get_conditional_probability_table():
+    """
+    Return the conditional probability table, loading it from `conditional_table_path` the first time it is needed.
+    If no table has been built the table is empty and every lookup uses the exact computation
+    """
+    global conditional_probability_table
+    if conditional_probability_table is None:
+        if os.path.exists(conditional_table_path):
+            conditional_probability_table = load_conditional_probability_table(conditional_table_path)
+        else:
+            conditional_probability_table = {}
+    return conditional_probability_table
+
+def clear_conditional_tables():
+    """
+    Forget the loaded conditional probability tables (of every rules variant), so the next lookup reads them from disk again
+    """
+    global conditional_probability_table
+    conditional_probability_table = None
+    for rules in (STANDARD_RULES, WILD_ONES_RULES):
+        rules.clear_conditional_tables()
+
+
+
+def legal_bid_mask(previous_bid, max_quantity, rules=STANDARD_RULES):
+    """
+    previous_bid: Bid object of previous bid. None if any bid is legal
+    max_quantity: int of the largest bidding quantity (total dice on the board)
+    rules: Rules the value ranks are read from
+
+    Return boolean (max_quantity, 6) array where entry [quantity - 1, value - 1] is True if Bid(quantity, value) raises `previous_bid`
+    (either a higher quantity of the same value, or any quantity of a higher ranked value)
+    """
+    quantities = np.arange(1, max_quantity + 1)[:, np.newaxis]
+    values = np.arange(1, 7)[np.newaxis, :]
+    if previous_bid is None:
+        return np.ones((max_quantity, 6), dtype=bool)
+    value_ranks = rules.value_ranks[values]
+    previous_rank = rules.value_ranks[previous_bid.bid_value]
+    return (value_ranks > previous_rank) | ((values == previous_bid.bid_value) & (quantities > previous_bid.bid_quantity))
+
 
 class LiarsDiceGame:
-    def __init__(self, player1_hand_object, player2_hand_object):
+    def __init__(self, player1_hand_object, player2_hand_object, event_sink=None, rng=None, profiler=None):
         """
         player1_hand_object: player1's LiarsDiceHand
         player2_hand_object: player2's LiarsDiceHand
+        event_sink: object with an `emit(event, **fields)` method that receives every bid and challenge (see events.py). 
+            None drops every event
+        rng: numpy Generator `construct_bid` draws bids with. None if every bid is drawn with the Generator passed to `construct_bid`
+        profiler: Profiler timing the game's phases (see profiling.py). None times nothing
         
         Initalize a Game of Liars Dice. Player1 will query first by default
         """
@@ -128,26 +283,21 @@ class LiarsDiceGame:
         self.turn = self.player1_name
         self.round_number = 1
         self.game_over = False
+        self.event_sink = NULL_SINK if event_sink is None else event_sink
+        self.rng = rng
+        self.profiler = NULL_PROFILER if profiler is None else profiler
 
-        # dictionary of game history
+        # game history, array backed with one record per action and per round that reads like a dictionary (see game_state.py)
         # keys: round #
         # values: dictionary of information in that round
             # keys: "Hands", "Actions", "Winner", "Loser"
             # values:
-                # Names and Hands of the players: {"Name" : hand(list)}
+                # Names and Hands of the players: {"Name" : hand(dict)}
                 # Bids: ["Bid", bidding player, bid dice quantity, bid dice value, correct bid?] 
                 #   / Challenges: ["Challenge", challenging player, bid dice quantity challenged, bid dice value challenged, successful challenge?]
                 # Winner: "Winner Name"
                 # Loser: "Loser Name"
-        self.game_history = {1: {"Hands": {}, "Actions":[], "Winner": "", "Loser": ""}, 
-                             2: {"Hands": {}, "Actions":[], "Winner": "", "Loser": ""}, 
-                             3: {"Hands": {}, "Actions":[], "Winner": "", "Loser": ""}, 
-                             4: {"Hands": {}, "Actions":[], "Winner": "", "Loser": ""}, 
-                             5: {"Hands": {}, "Actions":[], "Winner": "", "Loser": ""}, 
-                             6: {"Hands": {}, "Actions":[], "Winner": "", "Loser": ""}, 
-                             7: {"Hands": {}, "Actions":[], "Winner": "", "Loser": ""}, 
-                             8: {"Hands": {}, "Actions":[], "Winner": "", "Loser": ""}, 
-                             9: {"Hands": {}, "Actions":[], "Winner": "", "Loser": ""}}
+        self.game_history = GameHistory((self.player1_name, self.player2_name))
     
     def valid(self, player1_hand_object, player2_hand_object):
         """
@@ -174,7 +324,7 @@ class LiarsDiceGame:
         assert bidding_player == self.turn, f'bidding_player: {bidding_player}, turn: {self.turn}'
 
         is_bid_correct = self.correct_bid(bid)
-        self.game_history[self.round_number]["Actions"].append(["Bid", bidding_player, bid.bid_quantity, bid.bid_value, is_bid_correct])
+        self.game_history.add_action(self.round_number, ACTION_BID, bidding_player, bid.bid_quantity, bid.bid_value, is_bid_correct)
 
         # switch turns
         if bidding_player == self.player1_name:
@@ -182,63 +332,38 @@ class LiarsDiceGame:
         else:
             self.turn = self.player1_name
 
-        print(f'{bidding_player} bid {bid.bid_quantity} dice of value {bid.bid_value}. Correct? {is_bid_correct}.')
+        if self.event_sink.enabled:
+            start = perf_counter()
+            self.event_sink.emit("bid", player=bidding_player, quantity=bid.bid_quantity, value=bid.bid_value, correct=is_bid_correct)
+            if self.profiler.enabled:
+                self.profiler.record("events", perf_counter() - start)
 
-    def construct_bid(self, bidding_player, previous_bid):
+    def construct_bid(self, bidding_player, previous_bid, rng=None):
         """
         bidding_player: name of player making the bid
         previous_bid: Bid object of previous round bid. None if we are constructing the first bid
+        rng: numpy Generator the bid is drawn with (default the game's `rng`)
         
-        return Bid object of the newly constructed bid
+        return Bid object of the newly constructed bid, drawn from the bidding player's `bid_distribution`
         """
-        if bidding_player == self.player1_name:
-            player_hand = self.player1_hand_object
-        else:
-            player_hand = self.player1_hand_object
-        
-        #can't raise bid beyond 6
-        max_die_value = 6
-
-        #equal to what player actually has + what the player expects the opponent has
-        expected_board = player_hand.compute_expected_board_quantities()
+        if self.profiler.enabled:
+            start = perf_counter()
+            bid = self.draw_bid(bidding_player, previous_bid, rng)
+            self.profiler.record("construct_bid", perf_counter() - start)
+            return bid
+        return self.draw_bid(bidding_player, previous_bid, rng)
 
-        if previous_bid == None:
-            #assume they choose their first dice at random from the dice they have (so if they have multiple of a dice it has
-            # a larger chance of getting selected)
-            new_bid_value = select_random_dice(player_hand.user_dice_dict)
-            min_quantity = 1
-        else:
-            if previous_bid.bid_value == max_die_value:
-                new_bid_value = previous_bid.bid_value
-                min_quantity = previous_bid.bid_quantity + 1
-            else:
-                # player keeps same bid value if they expect at greater than that quantity that on the board
-                if expected_board[previous_bid.bid_value] > previous_bid.bid_quantity: 
-                    new_bid_value = previous_bid.bid_value
-                    min_quantity = previous_bid.bid_quantity + 1
-                else:
-                    min_quantity = 1
-                    has_valid_value = False
-                    #player finds the value they have nearest (but greater than) the previous bid value
-                    for new_bid_value in range(int(previous_bid.bid_value) + 1, int(max_die_value) + 1):
-                        if player_hand.user_dice_dict[new_bid_value] > 0:
-                            has_valid_value = True
-                            break 
-                    
-                    #player has no dice greater than the current value so they will select a value at randome
-                    if not has_valid_value:
-                        new_bid_value = random.randint(previous_bid.bid_value + 1, max_die_value)
-        
-        expected_board_quantity = expected_board[new_bid_value]
-        player_actual_quantity = player_hand.user_dice_dict[new_bid_value]
-        player_remaining_dice = len(player_hand) - player_actual_quantity
-        #bluff is bernouli probability of bluffing on each remaining dice. In expection you multiply p * n
-        player_bluff_quantity = player_hand.user_bluff_prob() * player_remaining_dice 
-        int_quantity = round(expected_board_quantity + player_bluff_quantity, 0)
-        max_dice_quant = len(player_hand) + player_hand.opponent_num_dice
-        new_bid_quantity = int(max(int_quantity, min_quantity))
+    def draw_bid(self, bidding_player, previous_bid, rng=None):
+        """
+        Return Bid object drawn from the bidding player's `bid_distribution` (see `construct_bid`)
+        """
+        player_hand = self.access_hand(bidding_player)
+        bid_options = player_hand.bid_distribution(previous_bid)
+        if len(bid_options) == 1:
+            return bid_options[0][1]
 
-        return Bid(new_bid_quantity, new_bid_value)
+        bid_probs, bids = zip(*bid_options)
+        return weighted_choice(bids, bid_probs, self.rng if rng is None else rng)
 
     def correct_bid(self, bid):
         """
@@ -264,7 +389,7 @@ class LiarsDiceGame:
             player_hand = self.player1_hand_object
         else:
             player_hand = self.player2_hand_object
-        quantity = player_hand.user_dice_dict[bid.bid_value] 
+        quantity = player_hand.quantity_of_value(bid.bid_value) 
         
         correct = quantity >= bid.bid_quantity
 
@@ -275,23 +400,26 @@ class LiarsDiceGame:
         bid: Bid object
         challenging_player_name: str of player's name that is making the challenge
 
-        Update game state after a bid challenge. Print the number of dice remaining after losing player has lost a dice and
-        both players have rerolled. Also print the winner and loser of this challenge as this determines the player that 
+        Update game state after a bid challenge. Report the number of dice remaining after losing player has lost a dice and
+        both players have rerolled to `self.event_sink`. Also report the winner and loser of this challenge as this determines the player that 
         makes the next bid
         """
         #slightly unintuitive, but self.turn changes after a bid is made
         assert challenging_player_name == self.turn, "Can't challenge your own bid"
+        if self.profiler.enabled:
+            challenge_start = perf_counter()
 
         
         is_correct_bid = self.correct_bid(bid)
         is_successful_challenge = not is_correct_bid
 
         # update game history with current hands and challenge
-        self.game_history[self.round_number]["Hands"][self.player1_name] = self.player1_hand_object.user_dice_dict
-        self.game_history[self.round_number]["Hands"][self.player2_name] = self.player2_hand_object.user_dice_dict
-        self.game_history[self.round_number]["Actions"].append(["Challenge", challenging_player_name, bid.bid_quantity, bid.bid_value, is_successful_challenge])
+        self.game_history.set_hands(self.round_number, self.player1_hand_object.counts, self.player2_hand_object.counts)
+        self.game_history.add_action(self.round_number, ACTION_CHALLENGE, challenging_player_name, bid.bid_quantity, bid.bid_value, is_successful_challenge)
 
         # rerolls and loser gets next turn
+        if self.profiler.enabled:
+            reroll_start = perf_counter()
         if challenging_player_name == self.player1_name:
             if is_correct_bid: # player 1 lost challenge, loses 1 die
                 self.player1_hand_object.decrement_and_reroll(True)
@@ -316,27 +444,31 @@ class LiarsDiceGame:
                 self.turn = self.player1_name
         else:
             raise NameError(f'{challenging_player_name} not valid name. Must be {self.player1_name} or {self.player2_name}')
+        if self.profiler.enabled:
+            self.profiler.record("decrement_and_reroll", perf_counter() - reroll_start)
         
         # current round ends, update game history with results
-        self.game_history[self.round_number]["Winner"] = winner
-        self.game_history[self.round_number]["Loser"] = loser
+        self.game_history.set_result(self.round_number, winner, loser)
         
         self.round_number += 1
 
         remaining_dice_player1 = len(self.player1_hand_object)
         remaining_dice_player2 = len(self.player2_hand_object)
         
-        # print info per the spec
-        print(f'{challenging_player_name} challenged. Challenge successful? {is_successful_challenge}')
-        print(f'Winner of challenge: {winner}. Loser of challenge: {loser}.')
-        print(f'{self.player1_name} has {remaining_dice_player1} dice remaining.')
-        print(f'{self.player2_name} has {remaining_dice_player2} dice remaining.')
-
-        if remaining_dice_player1 > 0 and remaining_dice_player2 > 0:
-            print(f'{self.turn} has the next turn.\n')
-        else:
-            print(f"Game over. {winner} wins, {loser} loses.\n")
+        if remaining_dice_player1 == 0 or remaining_dice_player2 == 0:
             self.game_over = True
+
+        # report info per the spec
+        if self.event_sink.enabled:
+            start = perf_counter()
+            self.event_sink.emit("challenge", player=challenging_player_name, quantity=bid.bid_quantity, value=bid.bid_value, 
+                                 successful=is_successful_challenge, winner=winner, loser=loser, 
+                                 remaining_dice={self.player1_name: remaining_dice_player1, self.player2_name: remaining_dice_player2}, 
+                                 next_turn=self.turn, game_over=self.game_over)
+            if self.profiler.enabled:
+                self.profiler.record("events", perf_counter() - start)
+        if self.profiler.enabled:
+            self.profiler.record("challenge_bid", perf_counter() - challenge_start)
     
     def access_hand(self, player_name):
         """
@@ -365,51 +497,74 @@ class LiarsDiceGame:
         
 
 class LiarsDiceHand:
-    def __init__(self, name, user_dice_dict, opponent_num_dice):
+    __slots__ = ("name", "counts", "num_dice", "opponent_num_dice", "user_challenge_threshold", "rng", "num_rolled", "rules", "bluff_model")
+
+    def __init__(self, name, user_dice_dict, opponent_num_dice, user_challenge_threshold=0.51, rng=None, num_rolled=None, rules=STANDARD_RULES, bluff_model=DEFAULT_BLUFF_MODEL):
         """
-        user_dice_dict: dictionary of the quantity of 1,2,..,6 in user's hand 1 <= dice in user_dice_dict <= 5
-        opponent: integer of opponent's hand size [1, 5] 
+        user_dice_dict: dictionary (or sequence of 6 counts) of the quantity of 1,2,..,6 in user's hand 1 <= dice in user_dice_dict <= MAX_DICE
+        opponent: integer of opponent's hand size, or in games with more than two players the number of dice the user can't see
+        user_challenge_threshold: float, user challenges bids with probability of being correct at or below this threshold
+        rng: numpy Generator the user's rerolls are drawn from. None if the hand is never rerolled
+        num_rolled: int of number of dice drawn from `rng` per reroll (see `create_hand`)
+        rules: Rules the hand is played with (see rules.py), e.g. WILD_ONES_RULES
+        bluff_model: BluffModel of how much the user bluffs and expects the opponent to bluff (see bluff.py)
         
-        Initalize a user's hand
+        Initalize a user's hand. The hand is stored as the (6,) int8 array `self.counts`
         """
-        self.valid(user_dice_dict, opponent_num_dice)
+        counts = hand_counts(user_dice_dict)
+        self.valid(counts, opponent_num_dice)
 
         self.name = name
-        # self.user_num_dice = len(user_hand)
-        # self.user_bluff_prob = 1 / len(user_hand)
-        self.user_dice_dict = user_dice_dict
-        self.user_challenge_threshold = 0.51
+        self.counts = counts
+        self.num_dice = sum(counts.tolist())
+        self.user_challenge_threshold = user_challenge_threshold
+        self.rng = rng
+        self.num_rolled = num_rolled
+        self.rules = rules
+        self.bluff_model = bluff_model
 
         self.opponent_num_dice = opponent_num_dice
-        # uniform_prob = opponent_num_dice / 6 
-        # self.expected_opponent_dice_dict = {1: uniform_prob, 2: uniform_prob, 3: uniform_prob, 4: uniform_prob, 5: uniform_prob, 6: uniform_prob} 
-        # self.expected_opponent_bluff_prob = 1 / opponent_num_dice
+    
+    @property
+    def user_dice_dict(self):
+        """
+        Return dictionary of the quantity of 1,2,..,6 in user's hand
+        """
+        return dict(zip(range(1, 7), self.counts.tolist()))
     
     def user_bluff_prob(self):
-        return (1 / len(self)) ** 2
+        return self.bluff_model.bluff_prob(len(self))
     
     def expected_opponent_bluff_prob(self):
-        return (1 / self.opponent_num_dice) ** 2
+        return self.bluff_model.expected_opponent_bluff_prob(self.opponent_num_dice)
     
+    # memoized per (opponent dice, rules). Callers get a copy, so they can't change the cached dictionary
+    @memoize("expected_opponent_dice_dict", key=lambda hand: (hand.opponent_num_dice, hand.rules.wild_ones), maxsize=64, copy=dict)
     def expected_opponent_dice_dict(self):
+        if self.rules.wild_ones:
+            # every unseen one also counts towards the other values
+            wild_prob = self.opponent_num_dice / 3
+            return {1: self.opponent_num_dice / 6, 2: wild_prob, 3: wild_prob, 4: wild_prob, 5: wild_prob, 6: wild_prob}
         uniform_prob = self.opponent_num_dice / 6 
         return {1: uniform_prob, 2: uniform_prob, 3: uniform_prob, 4: uniform_prob, 5: uniform_prob, 6: uniform_prob} 
 
-    def valid(self, user_dice_dict, opponent_num_dice):
+    def valid(self, counts, opponent_num_dice):
         """
-        user_dice_dict: dictionary of the quantity of 1,2,..,6 in user's hand 1 <= dice in user_dice_dict <= 5
-        opponent: integer of opponent's hand size [1, 5] 
+        counts: (6,) array of the quantity of 1,2,..,6 in user's hand 1 <= dice in counts <= MAX_DICE
+        opponent: integer of number of dice the user can't see
         
         Ensure valid hand configuration
         """
-        user_num_dice = sum(user_dice_dict.values())
+        assert counts.shape == (6,), f"Hand must have a quantity for each of 1,2,..,6: {counts}"
+        counts_list = counts.tolist()
+        assert min(counts_list) >= 0, f"Hand can't have negative quantities: {counts}"
+        user_num_dice = sum(counts_list)
         
 
         assert ((user_num_dice > 0) or (opponent_num_dice > 0)), "At least one player must have positive dice"
         assert (user_num_dice >= 0), "User can't have negative dice"
         assert (opponent_num_dice >= 0), "Opponent can't have negative dice"
-        assert (user_num_dice <= 5), "User can't have more than 5 dice"
-        assert (opponent_num_dice <= 5), "Opponent can't have more than 5 dice"
+        assert (user_num_dice <= MAX_DICE), f"User can't have more than {MAX_DICE} dice"
     
     def decrement_and_reroll(self, user_lost):
         """
@@ -427,8 +582,8 @@ class LiarsDiceHand:
         else:
             new_opponent_num_dice -= 1
             
-        new_user_hand = create_hand(new_user_num_dice)
-        self.__init__(self.name, new_user_hand, new_opponent_num_dice)
+        new_user_hand = create_hand(new_user_num_dice, self.rng, self.num_rolled)
+        self.__init__(self.name, new_user_hand, new_opponent_num_dice, self.user_challenge_threshold, self.rng, self.num_rolled, self.rules, self.bluff_model)
 
 
     def compute_expected_board_quantities(self):
@@ -438,11 +593,62 @@ class LiarsDiceHand:
         total_dict = {}
 
         # the expected number of each dice in the opponent's hand is (1/6 * # of dice opponent has)
-        for i in self.user_dice_dict.keys():
-            total_dict[i] = self.user_dice_dict[i] + self.expected_opponent_dice_dict()[i]
+        expected_opponent_dice_dict = self.expected_opponent_dice_dict()
+        for i in range(1, 7):
+            total_dict[i] = self.quantity_of_value(i) + expected_opponent_dice_dict[i]
         
         return total_dict
 
+    def bid_distribution(self, previous_bid):
+        """
+        previous_bid: Bid object of previous round bid. None if we are constructing the first bid
+
+        Return list of (probability, Bid object) of every bid the user's bidding heuristic can construct
+        """
+        #can't raise bid beyond the highest ranked value (6, or 1 with wild ones)
+        max_die_value = self.rules.top_value()
+
+        #equal to what player actually has + what the player expects the opponent has
+        expected_board = self.compute_expected_board_quantities()
+        counts = self.counts.tolist()
+
+        if previous_bid == None:
+            #assume they choose their first dice at random from the dice they have (so if they have multiple of a dice it has
+            # a larger chance of getting selected)
+            value_probs = [(count / len(self), value) for value, count in enumerate(counts, start=1) if count > 0]
+            min_quantity = 1
+        elif previous_bid.bid_value == max_die_value:
+            value_probs = [(1, previous_bid.bid_value)]
+            min_quantity = previous_bid.bid_quantity + 1
+        # player keeps same bid value if they expect at greater than that quantity that on the board
+        elif expected_board[previous_bid.bid_value] > previous_bid.bid_quantity: 
+            value_probs = [(1, previous_bid.bid_value)]
+            min_quantity = previous_bid.bid_quantity + 1
+        else:
+            min_quantity = 1
+            #player finds the value they have nearest (but greater than) the previous bid value
+            all_higher_values = self.rules.higher_values(previous_bid.bid_value)
+            higher_values = [value for value in all_higher_values if counts[value - 1] > 0]
+            if higher_values:
+                value_probs = [(1, higher_values[0])]
+            #player has no dice greater than the current value so they will select a value at randome
+            else:
+                num_higher_values = len(all_higher_values)
+                value_probs = [(1 / num_higher_values, value) for value in all_higher_values]
+        
+        bid_options = []
+        for value_prob, new_bid_value in value_probs:
+            expected_board_quantity = expected_board[new_bid_value]
+            player_actual_quantity = self.quantity_of_value(new_bid_value)
+            player_remaining_dice = len(self) - player_actual_quantity
+            #bluff is bernouli probability of bluffing on each remaining dice. In expection you multiply p * n
+            player_bluff_quantity = self.user_bluff_prob() * player_remaining_dice 
+            int_quantity = round(expected_board_quantity + player_bluff_quantity, 0)
+            new_bid_quantity = int(max(int_quantity, min_quantity))
+            bid_options.append((value_prob, Bid(new_bid_quantity, new_bid_value)))
+
+        return bid_options
+
     def compute_truthful_probability_correct(self, bid):
         """
         bid: Bid object
@@ -450,21 +656,18 @@ class LiarsDiceHand:
         Return the probability of bid being correct from the perspective of the user (since they only have information about their hand and the size of the opponents hand) 
         This is the "truthful" probability because it does not account for bluffing
         """
-        quantity_opponent_needs_to_have = int(bid.bid_quantity - self.user_dice_dict[bid.bid_value])
+        quantity_opponent_needs_to_have = bid.bid_quantity - self.quantity_of_value(bid.bid_value)
         if quantity_opponent_needs_to_have <= 0:
             return 1
 
         # Probability of rolling at least k of a value = 
         # sum from k to 5 of [(5 choose k) * (1/6)^k * (5/6)^(5-k)]
-        # basically the sum from k to 5 of binom.pmf(k=k,n=5,p=1/6)
-
-        uniform = 1/6
-        probability_sum = 0
-        for k in range(quantity_opponent_needs_to_have, self.opponent_num_dice + 1):
-            probability_sum += binom.pmf(k=k, n=self.opponent_num_dice, p=uniform)
-
-        return probability_sum
+        # which is read from the precomputed binomial survival function table (1/6 becomes 1/3 for wild non-one values)
+        return float(binomial_survival(self.opponent_num_dice, quantity_opponent_needs_to_have, self.rules.match_prob(bid.bid_value)))
     
+    # memoized per (hand, opponent dice, rules, bid, bluff probability)
+    @memoize("conditional_bid_prob", key=lambda hand, bid, s2_expected_bluff_prob: (hand.counts.tobytes(), hand.opponent_num_dice, hand.rules.wild_ones,
+                                                                                     bid.bid_quantity, bid.bid_value, s2_expected_bluff_prob), maxsize=65536)
     def conditional_bid_prob(self, bid, s2_expected_bluff_prob):
         """
         IMPORTANT: user calling func is s2, the bidding player
@@ -477,21 +680,24 @@ class LiarsDiceHand:
         s1 is observer (opponent), s2 is bidding player (user) and b is a valid bid: 
             p(b|s2, p(s1)) = sum over all i,j of p(i bid.bid_value in s1) * p(j user bluffs) such that with i+j = quantity_remaining that s2 doesn't have in it's hand
         """
-        quantity_remaining = bid.bid_quantity - self.user_dice_dict[bid.bid_value]
-        user_quantity_remaining = len(self) - self.user_dice_dict[bid.bid_value]
+        quantity_remaining = bid.bid_quantity - self.quantity_of_value(bid.bid_value)
+        user_quantity_remaining = len(self) - self.quantity_of_value(bid.bid_value)
         opponent_quantity_remaining = self.opponent_num_dice
+        match_prob = self.rules.match_prob(bid.bid_value)
 
         prob_sum = 0
         for bluff_quantity in range(quantity_remaining + 1):
             opponent_quantity = quantity_remaining - bluff_quantity
             #make sure valid bluff_quantity and opponent quantity
             if (opponent_quantity_remaining >= opponent_quantity and user_quantity_remaining >= bluff_quantity): 
-                #uniform assumption assumed throughout
-                prob_exactly_opponent_quantity = (1/6) ** opponent_quantity 
+                #uniform assumption assumed throughout (a die matches with probability 1/6, 1/3 for wild non-one values)
+                prob_exactly_opponent_quantity = match_prob ** opponent_quantity 
                 prob_exactly_bluff_quantity = s2_expected_bluff_prob ** bluff_quantity 
                 prob_sum += prob_exactly_opponent_quantity * prob_exactly_bluff_quantity
         return prob_sum
 
+    # memoized per hand, every hand of up to MAX_DICE dice fits in the cache
+    @memoize("prob_hand", key=lambda hand: hand.counts.tobytes(), maxsize=1024)
     def prob_hand(self):
         """
         Compute the probability of constructing self.user_dice_dict assuming uniform probability
@@ -506,7 +712,7 @@ class LiarsDiceHand:
 
         # Compute multinomial coefficient
         multinomial_coeff = factorial(total_dice)
-        for count in self.user_dice_dict.values():
+        for count in self.counts.tolist():
             multinomial_coeff /= factorial(count)
 
         # Compute overall probability
@@ -530,10 +736,8 @@ class LiarsDiceHand:
         
         bayes_numerator = bidding_hand_conditional_bid_prob * bidding_hand.prob_hand()
 
-        bayes_denomenator = 0
-        for s2_hand_obj in all_possible_toy_hand_objects(len(bidding_hand), len(self)):
-            prob_hand = s2_hand_obj.prob_hand()
-            bayes_denomenator += s2_hand_obj.conditional_bid_prob(bid, s2_expected_bluff_prob) * prob_hand
+        # sum over all valid s2 of p(b|s2,p(s1) * p(s2)
+        bayes_denomenator = hand_space(len(bidding_hand)).bayes_weights(bid.bid_quantity, bid.bid_value, len(self), s2_expected_bluff_prob, self.rules).sum()
     
         return bayes_numerator / bayes_denomenator
 
@@ -545,33 +749,78 @@ class LiarsDiceHand:
         s2_expected_bluff_prob: probability that s1 assigned to s2 bluffing
 
         Return the probability of bid being correct where the user is the observer.
+        Looks the probability up in the precomputed conditional probability table and falls back to 
+        `exact_conditional_probability_correct` for states the table does not cover. Wild ones rules read their own table (see rules.py)
+        """
+        if self.rules.wild_ones:
+            return self.rules.conditional_probability_correct(self.quantity_of_value(bid.bid_value), len(self), self.opponent_num_dice,
+                                                              bid.bid_quantity, bid.bid_value, s2_expected_bluff_prob)
+        key = conditional_table_key(self.quantity_of_value(bid.bid_value), len(self), self.opponent_num_dice, bid.bid_quantity, s2_expected_bluff_prob)
+        table = get_conditional_probability_table()
+        if key in table:
+            return table[key]
 
-        s1 is observer (user), s2 is bidding player (opponent) and b is a valid bid:
-            P(bid b correct) = sum over all possible s2 of (indicator variable correct_bid with s2 and s1) * p(s2|bid b, p(s1))
+        return self.exact_conditional_probability_correct(bid, s2_expected_bluff_prob)
+
+    def exact_conditional_probability_correct(self, bid, s2_expected_bluff_prob):
         """
+        IMPORTANT: user calling func is s1, the observing player
         
-        def correct_bid(bid, player1_hand_object, player2_hand_object):
-            """
-            player1_hand_object: LiarsDiceHand object
-            player2_hand_object: LiarsDiceHand object
-
-            Return boolean if there exists >= `bid.bid_quantity` of `bid.bid_value` on the board
-            """
-            # correct bid considering both players' hands
-            actual_quantity = player1_hand_object.quantity_of_value(bid.bid_value) + player2_hand_object.quantity_of_value(bid.bid_value)
-            correct = actual_quantity >= bid.bid_quantity
-            return correct
+        bid: Bid object
+        s2_expected_bluff_prob: probability that s1 assigned to s2 bluffing
+
+        Return the probability of bid being correct where the user is the observer.
+
+        s1 is observer (user), s2 is bidding player (opponent) and b is a valid bid:
+            P(bid b correct) = sum over all possible s2 of (indicator variable correct_bid with s2 and s1) * p(s2|bid b, p(s1))
         
-        res = 0
-        for s2_hand_obj in all_possible_toy_hand_objects(self.opponent_num_dice, len(self)):
-            if correct_bid(bid, self, s2_hand_obj): #todo have a function that checks if bid satisfied using self.user_dice_dict and hand_dict
-                res += self.conditional_opponent_hand_prob(bid, s2_hand_obj, s2_expected_bluff_prob)
+        Every possible s2 is evaluated at once by the opponent's HandSpace
+        """
+        opponent_space = hand_space(self.opponent_num_dice)
+        return float(opponent_space.probability_correct(self.quantity_of_value(bid.bid_value), bid.bid_quantity, bid.bid_value, len(self),
+                                                        s2_expected_bluff_prob, self.rules))
 
-        return res
+    def compute_bid_probability_matrices(self, previous_bid, s2_expected_bluff_prob):
+        """
+        IMPORTANT: user calling func is s1, the observing player
+
+        previous_bid: Bid object of previous bid. None if every bid is legal
+        s2_expected_bluff_prob: probability that s1 assigned to s2 bluffing
+
+        Return tuple of two (quantity, value) arrays of shape (total dice on board, 6) where entry [quantity - 1, value - 1] is
+        `compute_truthful_probability_correct` and `compute_conditional_probability_correct` of Bid(quantity, value) respectively.
+        Bids that do not raise `previous_bid` are np.nan
+        """
+        max_quantity = len(self) + self.opponent_num_dice
+        legal = legal_bid_mask(previous_bid, max_quantity, self.rules)
+        quantities, values = np.nonzero(legal)
+        quantities, values = quantities + 1, values + 1
+        user_value_counts = np.array([self.quantity_of_value(value) for value in range(1, 7)])[values - 1]
+
+        truthful = np.full((max_quantity, 6), np.nan)
+        # P(opponent has at least `quantity - user_value_counts` of the value), certain if the user already has enough.
+        # One survival table lookup per match probability (wild ones match non-one values with a higher probability)
+        bid_match_probs = np.array([self.rules.match_prob(value) for value in range(1, 7)])[values - 1]
+        truthful_values = np.zeros(len(values))
+        for match_prob in np.unique(bid_match_probs).tolist():
+            same_prob = bid_match_probs == match_prob
+            truthful_values[same_prob] = binomial_survival(self.opponent_num_dice, quantities[same_prob] - user_value_counts[same_prob], match_prob)
+        truthful[legal] = truthful_values
+
+        conditional = np.full((max_quantity, 6), np.nan)
+        opponent_space = hand_space(self.opponent_num_dice)
+        conditional[legal] = opponent_space.probability_correct(user_value_counts, quantities, values, len(self), s2_expected_bluff_prob, self.rules)
+
+        return truthful, conditional
 
     def quantity_of_value(self, value):
+        """
+        Return the number of the user's dice that count towards a bid on `value` (ones also count with wild ones)
+        """
         assert (1 <= value and value <=6), f'invalid value: {value}'
-        return self.user_dice_dict[value]
+        if self.rules.wild_ones and value != 1:
+            return self.counts.item(value - 1) + self.counts.item(0)
+        return self.counts.item(value - 1)
 
     def __str__(self):
         """
@@ -588,10 +837,12 @@ class LiarsDiceHand:
         """
         Return the number of dice in user's hand
         """
-        return sum(self.user_dice_dict.values())
+        return self.num_dice
     
 
 class Bid:
+    __slots__ = ("bid_quantity", "bid_value")
+
     def __init__(self, bid_quantity, bid_value):
         """
         bid_quantity: int of bidding quantity
@@ -617,10 +868,24 @@ class Bid:
         assert bid_quantity > 0, f"bid_quantity, {bid_quantity} must be possitive"
         assert (bid_value >= 1 and bid_value <= 6), f"bid_value, {bid_value} must be between 1 and 6"
     
+    def raises(self, previous_bid, rules=STANDARD_RULES):
+        """
+        previous_bid: Bid object. None if no bid has been made
+        rules: Rules the bid order is read from
+
+        Return boolean, is this bid a legal raise of `previous_bid`
+        """
+        return rules.raises(previous_bid, self)
+
     def __str__(self):
         print(f"bid_quantity: {self.bid_quantity}, bid_value: {self.bid_value}")
 
 if __name__ == "__main__":
-    pass
+    # build the conditional probability table offline
+    table = build_conditional_probability_table()
+    save_conditional_probability_table(table)
+    print(f"Saved {len(table)} entries to {conditional_table_path}")
+    num_tables = WILD_ONES_RULES.save_conditional_tables(MAX_DICE)
+    print(f"Saved {num_tables} wild ones tables to {WILD_ONES_RULES.table_path()}")
     
 
@@ -0,0 +1,195 @@
+from model import *
+from events import PrintSink, NULL_SINK
+from probability import aggregate_probability_correct
+
+
+# memoized in the "multiplayer_probability_correct" LRU cache (see cache.py), keys are
+# (probability method, match probability, observer value count, observer dice, unseen dice, bidder dice, bid quantity,
+# observer's opponent bluff scale, observer's opponent bluff exponent)
+@memoize("multiplayer_probability_correct", key=lambda hand, bid, bidder_num_dice, probability_method: (
+    probability_method, hand.rules.match_prob(bid.bid_value), hand.quantity_of_value(bid.bid_value), len(hand), hand.opponent_num_dice, bidder_num_dice, bid.bid_quantity,
+    hand.bluff_model.opponent_scale, hand.bluff_model.opponent_exponent),
+    maxsize=65536)
+def multiplayer_probability_correct(hand, bid, bidder_num_dice, probability_method):
+    """
+    hand: LiarsDiceHand of the observer. Its `opponent_num_dice` is every die the observer can't see
+    bid: Bid object
+    bidder_num_dice: int of number of dice in the bidding player's hand
+    probability_method: str. "truthful" or "conditional"
+
+    Return the observer's probability that `bid` is correct. The conditional probability treats the bidder like the two player
+    model (the observer's `BluffModel.expected_opponent_bluff_prob` of the bidder's dice) and every other unseen die as uniform
+    """
+    p = hand.rules.match_prob(bid.bid_value)
+    if probability_method == "truthful":
+        prob_bid_correct = hand.compute_truthful_probability_correct(bid)
+    elif probability_method == "conditional":
+        others_num_dice = hand.opponent_num_dice - bidder_num_dice
+        prob_bid_correct = aggregate_probability_correct(hand.quantity_of_value(bid.bid_value), bid.bid_quantity, bidder_num_dice, others_num_dice,
+                                                         len(hand) + others_num_dice, hand.bluff_model.expected_opponent_bluff_prob(bidder_num_dice), p)
+    else:
+        raise NameError(f"Incorrect probability method. You chose {probability_method}.")
+    return prob_bid_correct
+
+
+class MultiplayerGame:
+    def __init__(self, player_names, num_dice=5, probability_method="conditional", challenge_thresholds=0.51, rng=None, event_sink=None, rules=STANDARD_RULES,
+                 bluff_models=DEFAULT_BLUFF_MODEL):
+        """
+        player_names: list of player names in seating order. The first player opens round 1
+        num_dice: int, or list of ints per player, of number of dice to start with (at most MAX_DICE)
+        probability_method: str. "truthful" or "conditional", how observers estimate the probability a bid is correct
+        challenge_thresholds: float, or list of floats per player, `user_challenge_threshold` of each player
+        rng: numpy Generator of the dice and bids. None uses a Generator of the game's own, seeded by the operating system
+        event_sink: object with an `emit(event, **fields)` method that receives every game event (see events.py). None drops every event
+        rules: Rules the game is played with (see rules.py)
+        bluff_models: BluffModel, or list of BluffModels per player, of how much each player bluffs and expects the bidder to bluff (see bluff.py)
+
+        Initalize a Liar's Dice game between any number of players. Bids are made in seating order and the next live player either
+        raises or challenges the bid. The loser of a challenge loses a die and opens the next round (or the next live player if they are out).
+        Every hand is a LiarsDiceHand whose `opponent_num_dice` is the number of dice its player can't see
+        """
+        if len(player_names) < 2:
+            raise ValueError("A game needs at least two players.")
+        if probability_method not in ("truthful", "conditional"):
+            raise NameError(f"Incorrect probability method. You chose {probability_method}.")
+        num_players = len(player_names)
+        self.player_names = list(player_names)
+        self.num_dice = dict(zip(self.player_names, num_dice if isinstance(num_dice, (list, tuple)) else [num_dice] * num_players))
+        self.challenge_thresholds = dict(zip(self.player_names, challenge_thresholds if isinstance(challenge_thresholds, (list, tuple)) else [challenge_thresholds] * num_players))
+        self.bluff_models = dict(zip(self.player_names, bluff_models if isinstance(bluff_models, (list, tuple)) else [bluff_models] * num_players))
+        self.probability_method = probability_method
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.event_sink = NULL_SINK if event_sink is None else event_sink
+        self.rules = rules
+
+        self.turn = self.player_names[0]
+        self.round_number = 1
+        self.game_over = False
+        self.round_results = [] #one (round #, bidder, challenger, bid quantity, bid value, loser) tuple per round
+        self.hands = {}
+        self.roll()
+
+    def live_players(self):
+        """
+        Return list of the players with dice left, in seating order
+        """
+        return [name for name in self.player_names if self.num_dice[name] > 0]
+
+    def total_dice(self):
+        """
+        Return the number of dice on the board
+        """
+        return sum(self.num_dice.values())
+
+    def next_player(self, player_name):
+        """
+        Return the first live player after `player_name` in seating order
+        """
+        index = self.player_names.index(player_name)
+        for offset in range(1, len(self.player_names) + 1):
+            name = self.player_names[(index + offset) % len(self.player_names)]
+            if self.num_dice[name] > 0:
+                return name
+
+    def roll(self):
+        """
+        Reroll every live player's hand
+        """
+        total_dice = self.total_dice()
+        self.hands = {name: LiarsDiceHand(name, create_hand(self.num_dice[name], self.rng), total_dice - self.num_dice[name], self.challenge_thresholds[name], self.rng,
+                                     rules=self.rules, bluff_model=self.bluff_models[name])
+                      for name in self.live_players()}
+
+    def correct_bid(self, bid):
+        """
+        Return boolean if there exists >= `bid.bid_quantity` of `bid.bid_value` on the board
+        """
+        return sum(hand.quantity_of_value(bid.bid_value) for hand in self.hands.values()) >= bid.bid_quantity
+
+    def construct_bid(self, bidding_player, previous_bid):
+        """
+        Return Bid object drawn from the bidding player's `bid_distribution` (the expected board counts every unseen die)
+        """
+        bid_options = self.hands[bidding_player].bid_distribution(previous_bid)
+        if len(bid_options) == 1:
+            return bid_options[0][1]
+        bid_probs, bids = zip(*bid_options)
+        return weighted_choice(bids, bid_probs, self.rng)
+
+    def challenges(self, observer_name, bidder_name, bid):
+        """
+        Return boolean, does `observer_name` challenge `bidder_name`s bid
+        """
+        observer_hand = self.hands[observer_name]
+        prob_bid_correct = multiplayer_probability_correct(observer_hand, bid, self.num_dice[bidder_name], self.probability_method)
+        if self.event_sink.enabled:
+            self.event_sink.emit("probability", observer=observer_name, bidder=bidder_name, method=self.probability_method, probability=prob_bid_correct)
+        # the player is forced to challenge, because there are no more possible bids
+        forced = self.rules.is_max_bid(bid, self.total_dice())
+        return prob_bid_correct <= observer_hand.user_challenge_threshold or forced
+
+    def challenge_bid(self, bid, bidder_name, challenging_player_name):
+        """
+        Resolve a challenge: the loser loses one die, every hand is rerolled and the next round starts
+        """
+        is_correct_bid = self.correct_bid(bid)
+        loser = challenging_player_name if is_correct_bid else bidder_name
+        winner = bidder_name if is_correct_bid else challenging_player_name
+        self.round_results.append((self.round_number, bidder_name, challenging_player_name, bid.bid_quantity, bid.bid_value, loser))
+
+        self.num_dice[loser] -= 1
+        self.turn = loser if self.num_dice[loser] > 0 else self.next_player(loser)
+        self.round_number += 1
+        self.game_over = len(self.live_players()) == 1
+        if not self.game_over:
+            self.roll()
+
+        if self.event_sink.enabled:
+            self.event_sink.emit("challenge", player=challenging_player_name, quantity=bid.bid_quantity, value=bid.bid_value,
+                                 successful=not is_correct_bid, winner=winner, loser=loser,
+                                 remaining_dice=dict(self.num_dice), next_turn=self.turn, game_over=self.game_over)
+
+    def play_round(self):
+        """
+        Play bids until one is challenged
+        """
+        if self.event_sink.enabled:
+            self.event_sink.emit("round_start", round_number=self.round_number, hands={name: hand.user_dice_dict for name, hand in self.hands.items()})
+        previous_bid = None
+        bidder_name = self.turn
+        while True:
+            bid = self.construct_bid(bidder_name, previous_bid)
+            if self.event_sink.enabled:
+                self.event_sink.emit("bid", player=bidder_name, quantity=bid.bid_quantity, value=bid.bid_value, correct=self.correct_bid(bid))
+            observer_name = self.next_player(bidder_name)
+            if self.challenges(observer_name, bidder_name, bid):
+                self.challenge_bid(bid, bidder_name, observer_name)
+                return
+            previous_bid = bid
+            bidder_name = observer_name
+
+    def play(self):
+        """
+        Play rounds until one player has dice left. Return the winner's name
+        """
+        while not self.game_over:
+            self.play_round()
+        return self.live_players()[0]
+
+
+def simulate_multiplayer_game(player_names, num_dice=5, probability_method="conditional", challenge_thresholds=0.51, seed=None, verbose=False, rules=STANDARD_RULES,
+                              bluff_models=DEFAULT_BLUFF_MODEL):
+    """
+    Play one MultiplayerGame (arguments as in MultiplayerGame, `seed` seeds its numpy Generator) and return it
+    """
+    rng = None if seed is None else np.random.default_rng(seed)
+    game = MultiplayerGame(player_names, num_dice, probability_method, challenge_thresholds, rng, PrintSink() if verbose else NULL_SINK, rules, bluff_models)
+    game.play()
+    return game
+
+
+if __name__ == "__main__":
+    players = ["Ann", "Ben", "Cal", "Dee"]
+    wins = Counter(simulate_multiplayer_game(players, 6, challenge_thresholds=[0.51, 0.4, 0.3, 0.51], seed=seed).live_players()[0] for seed in range(500))
+    print({name: wins[name] / 500 for name in players})
@@ -1,19 +1,22 @@
-import pandas as pd
-import numpy as np
-import random
+import csv
 from model import *
+from events import PrintSink, NULL_SINK
 
 
 
 
-def parse_game(file_name, verbose = False):
-    df = pd.read_csv(file_name)
+def iter_game_records(file_name):
+    """
+    file_name: str path of a csv in the OrganizedData format
 
-    #group by game
-    history={}
-    df['Game'] = df['Game'].fillna(method='ffill')
-    grouped = df.groupby('Game')
+    Reads the csv row by row and yields one (game_number, game_history) tuple per game, so only one game is in memory at a time.
+    game_history is a dictionary keyed by "Round {roll}" of {"Hands": {"Me": hand(list), "Subject": hand(list)},
+    "Actions": [["Bid"/"Challenge", player, count, value, is_bid_correct/is_challenge_correct]], "Winner": name, "Loser": name}
 
+    Game and Roll are forward filled. Within a round the i-th row holds the quantity of dice value i in each player's hand.
+    The rows of a game (and of a round within it) must be contiguous, since each game is yielded as soon as the next one starts.
+    Raise ValueError if a Game or Roll reappears after other rows
+    """
     def check_counts(list1, list2, value, count):
         """
         adds the number of dice with the value
@@ -24,106 +27,133 @@ def parse_game(file_name, verbose = False):
         count_in_list2 = list2.count(value)
         return count_in_list1 + count_in_list2 >= count
 
+    def round_record(rows):
+        #organizing the hands, row index + 1 is the dice value:
+        hand_1 = [index + 1 for index, row in enumerate(rows) for _ in range(int(float(row["Me"] or 0)))]
+        hand_2 = [index + 1 for index, row in enumerate(rows) for _ in range(int(float(row["Subject"] or 0)))]
+
+        #collecting actions: #"bid" / "Challenge" #player #count #value #istrue
+        Winner = None
+        Loser = None
+        Actions = []
+        for row in rows:
+            speaking_player = row["Speaking Player"]
+            if not speaking_player:
+                continue
+            other_player = 'Me' if speaking_player == 'Subject' else 'Subject'
+            count = int(float(row["Count"]))
+            dice = int(float(row["Dice #"]))
+            true_count = check_counts(hand_1, hand_2, dice, count)
+
+            Actions.append(['Bid', speaking_player, count, dice, true_count])
+
+            if row["Successfull Challenge?"]:
+                Actions.append(['Challenge', other_player, count, dice, not true_count])
+                if true_count:
+                    Winner = speaking_player
+                    Loser = other_player
+                else:
+                    Loser = speaking_player
+                    Winner = other_player
+
+        return {"Hands": {"Me": hand_1, "Subject": hand_2}, "Actions": Actions, "Winner": Winner, "Loser": Loser}
+
+    game_number = None
+    roll = None
+    game_history = {}
+    round_rows = []
+    seen_games = set()
+    with open(file_name, newline='') as f:
+        for row in csv.DictReader(f):
+            new_game = row["Game"] and float(row["Game"]) != game_number
+            new_round = row["Roll"] and float(row["Roll"]) != roll
+            if (new_game or new_round) and round_rows:
+                game_history["Round " + str(roll)] = round_record(round_rows)
+                round_rows = []
+            if new_game:
+                if game_history:
+                    yield game_number, game_history
+                game_number = float(row["Game"])
+                if game_number in seen_games:
+                    raise ValueError(f"Game {game_number} in {file_name} continues after other games. The rows of each game must be contiguous.")
+                seen_games.add(game_number)
+                game_history = {}
+            if row["Roll"]:
+                roll = float(row["Roll"])
+                if "Round " + str(roll) in game_history:
+                    raise ValueError(f"Roll {roll} of game {game_number} in {file_name} continues after other rolls. The rows of each roll must be contiguous.")
+            round_rows.append(row)
+
+    if round_rows:
+        game_history["Round " + str(roll)] = round_record(round_rows)
+    if game_history:
+        yield game_number, game_history
+
+
+def iter_games(file_name, event_sink=NULL_SINK, game_log=None, verbose=False):
+    """
+    file_name: str path of a csv in the OrganizedData format
+    event_sink: receives every parsed round, bid and challenge (see events.py)
+    game_log: GameLogWriter every parsed game is appended to (see game_log.py). None if games are not logged
+    verbose: boolean. If True every game record is printed as it is read
+
+    Yield a LiarsDiceGame object for every game in `file_name`, reading the file incrementally
+    """
+    for game_number, game_history in iter_game_records(file_name):
+        if verbose:
+            print({game_number: game_history})
+        game = history_to_game(game_number, game_history, event_sink)
+        if game_log is not None:
+            game_log.write(game)
+        yield game
 
 
-    for game_number, group in grouped:
-        
-        # print(f"Processing Subgame {game_number}.")
-        history[game_number] = {}
-        
-        #group by rounds/rolls in game:
-        group['Roll'] = group['Roll'].fillna(method='ffill')
-        grouped_round = group.groupby('Roll')
-        # Process each round in the 'grouped_round' DataFrame
-        # 'grouped_round' is a DataFrame containing rows for a specific round
-        for r_num, round in grouped_round:
-            # print(round, "DONE")
-            Winner = None
-            Loser = None
-            #Original hand from csv
-            player_1 = list(round["Me"].fillna(0))
-            player_2 = list(round["Subject"].fillna(0))
-            
-            #organizing the hands:
-            hand_1 = [index + 1 for index, count in enumerate(player_1) for _ in range(int(count))]
-            hand_2 = [index + 1 for index, count in enumerate(player_2) for _ in range(int(count))]
-
-            #collecting actions: #"bid" / "Challenge" #player #count #value #istrue
-            Actions =[]
-            for index, row in round.iterrows():
-                # print(row)
-                speaking_player = row["Speaking Player"]
-                # print("SP",speaking_player)
-                if pd.isna(speaking_player): #=="NaN":
-                    continue
-                other_player = 'Me' if speaking_player == 'Subject' else 'Subject'
-                # print("ROW", row,"INDEX",index)
-                count = row["Count"]
-                dice = row["Dice #"]
-                successful_challenge = row["Successfull Challenge?"]
-                # print('suc', successful_challenge)
-                true_count = check_counts(hand_1, hand_2, dice,count) 
-                
-                Actions.append(['Bid', speaking_player, count, dice, true_count])
-
-                if not pd.isna(successful_challenge): # != "NaN":
-                    yes = bool(successful_challenge=='Yes' or successful_challenge=='yes')
-                    Actions.append(['Challenge', other_player, count, dice, not true_count])
-                    if true_count:
-                        Winner = speaking_player
-                        Loser = other_player
-                    else:
-                        Loser = speaking_player
-                        Winner = other_player 
-            
-            history[game_number]["Round "+str(r_num)] = {"Hands": {"Me":hand_1, "Subject":hand_2}, "Actions":Actions, "Winner": Winner , "Loser": Loser}
-
-    if verbose:
-        print(history)
-
-    game_object_lis = (history_to_obj(history))
-    return game_object_lis
-
-def history_to_obj(history):
+def parse_game(file_name, verbose = False, game_log = None):
+    """
+    Return list of the LiarsDiceGame objects of every game in `file_name` (see `iter_games`), printing every record and event if `verbose`
+    """
+    return list(iter_games(file_name, PrintSink() if verbose else NULL_SINK, game_log, verbose))
+
+def history_to_obj(history, event_sink=NULL_SINK):
     """
     takes a history
     returns a list of games
     objects.
+    event_sink receives every parsed round, bid
+    and challenge (see events.py)
+    """
+    return [history_to_game(g, history[g], event_sink) for g in history]
+
+def history_to_game(g, game_history, event_sink=NULL_SINK):
+    """
+    takes the history of game `g`
+    returns the game object
     """
-    games = []
-    for g in history:
-        # print(f"game {g}")
-        starting_player = history[g]["Round 1.0"]["Actions"][0][1]
-        second_player = history[g]["Round 1.0"]["Actions"][1][1]
-        for round in history[g]:
-            starting_player_hand = LiarsDiceHand(starting_player, convert_list_to_dict(history[g][round]["Hands"][starting_player]), len(history[g][round]["Hands"]["Subject"]))
-            second_player_hand = LiarsDiceHand(second_player, convert_list_to_dict(history[g][round]["Hands"][second_player]), len(history[g][round]["Hands"][starting_player]))
-            if round == "Round 1.0":
-                game = LiarsDiceGame(starting_player_hand, second_player_hand)
+    starting_player = game_history["Round 1.0"]["Actions"][0][1]
+    second_player = game_history["Round 1.0"]["Actions"][1][1]
+    # every challenge rerolls both hands, the rerolls are replaced by the next round's recorded hands
+    reroll_rng = np.random.default_rng(0)
+    for round in game_history:
+        starting_player_hand = LiarsDiceHand(starting_player, convert_list_to_dict(game_history[round]["Hands"][starting_player]), len(game_history[round]["Hands"][second_player]), rng=reroll_rng)
+        second_player_hand = LiarsDiceHand(second_player, convert_list_to_dict(game_history[round]["Hands"][second_player]), len(game_history[round]["Hands"][starting_player]), rng=reroll_rng)
+        if round == "Round 1.0":
+            game = LiarsDiceGame(starting_player_hand, second_player_hand, event_sink)
+        else:
+            game.overide_hand(starting_player_hand, second_player_hand)
+        if event_sink.enabled:
+            event_sink.emit("parsed_round", game=g, round=round,
+                            hands={starting_player: starting_player_hand.user_dice_dict, second_player: second_player_hand.user_dice_dict})
+
+        for action in game_history[round]["Actions"]:
+            player_turn = action[1]
+            quantity = action[2]
+            value = action[3]
+            bid = Bid(int(quantity), int(value))
+            if action[0] == "Challenge":
+                game.challenge_bid(bid, player_turn)
             else:
-                game.overide_hand(starting_player_hand, second_player_hand)
-            print(f"game {g}, {round}")
-            print(f"{starting_player} hand: {starting_player_hand.user_dice_dict}")
-            print(f"{second_player} hand: {second_player_hand.user_dice_dict}")
-            
-            
-
-            # print(f'game: {g}, {round}, turn: {game.turn}')
-            # print(f'Me: {starting_player_hand.user_hand}, User: {second_player_hand.user_hand}')
-            for action in history[g][round]["Actions"]:
-                player_turn = action[1]
-                quantity = action[2]
-                value = action[3]
-                bid = Bid(int(quantity), int(value))
-                # print(f'{action[0]}, {player_turn}, quantity {quantity}, value {value}')
-                if action[0] == "Challenge":
-                    # print(f'turn before challenge: {game.turn}')
-                    game.challenge_bid(bid, player_turn)
-                    # print(f'turn after challenge: {game.turn}')
-                else:
-                    game.declare_bid(player_turn, bid)
-        games.append(game)
-    return games
+                game.declare_bid(player_turn, bid)
+    return game
 
 
 
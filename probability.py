@@ -0,0 +1,269 @@
+import numpy as np
+import itertools
+from math import factorial
+from cache import MISSING, memoize, register_cache
+
+
+class HandSpace:
+    def __init__(self, num_dice):
+        """
+        num_dice: int of number of dice in every hand of the space
+
+        Initalize the space of all hands with `num_dice` dice.
+        Hands are stored in the same order as `all_possible_list_hands` as an (H, 6) matrix of the quantity of 1,2,..,6 in each hand,
+        along with the (H,) vector of the multinomial probability of rolling each hand
+        """
+        if num_dice < 0:
+            raise ValueError(f"Number of dice can't be negative. You chose {num_dice}.")
+
+        self.num_dice = num_dice
+
+        hands = list(itertools.combinations_with_replacement(range(1, 7), num_dice))
+        self.counts = np.zeros((len(hands), 6), dtype=np.int8)
+        for row, hand in enumerate(hands):
+            for die in hand:
+                self.counts[row, die - 1] += 1
+
+        self.hand_indexes = {hand_counts.tobytes(): row for row, hand_counts in enumerate(self.counts)}
+
+        # multinomial coefficient * (1/6)^num_dice. The single empty hand is rolled with probability 1
+        multinomial_coeffs = np.array([factorial(num_dice) / np.prod([factorial(count) for count in hand_counts]) for hand_counts in self.counts])
+        self.probs = multinomial_coeffs * (1/6) ** num_dice
+
+    def __len__(self):
+        """
+        Return the number of hands in the space
+        """
+        return len(self.counts)
+
+    def hand_index(self, counts):
+        """
+        counts: (6,) int8 array of the quantity of 1,2,..,6 in a hand with `num_dice` dice
+
+        Return the row of the hand in the space
+        """
+        return self.hand_indexes[counts.tobytes()]
+
+    def value_counts(self, bid_values, rules=None):
+        """
+        bid_values: int or (B,) array of bidding dice values
+        rules: Rules deciding which dice count towards a bid (see rules.py). None counts the dice of the bid value only
+
+        Return (H,) or (H, B) array of the quantity of dice counting towards each bid value in every hand
+        """
+        bid_values = np.asarray(bid_values)
+        value_counts = self.counts[:, bid_values - 1].astype(np.int64)
+        if rules is not None and rules.wild_ones:
+            # every one also counts towards the other values
+            ones = self.counts[:, 0].astype(np.int64)
+            value_counts += (ones if value_counts.ndim == 1 else ones[:, np.newaxis]) * (bid_values != 1)
+        return value_counts
+
+    def conditional_bid_probs(self, bid_quantities, bid_values, opponent_num_dice, s2_expected_bluff_prob, rules=None):
+        """
+        IMPORTANT: the hands in the space are s2, the bidding player
+
+        bid_quantities: int or (B,) array of bidding quantities
+        bid_values: int or (B,) array of bidding dice values
+        opponent_num_dice: int of number of dice in s1's (observer's) hand
+        s2_expected_bluff_prob: probability that s1 assigned to s2 bluffing
+        rules: Rules the bids are made under. None is the standard game (only the bid value counts, each die matches with probability 1/6)
+
+        Return (H,) or (H, B) array of p(b|s2, p(s1)) for every hand s2 in the space (see `LiarsDiceHand.conditional_bid_prob`)
+        """
+        bid_quantities = np.asarray(bid_quantities)
+        value_counts = self.value_counts(bid_values, rules)
+        p = match_probs(bid_values, rules)
+
+        quantity_remaining = bid_quantities - value_counts
+        user_quantity_remaining = self.num_dice - value_counts
+
+        prob_sum = np.zeros(value_counts.shape)
+        # a hand can bluff at most all of its dice
+        for bluff_quantity in range(self.num_dice + 1):
+            opponent_quantity = quantity_remaining - bluff_quantity
+            valid = (opponent_quantity >= 0) & (opponent_quantity <= opponent_num_dice) & (user_quantity_remaining >= bluff_quantity)
+            prob_exactly_opponent_quantity = p ** np.maximum(opponent_quantity, 0)
+            prob_exactly_bluff_quantity = s2_expected_bluff_prob ** bluff_quantity
+            prob_sum += np.where(valid, prob_exactly_opponent_quantity * prob_exactly_bluff_quantity, 0)
+        return prob_sum
+
+    def bayes_weights(self, bid_quantities, bid_values, opponent_num_dice, s2_expected_bluff_prob, rules=None):
+        """
+        Return (H,) or (H, B) array of the bayes numerator p(b|s2, p(s1)) * p(s2) for every hand s2 in the space.
+        Arguments are the same as `conditional_bid_probs`
+        """
+        likelihoods = self.conditional_bid_probs(bid_quantities, bid_values, opponent_num_dice, s2_expected_bluff_prob, rules)
+        if likelihoods.ndim == 1:
+            return likelihoods * self.probs
+        return likelihoods * self.probs[:, np.newaxis]
+
+    def posteriors(self, bid_quantities, bid_values, opponent_num_dice, s2_expected_bluff_prob, rules=None):
+        """
+        Return (H,) or (H, B) array of p(s2|b, p(s1)) for every hand s2 in the space (see `LiarsDiceHand.conditional_opponent_hand_prob`).
+        Arguments are the same as `conditional_bid_probs`
+        """
+        weights = self.bayes_weights(bid_quantities, bid_values, opponent_num_dice, s2_expected_bluff_prob, rules)
+        return weights / weights.sum(axis=0)
+
+    def probability_correct(self, observer_value_counts, bid_quantities, bid_values, observer_num_dice, s2_expected_bluff_prob, rules=None):
+        """
+        IMPORTANT: the hands in the space are s2, the bidding player
+
+        observer_value_counts: int or (B,) array of the quantity of dice counting towards each bid value in s1's (observer's) hand
+        bid_quantities: int or (B,) array of bidding quantities
+        bid_values: int or (B,) array of bidding dice values
+        observer_num_dice: int of number of dice in s1's hand
+        s2_expected_bluff_prob: probability that s1 assigned to s2 bluffing
+        rules: Rules the bids are made under (see `conditional_bid_probs`)
+
+        Return float or (B,) array of the probability of each bid being correct where s1 is the observer.
+            P(bid b correct) = sum over all possible s2 of (indicator variable correct_bid with s2 and s1) * p(s2|bid b, p(s1))
+        """
+        weights = self.bayes_weights(bid_quantities, bid_values, observer_num_dice, s2_expected_bluff_prob, rules)
+        correct = (self.value_counts(bid_values, rules) + np.asarray(observer_value_counts)) >= np.asarray(bid_quantities)
+        return (weights * correct).sum(axis=0) / weights.sum(axis=0)
+
+
+def match_probs(bid_values, rules=None):
+    """
+    bid_values: int or (B,) array of bidding dice values
+    rules: Rules the bids are made under. None is the standard game
+
+    Return float or (B,) array of the probability that a single unseen die counts towards each bid value (see `Rules.match_prob`)
+    """
+    if rules is None or not rules.wild_ones:
+        return 1/6
+    return np.array([rules.match_prob(value) for value in range(1, 7)])[np.asarray(bid_values) - 1]
+
+
+# memoized in the "hand_spaces" LRU cache (see cache.py), keys are `num_dice`. Games with more players see spaces of every unseen dice count
+@memoize("hand_spaces", key=lambda num_dice: int(num_dice), maxsize=32, persistent=False)
+def hand_space(num_dice):
+    """
+    num_dice: int of number of dice in every hand of the space
+
+    Return the (shared) HandSpace of all hands with `num_dice` dice
+    """
+    return HandSpace(num_dice)
+
+
+#keys are the rounded face probability `p`, values are survival function tables (replaced when they grow)
+binomial_survival_tables = register_cache("binomial_survival_tables", maxsize=16, persistent=False)
+
+def binomial_survival_table(p, max_dice):
+    """
+    p: float probability that a single die matches
+    max_dice: int of the largest number of dice the table must cover
+
+    Return (N + 1, N + 2) array (N >= `max_dice`) where entry [n, k] is the probability that at least k of n dice match, 
+    i.e. the survival function P(X >= k) of X ~ Binomial(n, p). Tables are built once per `p` and grown on demand
+    """
+    key = round(p, 12)
+    table = binomial_survival_tables.get(key)
+    if table is not MISSING and len(table) > max_dice:
+        return table
+
+    # at least double the covered dice so growing tables are rebuilt rarely
+    num_dice = max(max_dice, 2 * (len(table) - 1) if table is not MISSING else 10)
+    pmf = np.zeros((num_dice + 1, num_dice + 2))
+    pmf[0, 0] = 1
+    for n in range(1, num_dice + 1):
+        # P(X_n = k) = P(X_{n-1} = k) * (1 - p) + P(X_{n-1} = k - 1) * p
+        pmf[n, 1:] = pmf[n - 1, 1:] * (1 - p) + pmf[n - 1, :-1] * p
+        pmf[n, 0] = pmf[n - 1, 0] * (1 - p)
+    table = np.cumsum(pmf[:, ::-1], axis=1)[:, ::-1]
+
+    binomial_survival_tables.put(key, table)
+    return table
+
+def binomial_survival(num_dice, quantities, p=1/6):
+    """
+    num_dice: int or array of number of dice
+    quantities: int or array of the quantity of matching dice needed
+    p: float probability that a single die matches
+
+    Return the probability that at least `quantities` of `num_dice` dice match (1 if `quantities` <= 0)
+    """
+    if type(num_dice) is int and type(quantities) is int:
+        # scalar fast path: index the table with python ints, the array conversions cost more than the lookup
+        if quantities <= 0:
+            return 1.0
+        if quantities > num_dice:
+            return 0.0
+        return binomial_survival_table(p, num_dice).item(num_dice, quantities)
+    num_dice = np.asarray(num_dice)
+    table = binomial_survival_table(p, int(num_dice.max()))
+    return table[num_dice, np.clip(quantities, 0, num_dice + 1)]
+
+def binomial_pmf(num_dice, p=1/6):
+    """
+    num_dice: int of number of dice
+    p: float probability that a single die matches
+
+    Return (num_dice + 1,) array where entry k is the probability that exactly k of `num_dice` dice match
+    """
+    table = binomial_survival_table(p, num_dice)
+    return table[num_dice, :num_dice + 1] - table[num_dice, 1:num_dice + 2]
+
+def bid_likelihoods(bid_quantity, bidder_num_dice, unseen_num_dice, s2_expected_bluff_prob, p=1/6):
+    """
+    IMPORTANT: the likelihoods are of s2, the bidding player
+
+    bid_quantity: int of bidding quantity
+    bidder_num_dice: int of number of dice in s2's hand
+    unseen_num_dice: int of number of dice s2 can't see (every other player's dice)
+    s2_expected_bluff_prob: probability that s1 assigned to s2 bluffing
+    p: float probability that a single unseen die matches the bid value
+
+    Return (bidder_num_dice + 1,) array where entry c is p(b|s2) for every hand s2 holding c dice of the bid value.
+    `LiarsDiceHand.conditional_bid_prob` only depends on the hand through c, so this is its value aggregated over hands
+    """
+    value_counts = np.arange(bidder_num_dice + 1)
+    quantity_remaining = bid_quantity - value_counts
+    user_quantity_remaining = bidder_num_dice - value_counts
+
+    prob_sum = np.zeros(bidder_num_dice + 1)
+    for bluff_quantity in range(bidder_num_dice + 1):
+        unseen_quantity = quantity_remaining - bluff_quantity
+        valid = (unseen_quantity >= 0) & (unseen_quantity <= unseen_num_dice) & (user_quantity_remaining >= bluff_quantity)
+        prob_sum += np.where(valid, p ** np.maximum(unseen_quantity, 0) * s2_expected_bluff_prob ** bluff_quantity, 0)
+    return prob_sum
+
+def bid_likelihood_coefficients(bid_quantity, bidder_num_dice, unseen_num_dice, p=1/6):
+    """
+    Arguments are the same as `bid_likelihoods`
+
+    Return (bidder_num_dice + 1, bidder_num_dice + 1) array C of the bid likelihoods as polynomials of the bluff probability:
+    bid_likelihoods(..., s2_expected_bluff_prob) == C @ s2_expected_bluff_prob ** arange(bidder_num_dice + 1). Lets the likelihood of many bids be
+    evaluated for any bluff probability with one matrix product
+    """
+    value_counts = np.arange(bidder_num_dice + 1)[:, np.newaxis]
+    bluff_quantities = np.arange(bidder_num_dice + 1)[np.newaxis, :]
+    unseen_quantity = bid_quantity - value_counts - bluff_quantities
+    valid = (unseen_quantity >= 0) & (unseen_quantity <= unseen_num_dice) & (bidder_num_dice - value_counts >= bluff_quantities)
+    return np.where(valid, p ** np.maximum(unseen_quantity, 0), 0)
+
+def aggregate_probability_correct(observer_value_count, bid_quantity, bidder_num_dice, others_num_dice, bidder_unseen_num_dice, s2_expected_bluff_prob, p=1/6):
+    """
+    IMPORTANT: the probability is from s1, the observing player
+
+    observer_value_count: int of the quantity of the bid value in s1's hand
+    bid_quantity: int of bidding quantity
+    bidder_num_dice: int of number of dice in s2's (bidding player's) hand
+    others_num_dice: int of number of dice of every player other than s1 and s2
+    bidder_unseen_num_dice: int of number of dice s2 can't see
+    s2_expected_bluff_prob: probability that s1 assigned to s2 bluffing
+    p: float probability that a single die matches the bid value
+
+    Return the probability of the bid being correct where s1 is the observer. Every hand only matters through its count of the bid value, so
+        P(bid b correct) = sum over c of p(c|b) * P(at least q - k - c of the other players' dice match)
+    with p(c|b) proportional to p(b|c) * Binomial(bidder_num_dice, p) pmf at c. Cost is polynomial in the number of dice however many players there are
+    """
+    weights = bid_likelihoods(bid_quantity, bidder_num_dice, bidder_unseen_num_dice, s2_expected_bluff_prob, p) * binomial_pmf(bidder_num_dice, p)
+    total_weight = weights.sum()
+    if total_weight == 0:
+        # no hand would make the bid, e.g. it exceeds every die on the board
+        return 0.0
+    others_survival = binomial_survival(others_num_dice, bid_quantity - observer_value_count - np.arange(bidder_num_dice + 1), p)
+    return float((weights * others_survival).sum() / total_weight)
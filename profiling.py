@@ -0,0 +1,124 @@
+from cache import cache_stats
+from contextlib import contextmanager
+from time import perf_counter
+import json
+import numpy as np
+
+
+class NullProfiler:
+    """
+    Profiler that records nothing. Default for games, which only time a phase when `enabled` is True
+    """
+    enabled = False
+
+    def record(self, phase, seconds):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class PhaseStats:
+    def __init__(self, num_bins):
+        """
+        num_bins: int of number of histogram bins. Bin k counts latencies in [2^k, 2^(k+1)) microseconds,
+            bin 0 also counts anything faster and the last bin anything slower
+
+        Initalize the count, total, extremes and latency histogram of one phase
+        """
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.histogram = np.zeros(num_bins, dtype=np.int64)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        microseconds = seconds * 1e6
+        bin_index = int(microseconds).bit_length() - 1 if microseconds >= 1 else 0
+        self.histogram[min(bin_index, len(self.histogram) - 1)] += 1
+
+    def quantile(self, q):
+        """
+        Return the upper edge in seconds of the histogram bin holding the `q` quantile latency
+        """
+        bin_index = int(np.searchsorted(np.cumsum(self.histogram), q * self.count))
+        return min(2.0 ** (bin_index + 1) / 1e6, self.max)
+
+    def to_dict(self):
+        return {"count": self.count, "total_s": self.total, "mean_us": 1e6 * self.total / self.count if self.count else 0.0,
+                "min_us": 1e6 * self.min if self.count else 0.0, "max_us": 1e6 * self.max,
+                "p50_us": 1e6 * self.quantile(0.5), "p99_us": 1e6 * self.quantile(0.99), "histogram_us_log2": self.histogram.tolist()}
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, num_bins=24):
+        """
+        num_bins: int of number of latency histogram bins per phase (see PhaseStats)
+
+        Initalize a profiler that games report their phases to, e.g. simulate_game(..., profiler=Profiler()). Phases are
+            construct_bid: a player constructing their bid
+            probability: an observer evaluating the probability a bid is correct and deciding to challenge
+            challenge_bid: resolving a challenge, including the rerolls
+            decrement_and_reroll: rerolling both hands after a challenge
+            events: formatting and printing game events
+        Cache hit rates (see cache.py) are reported relative to when the profiler was created
+        """
+        self.num_bins = num_bins
+        self.phases = {} #keys are phase names, values are PhaseStats objects
+        self.cache_start = cache_stats()
+
+    def record(self, phase, seconds):
+        """
+        Add one `seconds` long call of `phase`
+        """
+        if phase not in self.phases:
+            self.phases[phase] = PhaseStats(self.num_bins)
+        self.phases[phase].add(seconds)
+
+    @contextmanager
+    def phase(self, phase):
+        """
+        Context manager timing the code it wraps as one call of `phase`
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, perf_counter() - start)
+
+    def cache_hit_rates(self):
+        """
+        Return dictionary of the hits, misses and hit rate of every cache since the profiler was created
+        """
+        rates = {}
+        for name, stats in cache_stats().items():
+            start = self.cache_start.get(name, {"hits": 0, "misses": 0})
+            hits = max(stats["hits"] - start["hits"], 0)
+            misses = max(stats["misses"] - start["misses"], 0)
+            rates[name] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+        return rates
+
+    def to_dict(self):
+        """
+        Return dictionary of every phase's statistics and the cache hit rates, ready to be saved as json
+        """
+        return {"phases": {phase: stats.to_dict() for phase, stats in self.phases.items()}, "caches": self.cache_hit_rates()}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def __str__(self):
+        lines = [f"{'phase':<22}{'count':>9}{'total s':>10}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}"]
+        for phase, stats in sorted(self.phases.items(), key=lambda item: -item[1].total):
+            summary = stats.to_dict()
+            lines.append(f"{phase:<22}{summary['count']:>9}{summary['total_s']:>10.3f}{summary['mean_us']:>10.1f}{summary['p50_us']:>10.1f}{summary['p99_us']:>10.1f}")
+        for name, rates in self.cache_hit_rates().items():
+            lines.append(f"cache {name}: {rates['hits']} hits, {rates['misses']} misses, hit rate {rates['hit_rate']:.3f}")
+        return "\n".join(lines)
@@ -0,0 +1,137 @@
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_pdf import PdfPages
+import hashlib
+import json
+import multiprocessing
+import os
+
+
+RENDER_VERSION = 2 #bump when `draw_round_figure` changes, so every figure is redrawn
+
+
+def figure_hash(figure):
+    """
+    figure: dictionary describing one round level figure (see `plot_game`)
+
+    Return str hash of everything the figure is drawn from
+    """
+    return hashlib.sha1(json.dumps([RENDER_VERSION, figure], sort_keys=True, default=str).encode()).hexdigest()
+
+def draw_round_figure(figure):
+    """
+    figure: dictionary of a round's "observing_probabilities", "bidding_probabilities", "bidder_label", "observer_label" and "title"
+
+    Return matplotlib Figure of the probability each bid of the round is correct, from the observer's and the bidder's point of view.
+    The Figure is built without pyplot, so drawing needs no backend and never changes the backend of the calling process
+    """
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    observing_probabilities = figure["observing_probabilities"]
+    bidding_probabilities = figure["bidding_probabilities"]
+    ax.plot(range(1, len(observing_probabilities) + 1), observing_probabilities, marker='o', label=f"Observer - Observing_player: observer's estimation of bid_player_bluff_probability")
+    ax.plot(range(1, len(bidding_probabilities) + 1), bidding_probabilities, marker='o', label=f'Bidder -  Bidding_player: (bid quantity, bid value, bid true?)')
+    for i, bid_label in enumerate(figure["bidder_label"]):
+        ax.text(i + 1, bidding_probabilities[i], bid_label, ha='center', va='bottom')
+    for i, obs_label in enumerate(figure["observer_label"]):
+        ax.text(i + 1, observing_probabilities[i], obs_label, ha='center', va='top')
+
+    ax.set_xlabel('Bid Number')
+    ax.set_ylabel('Probability Bid Correct')
+    ax.set_title(figure["title"])
+    ax.grid(True)
+    ax.set_xticks(range(0, 8))
+    ax.set_yticks([i * 0.1 for i in range(11)])
+    ax.legend()
+    return fig
+
+def render_figures(figures):
+    """
+    figures: list of figure dictionaries, each with the "path" of its png
+
+    Draw and save every figure. Return list of (path, `figure_hash`) of every figure saved, in order
+    """
+    saved = []
+    for figure in figures:
+        draw_round_figure(figure).savefig(figure["path"])
+        saved.append((figure["path"], figure_hash(figure)))
+    return saved
+
+
+def load_manifest(path):
+    """
+    Return dictionary of the manifest at `path` (keys are output paths, values are `figure_hash`es), empty if there is none
+    """
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, path):
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+class RenderJob:
+    def __init__(self, pool=None, results=None, num_rendered=0, manifest=None, manifest_path=None):
+        """
+        Handle of round level figures being rendered in the background. `wait` returns once they are saved
+        """
+        self.pool = pool
+        self.results = results
+        self.num_rendered = num_rendered
+        self.manifest = manifest
+        self.manifest_path = manifest_path
+
+    def wait(self):
+        """
+        Wait for every figure, recording each task's figures in the manifest as they are saved, so a failed or interrupted
+        render never marks unsaved figures as up to date. Return the number of figures rendered (0 if all were up to date)
+        """
+        if self.pool is not None:
+            try:
+                for saved in self.results:
+                    self.manifest.update(saved)
+                    self.num_rendered += len(saved)
+            finally:
+                self.pool.terminate()
+                self.pool.join()
+                self.pool = None
+                save_manifest(self.manifest, self.manifest_path)
+        return self.num_rendered
+
+
+def render_round_figures(figures, manifest_path=None, num_workers=None, pdf_path=None, figures_per_task=20):
+    """
+    figures: list of figure dictionaries built by `plot_game`
+    manifest_path: str of the json manifest of previously rendered figures. Figures whose output exists and whose inputs are unchanged
+        are skipped. None renders everything
+    num_workers: int of number of worker processes (default os.cpu_count())
+    pdf_path: str of a single multi-page pdf to write every figure to, instead of one png per figure. The pages are drawn in order
+        in this process, so the pdf gets no parallelism (and `wait` returns at once)
+    figures_per_task: int of number of pngs each task of the process pool draws
+
+    Start rendering, with pngs drawn in a process pool. Return RenderJob, call its `wait` before reading the figures
+    """
+    manifest = load_manifest(manifest_path)
+
+    if pdf_path is not None:
+        pdf_hash = hashlib.sha1(''.join(figure_hash(figure) for figure in figures).encode()).hexdigest()
+        if manifest.get(pdf_path) == pdf_hash and os.path.exists(pdf_path):
+            return RenderJob()
+        # write then rename, so an interrupted render never leaves a partial pdf
+        with PdfPages(pdf_path + ".tmp") as pdf:
+            for figure in figures:
+                pdf.savefig(draw_round_figure(figure))
+        os.replace(pdf_path + ".tmp", pdf_path)
+        manifest[pdf_path] = pdf_hash
+        save_manifest(manifest, manifest_path)
+        return RenderJob(num_rendered=len(figures))
+
+    stale_figures = [figure for figure in figures if manifest.get(figure["path"]) != figure_hash(figure) or not os.path.exists(figure["path"])]
+    if not stale_figures:
+        return RenderJob()
+
+    tasks = [stale_figures[start:start + figures_per_task] for start in range(0, len(stale_figures), figures_per_task)]
+    pool = multiprocessing.Pool(num_workers)
+    return RenderJob(pool, pool.imap_unordered(render_figures, tasks), manifest=manifest, manifest_path=manifest_path)
@@ -0,0 +1,105 @@
+from model import LiarsDiceHand, MAX_DICE, CONDITIONAL_TABLE_VERSION
+from rules import RULES_TABLE_VERSION
+from cache import memoize
+import hashlib
+import inspect
+import os
+import pickle
+
+
+STATS_VERSION = 1 #manual override: bump for model changes `model_fingerprint` can't see, so every cached game_stats is recomputed
+results_cache_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Results', 'cache')
+
+
+def game_record_hash(game_obj):
+    """
+    game_obj: LiarsDiceGame object
+
+    Return str hash of the game's players, hands and actions. The game's index is left out, so the same record hashes the same
+    wherever it appears in a file
+    """
+    history = game_obj.game_history
+    actions = history.actions_array().copy()
+    rounds = history.rounds_array().copy()
+    actions["game"] = 0
+    rounds["game"] = 0
+    record_hash = hashlib.sha1(repr(history.player_names).encode())
+    record_hash.update(actions.tobytes())
+    record_hash.update(rounds.tobytes())
+    return record_hash.hexdigest()
+
+# memoized in the "model_fingerprints" LRU cache (see cache.py), keys are the stats function
+@memoize("model_fingerprints", key=lambda stats_function=None: stats_function, maxsize=8, persistent=False)
+def model_fingerprint(stats_function=None):
+    """
+    stats_function: function computing the game_stats (e.g. `plot_game`), its source is part of the fingerprint. None leaves it out
+
+    Return str hash of the model settings game_stats are computed with: `STATS_VERSION`, the table versions, MAX_DICE, the default
+    rules, bluff model and challenge threshold of a LiarsDiceHand, and the source of `stats_function`
+    """
+    hand_defaults = inspect.signature(LiarsDiceHand.__init__).parameters
+    settings = (STATS_VERSION, CONDITIONAL_TABLE_VERSION, RULES_TABLE_VERSION, MAX_DICE, repr(hand_defaults["rules"].default),
+                repr(hand_defaults["bluff_model"].default), hand_defaults["user_challenge_threshold"].default)
+    fingerprint = hashlib.sha1(repr(settings).encode())
+    if stats_function is not None:
+        fingerprint.update(inspect.getsource(stats_function).encode())
+    return fingerprint.hexdigest()
+
+def game_stats_key(game_obj, player1_name, player2_name, game_number, plot, probability_method, stats_function=None):
+    """
+    stats_function: function computing the game_stats (see `model_fingerprint`)
+
+    Return str content address of `plot_game`s game_stats: a hash of the game record, `model_fingerprint` and every parameter the
+    stats depend on. The game number only appears in the round level figures, so it is only part of the key when they are described (`plot`)
+    """
+    params = (player1_name, player2_name, probability_method, game_number if plot else None)
+    return hashlib.sha1(f"{game_record_hash(game_obj)}{model_fingerprint(stats_function)}{params}".encode()).hexdigest()
+
+
+class ResultsCache:
+    def __init__(self, folder=results_cache_folder):
+        """
+        folder: str of the folder holding one pickle file per cached game_stats
+
+        Initalize a content addressed cache of `plot_game` results, so analysis re-runs only process new or changed games
+        """
+        self.folder = folder
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.folder, f"{key}.pkl")
+
+    def get(self, key, game_save_folder):
+        """
+        key: str from `game_stats_key`
+        game_save_folder: str of the folder the round level figures are saved under in this run
+
+        Return the cached game_stats, None if there are none
+        """
+        path = self.path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        with open(path, 'rb') as f:
+            game_stats = pickle.load(f)
+        for figure in game_stats["round_figures"]:
+            figure["path"] = os.path.join(game_save_folder, figure["path"])
+        self.hits += 1
+        return game_stats
+
+    def put(self, key, game_stats, game_save_folder):
+        """
+        Save `game_stats` under `key`. Figure paths are stored relative to `game_save_folder`, so they can be reused by later runs
+        """
+        stored_stats = dict(game_stats)
+        stored_stats["round_figures"] = [dict(figure, path=os.path.relpath(figure["path"], game_save_folder)) for figure in game_stats["round_figures"]]
+        # write then rename, so an interrupted run never leaves a partial entry
+        temporary_path = self.path(key) + ".tmp"
+        with open(temporary_path, 'wb') as f:
+            pickle.dump(stored_stats, f)
+        os.replace(temporary_path, self.path(key))
+
+    def __str__(self):
+        return f"results cache {self.folder}: {self.hits} hits, {self.misses} misses"
@@ -0,0 +1,188 @@
+from probability import aggregate_probability_correct, binomial_survival
+from bluff import DEFAULT_BLUFF_MODEL
+import numpy as np
+import os
+
+
+RULES_TABLE_VERSION = 1
+tables_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Tables')
+
+
+class Rules:
+    def __init__(self, wild_ones=False):
+        """
+        wild_ones: boolean. If True ones are wild: every one counts towards bids on any other value, so a single die matches
+            a bid on 2,..,6 with probability 1/3 and a bid on ones with probability 1/6
+
+        Initalize the rules variant a game is played with. Bids are ordered by value first and then quantity (see `raises`).
+        With wild ones, ones rank above sixes: they are the hardest value to hit, and (Total dice, 1) is the highest bid
+        """
+        self.wild_ones = wild_ones
+        # values from the lowest to the highest ranked
+        self.value_order = (2, 3, 4, 5, 6, 1) if wild_ones else (1, 2, 3, 4, 5, 6)
+        self.value_ranks = np.zeros(7, dtype=np.int64) #entry v is the rank of value v
+        self.value_ranks[list(self.value_order)] = np.arange(6)
+        self.conditional_tables = {} #keys are (rounded match probability, opponent dice, rounded bluff probability), values are arrays from `conditional_table`
+        self.tables_loaded = False #have the tables saved by `save_conditional_tables` been read
+
+    def match_prob(self, bid_value):
+        """
+        Return the probability that a single die counts towards a bid on `bid_value`
+        """
+        return 1/3 if self.wild_ones and bid_value != 1 else 1/6
+
+    def matching_quantity(self, counts, bid_value):
+        """
+        counts: (6,) array of the quantity of 1,2,..,6 in a hand
+
+        Return the number of dice in the hand that count towards a bid on `bid_value`
+        """
+        if self.wild_ones and bid_value != 1:
+            return counts.item(bid_value - 1) + counts.item(0)
+        return counts.item(bid_value - 1)
+
+    def top_value(self):
+        """
+        Return the highest ranked value. A bid on it can only be raised by quantity
+        """
+        return self.value_order[-1]
+
+    def higher_values(self, bid_value):
+        """
+        Return list of the values ranked above `bid_value`, lowest ranked first
+        """
+        return list(self.value_order[self.value_ranks[bid_value] + 1:])
+
+    def raises(self, previous_bid, bid):
+        """
+        previous_bid: Bid object. None if no bid has been made
+        bid: Bid object
+
+        Return boolean, does `bid` raise `previous_bid` (any quantity of a higher ranked value, or a higher quantity of the same value)
+        """
+        if previous_bid is None:
+            return True
+        if bid.bid_value == previous_bid.bid_value:
+            return bid.bid_quantity > previous_bid.bid_quantity
+        return self.value_ranks[bid.bid_value] > self.value_ranks[previous_bid.bid_value]
+
+    def is_max_bid(self, bid, total_dice):
+        """
+        Return boolean, is `bid` the highest possible bid with `total_dice` dice on the board (it can only be challenged)
+        """
+        return bid.bid_value == self.top_value() and bid.bid_quantity >= total_dice
+
+    def conditional_table(self, p, opponent_num_dice, s2_expected_bluff_prob, max_dice):
+        """
+        p: float probability that a single die matches the bid value
+        opponent_num_dice: int of number of dice of the opponent
+        s2_expected_bluff_prob: float probability the observer assigns to the opponent bluffing
+        max_dice: int of the largest number of dice of the observer the table must cover
+
+        Return (N + 1, N + 1, N + opponent_num_dice + 1) array (N >= `max_dice`) where entry [k, n, q] is the two player conditional
+        probability that a bid of quantity q is correct for an observer holding k matching dice out of n against the opponent.
+        Tables are keyed like model.py's `conditional_table_key` (bluff probabilities rounded to 12 digits), read from `table_path`
+        (built offline by `python model.py`), and built once per key and grown on demand when the stored tables don't cover `max_dice`
+        """
+        if not self.tables_loaded:
+            self.load_conditional_tables()
+        key = (round(p, 12), int(opponent_num_dice), round(s2_expected_bluff_prob, 12))
+        table = self.conditional_tables.get(key)
+        if table is not None and len(table) > max_dice:
+            return table
+
+        table = self.build_conditional_table(p, opponent_num_dice, s2_expected_bluff_prob, max(max_dice, 6))
+        self.conditional_tables[key] = table
+        return table
+
+    def build_conditional_table(self, p, opponent_num_dice, s2_expected_bluff_prob, num_dice):
+        """
+        Return the (num_dice + 1, num_dice + 1, num_dice + opponent_num_dice + 1) table of `conditional_table`, computed from `aggregate_probability_correct`
+        """
+        table = np.zeros((num_dice + 1, num_dice + 1, num_dice + opponent_num_dice + 1))
+        for observer_num_dice in range(num_dice + 1):
+            for observer_value_count in range(observer_num_dice + 1):
+                for bid_quantity in range(1, observer_num_dice + opponent_num_dice + 1):
+                    table[observer_value_count, observer_num_dice, bid_quantity] = aggregate_probability_correct(
+                        observer_value_count, bid_quantity, opponent_num_dice, 0, observer_num_dice, s2_expected_bluff_prob, p)
+        return table
+
+    def clear_conditional_tables(self):
+        """
+        Drop every conditional table, the stored tables are read again on the next lookup
+        """
+        self.conditional_tables.clear()
+        self.tables_loaded = False
+
+    def table_path(self):
+        """
+        Return the path of the file `save_conditional_tables` writes the rules' conditional tables to
+        """
+        return os.path.join(tables_folder, f"{'wild_ones' if self.wild_ones else 'standard'}_conditional_tables.npz")
+
+    def save_conditional_tables(self, max_dice, path=None, bluff_probs=None, bluff_model=DEFAULT_BLUFF_MODEL):
+        """
+        max_dice: int of the largest number of dice per player the tables cover
+        path: str of the npz file to write (default `table_path()`)
+        bluff_probs: list of bluff probabilities to cover. None covers the `expected_opponent_bluff_prob` of every opponent with `bluff_model`
+        bluff_model: BluffModel of the observers when `bluff_probs` is None (see bluff.py)
+
+        Build the conditional table of every match probability of the rules, opponent dice and bluff probability (see `conditional_table`)
+        and save them along with `RULES_TABLE_VERSION`. Return the number of tables saved
+        """
+        path = self.table_path() if path is None else path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        keys = [(p, opponent_num_dice, s2_expected_bluff_prob) for p in sorted({self.match_prob(value) for value in range(1, 7)})
+                for opponent_num_dice in range(1, max_dice + 1)
+                for s2_expected_bluff_prob in ([bluff_model.expected_opponent_bluff_prob(opponent_num_dice)] if bluff_probs is None else bluff_probs)]
+        tables = {f"table_{index}": self.build_conditional_table(*key, max(max_dice, 6)) for index, key in enumerate(keys)}
+        np.savez(path, version=RULES_TABLE_VERSION, keys=np.array(keys), **tables)
+        return len(tables)
+
+    def load_conditional_tables(self, path=None):
+        """
+        path: str of an npz file written by `save_conditional_tables` (default `table_path()`)
+
+        Add the stored tables to the rules' tables. Raise ValueError if they were saved by a different `RULES_TABLE_VERSION`.
+        Return the number of tables loaded, 0 if there is no file
+        """
+        self.tables_loaded = True
+        path = self.table_path() if path is None else path
+        if not os.path.exists(path):
+            return 0
+        with np.load(path) as stored:
+            if int(stored["version"]) != RULES_TABLE_VERSION:
+                raise ValueError(f"Conditional tables {path} have version {int(stored['version'])}, expected {RULES_TABLE_VERSION}. Rebuild them with `python model.py`.")
+            keys = stored["keys"].tolist()
+            for index, (p, opponent_num_dice, s2_expected_bluff_prob) in enumerate(keys):
+                self.conditional_tables[(round(p, 12), int(opponent_num_dice), round(s2_expected_bluff_prob, 12))] = stored[f"table_{index}"]
+        return len(keys)
+
+    def truthful_probability_correct(self, observer_value_count, opponent_num_dice, bid_quantity, bid_value):
+        """
+        Return the probability that at least `bid_quantity` - `observer_value_count` of the opponent's dice count towards `bid_value`
+        """
+        quantity_opponent_needs_to_have = bid_quantity - observer_value_count
+        if quantity_opponent_needs_to_have <= 0:
+            return 1
+        return float(binomial_survival(opponent_num_dice, quantity_opponent_needs_to_have, self.match_prob(bid_value)))
+
+    def conditional_probability_correct(self, observer_value_count, observer_num_dice, opponent_num_dice, bid_quantity, bid_value, s2_expected_bluff_prob):
+        """
+        Return the two player conditional probability a bid is correct, read from the table of the bid value's match probability,
+        the opponent's dice and the expected bluff probability (see `conditional_table`)
+        """
+        p = self.match_prob(bid_value)
+        if bid_quantity > observer_num_dice + opponent_num_dice:
+            return 0.0
+        if opponent_num_dice == 0:
+            return aggregate_probability_correct(observer_value_count, bid_quantity, opponent_num_dice, 0, observer_num_dice, s2_expected_bluff_prob, p)
+        table = self.conditional_table(p, opponent_num_dice, s2_expected_bluff_prob, observer_num_dice)
+        return float(table[observer_value_count, observer_num_dice, bid_quantity])
+
+    def __repr__(self):
+        return f"Rules(wild_ones={self.wild_ones})"
+
+
+STANDARD_RULES = Rules()
+WILD_ONES_RULES = Rules(wild_ones=True)
@@ -0,0 +1,156 @@
+from model import *
+from probability import hand_space
+
+
+class MatchSolver:
+    def __init__(self, probability_method, player1_challenge_threshold=0.51, player2_challenge_threshold=0.51, rules=STANDARD_RULES,
+                 player1_bluff_model=DEFAULT_BLUFF_MODEL, player2_bluff_model=DEFAULT_BLUFF_MODEL):
+        """
+        probability_method: str. "truthful" or "conditional", how observers estimate the probability a bid is correct (see `simulate_game`)
+        player1_challenge_threshold: float `user_challenge_threshold` of player1
+        player2_challenge_threshold: float `user_challenge_threshold` of player2
+        rules: Rules the match is played with (see rules.py)
+        player1_bluff_model: BluffModel of player1 (see bluff.py)
+        player2_bluff_model: BluffModel of player2
+
+        Initalize an exact solver of the match played by `simulate_game`: both players bid with `LiarsDiceHand.bid_distribution`
+        and challenge when the observer's probability that the bid is correct is at or below their challenge threshold.
+
+        The state between rounds is (player1 dice, player2 dice, opening player), so the probability player1 wins the match is
+            W(d1, d2, opener) = P(player1 loses round) * W(d1 - 1, d2, 1) + P(player2 loses round) * W(d1, d2 - 1, 2)
+        (the loser opens the next round), with W(0, d2, .) = 0 and W(d1, 0, .) = 1.
+        Round probabilities are exact expectations over every pair of hands and every random choice of the bidding heuristic.
+
+        The solver is exact for HeuristicAgent players only (not the "belief" method, CFR policies or other agents). Each (d1, d2, opener)
+        state enumerates every pair of hands and every bidding sequence, so the cost grows quickly with the dice: solving 5v5 takes several seconds
+        """
+        if probability_method not in ("truthful", "conditional"):
+            raise NameError(f"Incorrect probability method. You chose {probability_method}.")
+        self.probability_method = probability_method
+        self.challenge_thresholds = {1: player1_challenge_threshold, 2: player2_challenge_threshold}
+        self.rules = rules
+        self.bluff_models = {1: player1_bluff_model, 2: player2_bluff_model}
+
+        self.memo_bids = {} #keys are (hand key, previous bid), values are list of (probability, bid)
+        self.memo_challenges = {} #keys are (hand key, bid), values are boolean challenge decisions
+        self.memo_round_loss = {} #keys are (d1, d2, opener), values are P(player1 loses round)
+        self.memo_win = {} #keys are (d1, d2, opener), values are P(player1 wins match)
+
+    def hands(self, player, user_num_dice, opponent_num_dice):
+        """
+        Return list of (probability, hand key, LiarsDiceHand) of every hand `player` can roll with `user_num_dice` dice.
+        The hand key (player, user_num_dice, opponent_num_dice, hand index) identifies the hand in the solver's memos
+        """
+        space = hand_space(user_num_dice)
+        return [(prob, (player, user_num_dice, opponent_num_dice, index), LiarsDiceHand(str(player), counts, opponent_num_dice, self.challenge_thresholds[player],
+                                                                                       rules=self.rules, bluff_model=self.bluff_models[player]))
+                for index, (prob, counts) in enumerate(zip(space.probs.tolist(), space.counts))]
+
+    def bid_options(self, hand_key, hand, previous_bid):
+        """
+        Return list of (probability, (bid_quantity, bid_value)) of the bids `hand` makes after `previous_bid` (a tuple or None)
+        """
+        key = (hand_key, previous_bid)
+        if key not in self.memo_bids:
+            previous_bid_object = None if previous_bid is None else Bid(*previous_bid)
+            self.memo_bids[key] = [(prob, (bid.bid_quantity, bid.bid_value)) for prob, bid in hand.bid_distribution(previous_bid_object)]
+        return self.memo_bids[key]
+
+    def challenges(self, hand_key, hand, bid):
+        """
+        Return boolean, does the player holding `hand` challenge `bid` (a (bid_quantity, bid_value) tuple)
+        """
+        key = (hand_key, bid)
+        if key not in self.memo_challenges:
+            bid_object = Bid(*bid)
+            if self.probability_method == "truthful":
+                prob_bid_correct = hand.compute_truthful_probability_correct(bid_object)
+            else:
+                prob_bid_correct = hand.compute_conditional_probability_correct(bid_object, hand.expected_opponent_bluff_prob())
+
+            total_dice_on_board = len(hand) + hand.opponent_num_dice
+            # the player is forced to challenge the largest possible bid
+            forced = self.rules.is_max_bid(bid_object, total_dice_on_board)
+            self.memo_challenges[key] = prob_bid_correct <= hand.user_challenge_threshold or forced
+        return self.memo_challenges[key]
+
+    def matching_quantities(self, hand):
+        """
+        Return tuple of the number of `hand`s dice that count towards a bid on 1,2,..,6 (ones also count with wild ones)
+        """
+        return tuple(hand.quantity_of_value(value) for value in range(1, 7))
+
+    def play_round(self, hands, bidder, previous_bid):
+        """
+        hands: dictionary of player (1 or 2) to (hand key, LiarsDiceHand, tuple of the number of dice counting towards bids on 1,2,..,6)
+        bidder: int of player making the next bid
+        previous_bid: tuple (bid_quantity, bid_value) of the last bid. None if no bid has been made
+
+        Return the probability player1 loses the round from this point
+        """
+        observer = 3 - bidder
+        bidder_key, bidder_hand, _ = hands[bidder]
+        observer_key, observer_hand, _ = hands[observer]
+        prob_player1_loses = 0
+        for bid_prob, bid in self.bid_options(bidder_key, bidder_hand, previous_bid):
+            if self.challenges(observer_key, observer_hand, bid):
+                actual_quantity = hands[1][2][bid[1] - 1] + hands[2][2][bid[1] - 1]
+                # challenger loses if the bid is correct
+                loser = observer if actual_quantity >= bid[0] else bidder
+                prob_player1_loses += bid_prob * (loser == 1)
+            else:
+                prob_player1_loses += bid_prob * self.play_round(hands, observer, bid)
+        return prob_player1_loses
+
+    def round_loss_probability(self, player1_num_dice, player2_num_dice, opener):
+        """
+        player1_num_dice: int of number of dice player1 has
+        player2_num_dice: int of number of dice player2 has
+        opener: int (1 or 2) of player making the first bid
+
+        Return the probability that player1 loses the round
+        """
+        key = (player1_num_dice, player2_num_dice, opener)
+        if key not in self.memo_round_loss:
+            prob_player1_loses = 0
+            player2_hands = [(hand2_prob, (hand2_key, hand2, self.matching_quantities(hand2))) for hand2_prob, hand2_key, hand2 in self.hands(2, player2_num_dice, player1_num_dice)]
+            for hand1_prob, hand1_key, hand1 in self.hands(1, player1_num_dice, player2_num_dice):
+                hand1_state = (hand1_key, hand1, self.matching_quantities(hand1))
+                for hand2_prob, hand2_state in player2_hands:
+                    prob_player1_loses += hand1_prob * hand2_prob * self.play_round({1: hand1_state, 2: hand2_state}, opener, None)
+            self.memo_round_loss[key] = prob_player1_loses
+        return self.memo_round_loss[key]
+
+    def win_probability(self, player1_num_dice, player2_num_dice, opener=1):
+        """
+        player1_num_dice: int of number of dice player1 has
+        player2_num_dice: int of number of dice player2 has
+        opener: int (1 or 2) of player making the first bid of the round
+
+        Return the probability that player1 wins the match from this state
+        """
+        if player1_num_dice == 0:
+            return 0.0
+        if player2_num_dice == 0:
+            return 1.0
+
+        key = (player1_num_dice, player2_num_dice, opener)
+        if key not in self.memo_win:
+            prob_player1_loses = self.round_loss_probability(player1_num_dice, player2_num_dice, opener)
+            self.memo_win[key] = (prob_player1_loses * self.win_probability(player1_num_dice - 1, player2_num_dice, 1)
+                                  + (1 - prob_player1_loses) * self.win_probability(player1_num_dice, player2_num_dice - 1, 2))
+        return self.memo_win[key]
+
+    def solve(self, max_dice=5):
+        """
+        max_dice: int of the largest number of dice per player
+
+        Return dictionary of (player1 dice, player2 dice, opener) to the probability that player1 wins the match
+        """
+        return {(player1_num_dice, player2_num_dice, opener): self.win_probability(player1_num_dice, player2_num_dice, opener)
+                for player1_num_dice in range(1, max_dice + 1) for player2_num_dice in range(1, max_dice + 1) for opener in (1, 2)}
+
+
+if __name__ == "__main__":
+    solver = MatchSolver("conditional", player2_challenge_threshold=0.4)
+    print(f"P(Me wins) = {solver.win_probability(5, 5, 1):.4f}")
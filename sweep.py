@@ -0,0 +1,170 @@
+from model import *
+from tournament import iter_shards, wilson_interval
+import json
+
+
+DEFAULT_PARAMETERS = {"challenge_threshold": 0.51, "bluff_scale": 1.0, "bluff_exponent": 2.0, "opponent_bluff_scale": 1.0, "opponent_bluff_exponent": 2.0}
+
+def grid_points(grid):
+    """
+    grid: dictionary of the values of each swept parameter, e.g. {"challenge_threshold": [0.3, 0.4, 0.5]}. Parameters are the keys of
+        DEFAULT_PARAMETERS, those left out keep their default
+
+    Return list of dictionaries of every combination of the values (the product of the grid), one dictionary of all parameters per point
+    """
+    for name in grid:
+        if name not in DEFAULT_PARAMETERS:
+            raise NameError(f"Unknown parameter {name}. Parameters are {list(DEFAULT_PARAMETERS)}.")
+    names = list(grid)
+    return [dict(DEFAULT_PARAMETERS, **dict(zip(names, values))) for values in itertools.product(*(grid[name] for name in names))]
+
+def bluff_model(params):
+    """
+    Return BluffModel of a point of `grid_points`
+    """
+    return BluffModel(params["bluff_scale"], params["bluff_exponent"], params["opponent_bluff_scale"], params["opponent_bluff_exponent"])
+
+def player_game_kwargs(params, player):
+    """
+    params: dictionary of a point of `grid_points`
+    player: int, 1 or 2
+
+    Return dictionary of the `simulate_game` keyword arguments giving `player` the parameters
+    """
+    return {f"player{player}_challenge_threshold": params["challenge_threshold"], f"player{player}_bluff_model": bluff_model(params)}
+
+def precompute_tables(points, max_dice):
+    """
+    points: list of dictionaries of points of `grid_points`
+    max_dice: int of the largest hand size played
+
+    Add the conditional probabilities of every point's expected opponent bluff probabilities to the shared conditional probability table,
+    so observers with a non default bluff model read them instead of recomputing them every decision. Workers forked afterwards share the table
+    """
+    table = get_conditional_probability_table()
+    bluff_models = {}
+    for params in points:
+        model = bluff_model(params)
+        bluff_models[(model.opponent_scale, model.opponent_exponent)] = model
+    for model in bluff_models.values():
+        if not model.is_default():
+            table.update(build_conditional_probability_table(max_dice, bluff_model=model))
+
+
+class SweepResult:
+    def __init__(self, player1_points, player2_points, player1_name):
+        """
+        player1_points: list of dictionaries of player1's parameters, the rows of the results matrix
+        player2_points: list of dictionaries of player2's parameters, the columns of the results matrix
+        player1_name: str of player1's name
+
+        Initalize an empty results matrix of player1's wins in every matchup
+        """
+        self.player1_points = player1_points
+        self.player2_points = player2_points
+        self.player1_name = player1_name
+        self.wins = np.zeros((len(player1_points), len(player2_points)), dtype=np.int64)
+        self.rounds = np.zeros((len(player1_points), len(player2_points)), dtype=np.int64)
+        self.num_games = 0
+
+    def add(self, game_results):
+        """
+        game_results: list of `game_result`s of one seed, one per matchup in row major order
+        """
+        winners = np.array([result["Winner"] == self.player1_name for result in game_results])
+        self.wins += winners.reshape(self.wins.shape)
+        self.rounds += np.array([result["Rounds"] for result in game_results]).reshape(self.rounds.shape)
+        self.num_games += 1
+
+    def win_rates(self):
+        """
+        Return (P1, P2) array of player1's win rate in every matchup
+        """
+        return self.wins / self.num_games
+
+    def confidence_intervals(self):
+        """
+        Return (P1, P2, 2) array of the Wilson 95% confidence interval of every win rate
+        """
+        return np.array([[wilson_interval(wins, self.num_games) for wins in row] for row in self.wins.tolist()])
+
+    def to_dict(self):
+        return {"player1_points": self.player1_points, "player2_points": self.player2_points, "num_games": self.num_games,
+                "player1_win_rates": self.win_rates().tolist(), "confidence_intervals": self.confidence_intervals().tolist(),
+                "mean_rounds": (self.rounds / self.num_games).tolist()}
+
+    def save(self, path):
+        """
+        path: str of the json file the results matrix is written to
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def __str__(self):
+        swept = [name for name in DEFAULT_PARAMETERS if len({point[name] for point in self.player1_points + self.player2_points}) > 1] or ["challenge_threshold"]
+        label = lambda point: ",".join(f"{point[name]:g}" for name in swept)
+        lines = [f"{self.player1_name} win rate over {self.num_games} games, rows player1 / columns player2 ({', '.join(swept)})",
+                 f"{'':>16}" + "".join(f"{label(point):>16}" for point in self.player2_points)]
+        for point, row in zip(self.player1_points, self.win_rates()):
+            lines.append(f"{label(point):>16}" + "".join(f"{rate:>16.4f}" for rate in row))
+        return "\n".join(lines)
+
+
+def run_sweep(player1_grid, player2_grid, num_games, probability_method="conditional", seed=0, num_workers=None, games_per_shard=100,
+              player1_name="Me", player2_name="Subject", starting_num_dice=5):
+    """
+    player1_grid: dictionary of player1's parameter values (see `grid_points`)
+    player2_grid: dictionary of player2's parameter values
+    num_games: int of number of games per matchup
+    Other arguments are the same as `tournament.iter_tournament`
+
+    Play every matchup of a player1 point against a player2 point. Every matchup plays the same seeds with common random numbers,
+    so differences between cells are not dice luck. Games are sharded over a process pool, each shard plays its seeds for every matchup.
+    Return SweepResult
+    """
+    player1_points = grid_points(player1_grid)
+    player2_points = grid_points(player2_grid)
+    precompute_tables(player1_points + player2_points, starting_num_dice)
+
+    game_kwargs_list = [dict(player_game_kwargs(player1_params, 1), **player_game_kwargs(player2_params, 2), starting_num_dice=starting_num_dice, common_random_numbers=True)
+                        for player1_params in player1_points for player2_params in player2_points]
+    result = SweepResult(player1_points, player2_points, player1_name)
+    for game_results in iter_shards(num_games, player1_name, player2_name, probability_method, seed, num_workers, games_per_shard, game_kwargs_list):
+        result.add(game_results)
+    return result
+
+
+def adaptive_search(parameter, low, high, num_games, player1_grid=None, player2_grid=None, num_points=5, num_rounds=3, **sweep_kwargs):
+    """
+    parameter: str of player1's parameter to tune (see DEFAULT_PARAMETERS)
+    low, high: floats of the initial search interval
+    num_games: int of number of games per evaluated value
+    player1_grid: dictionary of player1's other (fixed) parameters, one value each
+    player2_grid: dictionary of player2's parameters. The tuned value maximizes the mean win rate over every player2 point
+    num_points: int of number of values evaluated per round
+    num_rounds: int of number of rounds
+    sweep_kwargs: extra keyword arguments of `run_sweep`
+
+    Grid search refined around the best value: every round sweeps `num_points` values over the interval, then shrinks the interval
+    to the best value's neighbours. Every round plays the same seeds, so values are compared under common random numbers.
+    Return tuple (best value, its mean win rate, list of every round's SweepResult)
+    """
+    results = []
+    best_value, best_rate = None, -1.0
+    for _ in range(num_rounds):
+        values = np.linspace(low, high, num_points).tolist()
+        result = run_sweep(dict(player1_grid or {}, **{parameter: values}), player2_grid or {}, num_games, **sweep_kwargs)
+        results.append(result)
+        mean_rates = result.win_rates().mean(axis=1)
+        best_index = int(np.argmax(mean_rates))
+        if mean_rates[best_index] > best_rate:
+            best_value, best_rate = values[best_index], float(mean_rates[best_index])
+        low, high = values[max(best_index - 1, 0)], values[min(best_index + 1, num_points - 1)]
+    return best_value, best_rate, results
+
+
+if __name__ == "__main__":
+    result = run_sweep({"challenge_threshold": [0.3, 0.4, 0.5, 0.6]}, {"challenge_threshold": [0.4, 0.51], "opponent_bluff_scale": [1.0, 2.0]}, 1000)
+    print(result)
+    result.save("./Results/sweep_results.json")
+    print(adaptive_search("challenge_threshold", 0.2, 0.7, 1000)[:2])
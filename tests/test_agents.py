@@ -0,0 +1,47 @@
+import random
+import numpy as np
+import pytest
+from agents import *
+
+
+BLUFF_MODELS = [DEFAULT_BLUFF_MODEL, BluffModel(2.5, 1.0, 0.7, 0.5)]
+
+
+def decision_states(bluff_model, num_states=2000, seed=0):
+    generator = random.Random(seed)
+    states = []
+    for _ in range(num_states):
+        num_dice, opponent_num_dice = generator.randint(1, 5), generator.randint(1, 5)
+        counts = [0] * 6
+        for _ in range(num_dice):
+            counts[generator.randint(0, 5)] += 1
+        hand = LiarsDiceHand("", counts, opponent_num_dice, generator.choice([0.3, 0.51, 0.7]), bluff_model=bluff_model)
+        last_bid = None if generator.random() < 0.2 else Bid(generator.randint(1, num_dice + opponent_num_dice), generator.randint(1, 6))
+        states.append(DecisionState(hand, last_bid))
+    return states
+
+
+@pytest.mark.parametrize("bluff_model", BLUFF_MODELS, ids=repr)
+@pytest.mark.parametrize("probability_method", ["truthful", "conditional"])
+def test_challenge_batch_matches_challenge(bluff_model, probability_method):
+    states = [state for state in decision_states(bluff_model) if state.last_bid is not None]
+    agent = HeuristicAgent(probability_method)
+    batched = agent.challenge_batch(DecisionBatch.from_states(states))
+    assert batched.tolist() == [agent.challenge(state) for state in states]
+
+
+@pytest.mark.parametrize("bluff_model", BLUFF_MODELS, ids=repr)
+def test_bid_batch_draws_from_bid_distribution(bluff_model):
+    states = decision_states(bluff_model)
+    quantities, values = HeuristicAgent().bid_batch(DecisionBatch.from_states(states), np.random.default_rng(0))
+    for state, quantity, value in zip(states, quantities, values):
+        assert (quantity, value) in {(bid.bid_quantity, bid.bid_value) for _, bid in state.hand.bid_distribution(state.last_bid)}
+
+
+def test_seeded_game_ignores_global_random_state():
+    histories = []
+    for global_seed in (1, 2):
+        random.seed(global_seed)
+        game = simulate_game("Me", "Subject", "conditional", verbose=False, seed=3)
+        histories.append(dict(game.game_history.items()))
+    assert histories[0] == histories[1]
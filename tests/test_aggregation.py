@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from aggregation import GroupedStats
+
+
+def observations(seed=0, size=500):
+    rng = np.random.default_rng(seed)
+    return rng.integers(2, 11, size=size), rng.normal(3.0, 2.0, size=size)
+
+
+def grouped_stats(keys, values, capacity=4):
+    # a small capacity makes the arrays grow while filling
+    stats = GroupedStats(capacity)
+    for key, value in zip(keys.tolist(), values.tolist()):
+        stats.add(key, value)
+    return stats
+
+
+def test_means_and_variances_match_numpy():
+    keys, values = observations()
+    stats = grouped_stats(keys, values)
+    groups = np.unique(keys)
+    assert stats.groups().tolist() == groups.tolist()
+    assert stats.counts().tolist() == [int((keys == key).sum()) for key in groups]
+    assert stats.means() == pytest.approx([values[keys == key].mean() for key in groups])
+    assert stats.variances() == pytest.approx([values[keys == key].var(ddof=1) for key in groups])
+    assert stats.variances(ddof=0) == pytest.approx([values[keys == key].var() for key in groups])
+    assert stats.quantiles([0.1, 0.5, 0.9]) == pytest.approx(np.array([np.quantile(values[keys == key], [0.1, 0.5, 0.9]) for key in groups]))
+
+
+def test_variance_of_single_observation_is_nan():
+    stats = GroupedStats()
+    stats.extend(1, [2.0, 4.0])
+    stats.add(2, 5.0)
+    assert stats.variances()[0] == pytest.approx(2.0)
+    assert np.isnan(stats.variances()[1])
+
+
+def test_merge_equals_one_stream():
+    keys, values = observations(seed=1)
+    first = grouped_stats(keys[:200], values[:200])
+    second = grouped_stats(keys[200:], values[200:])
+    first.merge(second)
+    combined = grouped_stats(keys, values)
+    assert first.counts().tolist() == combined.counts().tolist()
+    assert first.means() == pytest.approx(combined.means())
+    assert first.variances() == pytest.approx(combined.variances())
+
+
+def test_reads_like_a_dict_of_lists():
+    dict_ = {3: [1.0, 2.0], 5: [4.0]}
+    stats = GroupedStats()
+    stats.update_from_dict(dict_)
+    assert list(stats) == [3, 5] and len(stats) == 2
+    assert {key: stats[key].tolist() for key in stats} == dict_
+    with pytest.raises(KeyError):
+        stats[4]
+
+
+def test_bootstrap_ci_matches_normal_approximation():
+    keys, values = observations(seed=2, size=4000)
+    stats = grouped_stats(keys, values)
+    intervals = stats.bootstrap_ci(num_resamples=2000, rng=np.random.default_rng(0), max_draws=10**5)
+    assert intervals.shape == (len(stats), 2)
+    assert np.array_equal(intervals, stats.bootstrap_ci(num_resamples=2000, rng=np.random.default_rng(0), max_draws=10**5))
+    half_widths = 1.96 * np.sqrt(stats.variances() / stats.counts())
+    assert intervals[:, 0] == pytest.approx(stats.means() - half_widths, abs=0.03)
+    assert intervals[:, 1] == pytest.approx(stats.means() + half_widths, abs=0.03)
+    assert GroupedStats().bootstrap_ci().shape == (0, 2)
@@ -0,0 +1,19 @@
+from benchmark import compare_results
+
+
+def results(median_per_call_us, spread=0.05):
+    return {"benchmarks": {"bench": {"calls": 10, "median_s": 1e-5 * median_per_call_us, "median_per_call_us": median_per_call_us, "spread": spread}}}
+
+
+def test_compare_results_allows_noise():
+    baseline = results(1.0)
+    assert compare_results(results(1.4), baseline) == []
+    assert [name for name, *_ in compare_results(results(1.6), baseline)] == ["bench"]
+    # noisy repeats widen the allowed slowdown
+    assert compare_results(results(1.6, spread=0.8), baseline) == []
+    assert compare_results(results(1.3), baseline, tolerance=0.25) != []
+
+
+def test_compare_results_reads_old_baselines():
+    baseline = {"benchmarks": {"bench": {"calls": 10, "median_s": 1e-5}}}
+    assert compare_results(results(1.4), baseline) == []
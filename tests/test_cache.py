@@ -0,0 +1,65 @@
+import pytest
+import model
+from cache import LRUCache, MISSING, memoize, register_cache, cache_stats, save_caches, warm_caches
+
+
+def test_lru_eviction_and_counts():
+    cache = LRUCache("test_lru", maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.get("b") is MISSING
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 1, "misses": 1, "evictions": 1, "hit_rate": 0.5}
+
+    cache.resize(1)
+    assert list(cache.entries) == ["c"] and cache.evictions == 2
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["hits"] == cache.stats()["misses"] == cache.stats()["evictions"] == 0
+
+
+def test_unbounded_cache_never_evicts():
+    cache = LRUCache("test_unbounded", maxsize=None)
+    for key in range(100):
+        cache.put(key, key)
+    assert len(cache) == 100 and cache.evictions == 0
+
+
+def test_memoize_keys_keyword_arguments_by_name():
+    calls = []
+
+    @memoize("test_memoize_kwargs", key=lambda x, y=1: (x, y), maxsize=8, persistent=False)
+    def add(x, y=1):
+        calls.append((x, y))
+        return x + y
+
+    assert add(1) == add(1, 1) == add(x=1, y=1) == add(1, y=1) == 2
+    assert calls == [(1, 1)]
+    assert add.cache.stats()["hits"] == 3
+
+
+def test_every_memo_is_registered():
+    import agents, multiplayer, fitting
+    assert {"list_hands", "toy_hand_objects", "prob_hand", "conditional_bid_prob", "expected_opponent_dice_dict", "hand_spaces",
+            "binomial_survival_tables", "probability_correct_tables", "multiplayer_probability_correct", "padded_coefficients"} <= set(cache_stats())
+
+
+def test_warm_caches_counts_entries_inserted(tmp_path):
+    cache = register_cache("test_warm", maxsize=3)
+    for key in range(3):
+        cache.put(key, key)
+    path = str(tmp_path / "memo_cache.pkl")
+    save_caches(path)
+
+    cache.clear()
+    cache.put(0, 0)
+    # keys 1 and 2 are new, key 0 was already cached (as is every entry saved from the other caches)
+    assert warm_caches(path) == 2
+
+    cache.clear()
+    cache.resize(1)
+    # only the most recently used saved entry survives the bound
+    assert warm_caches(path) == 1
+    assert list(cache.entries) == [2]
+
@@ -0,0 +1,27 @@
+import numpy as np
+from cfr import CFRTrainer, train_cfr
+
+
+def test_workers_match_training_the_shards_in_turn():
+    trainer = train_cfr(400, max_dice=2, seed=3, num_workers=2, iterations_per_shard=100)
+    configurations = [(player1_num_dice, player2_num_dice) for player1_num_dice in range(1, 3) for player2_num_dice in range(1, 3)]
+    shard_seeds = np.random.SeedSequence(3).spawn(4)
+    expected = CFRTrainer()
+    for first_shard in (0, 2):
+        start = {key: table.copy() for key, table in expected.regret_sums.items()}, {key: table.copy() for key, table in expected.strategy_sums.items()}
+        epoch = []
+        for shard_seed in shard_seeds[first_shard:first_shard + 2]:
+            shard_trainer = CFRTrainer()
+            for key in configurations:
+                shard_trainer.regret_sums[key], shard_trainer.strategy_sums[key] = [table.copy() for table in expected.tables(*key)]
+            shard_trainer.train(configurations, 100, np.random.default_rng(shard_seed))
+            epoch.append(shard_trainer)
+        for shard_trainer in epoch:
+            for key in configurations:
+                regret_sums, strategy_sums = expected.tables(*key)
+                regret_sums += shard_trainer.regret_sums[key] - start[0].get(key, 0)
+                strategy_sums += shard_trainer.strategy_sums[key] - start[1].get(key, 0)
+    assert trainer.num_iterations == 400
+    for key in configurations:
+        assert np.allclose(trainer.regret_sums[key], expected.regret_sums[key])
+        assert np.allclose(trainer.strategy_sums[key], expected.strategy_sums[key])
@@ -0,0 +1,35 @@
+import os
+import numpy as np
+import pytest
+from fitting import *
+
+
+human_data_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HumanData', '30OrganizedData.csv')
+
+
+def test_numerical_hessian_of_quadratic():
+    matrix = np.array([[2.0, 0.5], [0.5, 1.0]])
+    hessian = numerical_hessian(lambda x: 0.5 * x @ matrix @ x, [0.3, -0.2])
+    assert hessian == pytest.approx(matrix, abs=1e-6)
+
+
+def test_maximize_likelihood_flags_unidentified_parameters():
+    # x0 is identified, x1 is pushed onto its upper bound and x2 doesn't change the likelihood
+    params, log_likelihood, standard_errors, flags = maximize_likelihood(
+        lambda x: -(x[0] - 1) ** 2 + x[1] + 0 * x[2], ["identified", "bounded", "flat"], ["identity", "identity", "logit"],
+        [0.0, 0.0, 0.0], [(-5, 5), (-5, 5), (-10, 10)])
+    assert params["identified"] == pytest.approx(1.0, abs=1e-3)
+    assert standard_errors["identified"] == pytest.approx(np.sqrt(0.5), rel=1e-3)
+    assert flags == {"bounded": "at bound", "flat": "flat"}
+    assert np.isnan(standard_errors["bounded"])
+
+
+def test_fitted_bluff_probabilities_stay_inside_unit_interval():
+    results = fit_players(parse_game(human_data_path))
+    for result in results.values():
+        model = result.bluff_model()
+        for num_dice in range(1, MAX_DICE + 1):
+            assert 0 < model.scale * (1 / num_dice) ** model.exponent < 1
+            assert 0 < model.opponent_scale * (1 / num_dice) ** model.opponent_exponent < 1
+        assert set(result.flags.values()) <= {"at bound", "flat"}
+        assert set(result.flags) <= set(result.params)
@@ -0,0 +1,37 @@
+from agents import simulate_game
+from game_log import GameLogWriter, GameLogReader
+
+
+def history_dict(game):
+    return dict(game.game_history.items())
+
+
+def test_round_trip(tmp_path):
+    games = [simulate_game("Me", "Subject", "conditional", verbose=False) for _ in range(5)]
+    with GameLogWriter(str(tmp_path)) as game_log:
+        for game in games:
+            game_log.write(game)
+
+    reader = GameLogReader(str(tmp_path))
+    assert len(reader) == len(games)
+    for game, logged_game in zip(games, reader.games()):
+        assert (logged_game.player1_name, logged_game.player2_name) == (game.player1_name, game.player2_name)
+        assert history_dict(logged_game) == history_dict(game)
+
+
+def test_reopen_discards_unflushed_rows(tmp_path):
+    games = [simulate_game("Me", "Subject", "truthful", verbose=False) for _ in range(4)]
+    game_log = GameLogWriter(str(tmp_path))
+    game_log.write(games[0])
+    game_log.write(games[1])
+    game_log.flush()
+    # a writer that dies without closing leaves rows meta.json doesn't count
+    game_log.write(games[2])
+    for f in game_log.files.values():
+        f.flush()
+
+    with GameLogWriter(str(tmp_path)) as reopened_log:
+        reopened_log.write(games[3])
+
+    reader = GameLogReader(str(tmp_path))
+    assert [history_dict(logged_game) for logged_game in reader.games()] == [history_dict(game) for game in (games[0], games[1], games[3])]
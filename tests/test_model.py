@@ -0,0 +1,52 @@
+import itertools
+import pytest
+from model import *
+
+
+RULE_SETS = [STANDARD_RULES, WILD_ONES_RULES]
+
+
+@pytest.mark.parametrize("rules", RULE_SETS, ids=repr)
+@pytest.mark.parametrize("observer_num_dice, opponent_num_dice", [(1, 1), (2, 3), (3, 2), (4, 4)])
+def test_posterior_over_opponent_hands_sums_to_one(rules, observer_num_dice, opponent_num_dice):
+    observer = LiarsDiceHand("Observer", [observer_num_dice, 0, 0, 0, 0, 0], opponent_num_dice, rules=rules)
+    bluff_prob = observer.expected_opponent_bluff_prob()
+    opponent_hands = [LiarsDiceHand("Bidder", list_hand, observer_num_dice, rules=rules) for list_hand in all_possible_list_hands(opponent_num_dice)]
+    for bid_quantity, bid_value in itertools.product(range(1, observer_num_dice + opponent_num_dice + 1), range(1, 7)):
+        bid = Bid(bid_quantity, bid_value)
+        total = sum(observer.conditional_opponent_hand_prob(bid, opponent_hand, bluff_prob) for opponent_hand in opponent_hands)
+        assert total == pytest.approx(1.0, abs=1e-12)
+
+
+@pytest.mark.parametrize("rules", RULE_SETS, ids=repr)
+@pytest.mark.parametrize("bluff_model", [DEFAULT_BLUFF_MODEL, BluffModel(2.5, 1.0, 0.7, 0.5)], ids=repr)
+def test_conditional_surface_matches_single_bids(rules, bluff_model):
+    hand = LiarsDiceHand("Observer", [1, 0, 2, 0, 0, 1], 3, rules=rules, bluff_model=bluff_model)
+    bluff_prob = hand.expected_opponent_bluff_prob()
+    truthful, conditional = hand.compute_bid_probability_matrices(None, bluff_prob)
+    for bid_quantity, bid_value in itertools.product(range(1, 8), range(1, 7)):
+        bid = Bid(bid_quantity, bid_value)
+        assert truthful[bid_quantity - 1, bid_value - 1] == pytest.approx(hand.compute_truthful_probability_correct(bid), abs=1e-12)
+        assert conditional[bid_quantity - 1, bid_value - 1] == pytest.approx(hand.compute_conditional_probability_correct(bid, bluff_prob), abs=1e-12)
+        assert conditional[bid_quantity - 1, bid_value - 1] == pytest.approx(hand.exact_conditional_probability_correct(bid, bluff_prob), abs=1e-12)
+
+
+def test_draws_need_a_generator():
+    with pytest.raises(ValueError):
+        create_hand(3)
+    with pytest.raises(ValueError):
+        weighted_choice(["a", "b"], [1, 1])
+    with pytest.raises(ValueError):
+        select_random_dice({1: 1, 2: 0, 3: 0, 4: 0, 5: 0, 6: 1})
+    assert create_hand(3, np.random.default_rng(0)) == create_hand(3, np.random.default_rng(0))
+
+
+def test_wild_ones_tables_cover_any_bluff_model():
+    bluff_model = BluffModel(opponent_scale=0.7, opponent_exponent=0.5)
+    hand = LiarsDiceHand("Observer", [1, 0, 2, 0, 0, 1], 3, rules=WILD_ONES_RULES, bluff_model=bluff_model)
+    bluff_prob = hand.expected_opponent_bluff_prob()
+    probability = hand.compute_conditional_probability_correct(Bid(5, 4), bluff_prob)
+    assert probability == pytest.approx(hand.exact_conditional_probability_correct(Bid(5, 4), bluff_prob), abs=1e-12)
+    assert (round(WILD_ONES_RULES.match_prob(4), 12), 3, round(bluff_prob, 12)) in WILD_ONES_RULES.conditional_tables
+    # a bluff probability off by float rounding reads the same table
+    assert hand.compute_conditional_probability_correct(Bid(5, 4), bluff_prob + 1e-15) == probability
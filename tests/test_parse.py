@@ -0,0 +1,63 @@
+import csv
+import os
+import pytest
+from parse import iter_game_records, iter_games, parse_game
+
+
+human_data_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HumanData', '30OrganizedData.csv')
+
+
+def grouped_histories(file_name):
+    """
+    Reference parser grouping every row by forward filled (Game, Roll), like the original pandas groupby
+    """
+    groups = {}
+    game = roll = None
+    with open(file_name, newline='') as f:
+        for row in csv.DictReader(f):
+            game = float(row["Game"]) if row["Game"] else game
+            roll = float(row["Roll"]) if row["Roll"] else roll
+            groups.setdefault(game, {}).setdefault(roll, []).append(row)
+
+    histories = {}
+    for game, rolls in sorted(groups.items()):
+        histories[game] = {}
+        for roll, rows in sorted(rolls.items()):
+            hands = {player: [index + 1 for index, row in enumerate(rows) for _ in range(int(float(row[player] or 0)))] for player in ("Me", "Subject")}
+            actions, winner, loser = [], None, None
+            for row in rows:
+                if not row["Speaking Player"]:
+                    continue
+                bidder = row["Speaking Player"]
+                other = "Me" if bidder == "Subject" else "Subject"
+                count, value = int(float(row["Count"])), int(float(row["Dice #"]))
+                correct = hands["Me"].count(value) + hands["Subject"].count(value) >= count
+                actions.append(["Bid", bidder, count, value, correct])
+                if row["Successfull Challenge?"]:
+                    actions.append(["Challenge", other, count, value, not correct])
+                    winner, loser = (bidder, other) if correct else (other, bidder)
+            histories[game]["Round " + str(roll)] = {"Hands": hands, "Actions": actions, "Winner": winner, "Loser": loser}
+    return histories
+
+
+def test_streaming_records_match_grouped_parse():
+    assert dict(iter_game_records(human_data_path)) == grouped_histories(human_data_path)
+
+
+def test_parse_game_matches_iter_games():
+    parsed = parse_game(human_data_path)
+    streamed = list(iter_games(human_data_path))
+    assert len(parsed) == len(streamed) == 30
+    for parsed_game, streamed_game in zip(parsed, streamed):
+        assert dict(parsed_game.game_history.items()) == dict(streamed_game.game_history.items())
+
+
+def test_repeated_game_raises(tmp_path):
+    rows = ["Game,Roll,Me,Subject,Speaking Player,Count,Dice #,Successfull Challenge?",
+            "1,1,1,1,Me,1,1,", ",,,,Subject,2,1,Yes",
+            "2,1,1,1,Me,1,1,", ",,,,Subject,2,1,Yes",
+            "1,2,1,1,Me,1,1,", ",,,,Subject,2,1,Yes"]
+    path = tmp_path / "repeated.csv"
+    path.write_text("\n".join(rows) + "\n")
+    with pytest.raises(ValueError):
+        list(iter_game_records(str(path)))
@@ -0,0 +1,92 @@
+import itertools
+from math import comb, factorial
+import numpy as np
+import pytest
+from model import *
+from probability import hand_space, binomial_survival
+from belief import BeliefState
+
+
+# The kernels of the baseline model.py, inlined over dice count dictionaries so the tests don't check the new code against itself
+
+def reference_conditional_bid_prob(counts, opponent_num_dice, bid, bluff_prob):
+    """
+    Probability the bidder holding `counts` makes `bid`: every split of the missing quantity into opponent dice and bluffed dice
+    """
+    quantity_remaining = bid.bid_quantity - counts[bid.bid_value]
+    user_quantity_remaining = sum(counts.values()) - counts[bid.bid_value]
+    prob_sum = 0
+    for bluff_quantity in range(quantity_remaining + 1):
+        opponent_quantity = quantity_remaining - bluff_quantity
+        if opponent_num_dice >= opponent_quantity and user_quantity_remaining >= bluff_quantity:
+            prob_sum += (1/6) ** opponent_quantity * bluff_prob ** bluff_quantity
+    return prob_sum
+
+def reference_prob_hand(counts):
+    multinomial_coeff = factorial(sum(counts.values()))
+    for count in counts.values():
+        multinomial_coeff /= factorial(count)
+    return multinomial_coeff * (1/6) ** sum(counts.values())
+
+def reference_probability_correct(observer_counts, opponent_num_dice, bid, bluff_prob):
+    """
+    Posterior probability the bid is correct: weight every opponent hand by its prior times the probability it makes the bid
+    """
+    observer_num_dice = sum(observer_counts.values())
+    opponent_hands = [{value: hand.count(value) for value in range(1, 7)} for hand in itertools.combinations_with_replacement(range(1, 7), opponent_num_dice)]
+    weights = [reference_conditional_bid_prob(hand, observer_num_dice, bid, bluff_prob) * reference_prob_hand(hand) for hand in opponent_hands]
+    correct = [hand[bid.bid_value] + observer_counts[bid.bid_value] >= bid.bid_quantity for hand in opponent_hands]
+    return sum(weight for weight, is_correct in zip(weights, correct) if is_correct) / sum(weights)
+
+
+@pytest.mark.parametrize("num_dice", range(0, MAX_DICE + 1))
+def test_hand_space_matches_list_hands(num_dice):
+    space = hand_space(num_dice)
+    list_hands = all_possible_list_hands(num_dice)
+    assert len(space) == len(list_hands)
+    for hand_counts, prob, list_hand in zip(space.counts, space.probs, list_hands):
+        assert hand_counts.tolist() == [list_hand[value] for value in range(1, 7)]
+        assert prob == pytest.approx(reference_prob_hand(list_hand))
+    assert space.probs.sum() == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("user_num_dice, opponent_num_dice", [(1, 2), (3, 3), (5, 4)])
+def test_conditional_bid_probs_match_reference_loop(user_num_dice, opponent_num_dice):
+    space = hand_space(user_num_dice)
+    bluff_prob = (1 / user_num_dice) ** 2
+    bids = [Bid(quantity, value) for quantity in range(1, user_num_dice + opponent_num_dice + 1) for value in range(1, 7)]
+    batched = space.conditional_bid_probs([bid.bid_quantity for bid in bids], [bid.bid_value for bid in bids], opponent_num_dice, bluff_prob)
+    for row, list_hand in enumerate(all_possible_list_hands(user_num_dice)):
+        assert batched[row] == pytest.approx([reference_conditional_bid_prob(list_hand, opponent_num_dice, bid, bluff_prob) for bid in bids], abs=1e-15)
+
+
+@pytest.mark.parametrize("observer_counts, opponent_num_dice", [([1, 0, 0, 0, 0, 0], 1), ([0, 2, 0, 1, 0, 0], 3), ([1, 1, 0, 0, 2, 1], 5)])
+def test_probability_correct_matches_reference_loop(observer_counts, opponent_num_dice):
+    counts = dict(zip(range(1, 7), observer_counts))
+    observer = LiarsDiceHand("Observer", counts, opponent_num_dice)
+    bluff_prob = observer.expected_opponent_bluff_prob()
+    for bid_quantity, bid_value in itertools.product(range(1, len(observer) + opponent_num_dice + 1), range(1, 7)):
+        bid = Bid(bid_quantity, bid_value)
+        expected = reference_probability_correct(counts, opponent_num_dice, bid, bluff_prob)
+        assert observer.exact_conditional_probability_correct(bid, bluff_prob) == pytest.approx(expected, abs=1e-12)
+        assert observer.compute_conditional_probability_correct(bid, bluff_prob) == pytest.approx(expected, abs=1e-12)
+
+
+def test_binomial_survival_scalar_and_array_paths_agree():
+    for p in (1/6, 1/3):
+        for num_dice in range(0, 8):
+            array_survival = binomial_survival(np.full(num_dice + 3, num_dice), np.arange(-1, num_dice + 2), p)
+            for index, quantity in enumerate(range(-1, num_dice + 2)):
+                expected = sum(comb(num_dice, k) * p ** k * (1 - p) ** (num_dice - k) for k in range(max(quantity, 0), num_dice + 1))
+                assert binomial_survival(num_dice, quantity, p) == pytest.approx(expected, abs=1e-15)
+                assert array_survival[index] == pytest.approx(expected, abs=1e-15)
+
+
+def test_belief_after_one_bid_matches_conditional_kernel():
+    observer = LiarsDiceHand("Observer", [0, 1, 0, 2, 0, 0], 4)
+    bluff_prob = observer.expected_opponent_bluff_prob()
+    for bid_quantity, bid_value in itertools.product(range(1, 8), range(1, 7)):
+        bid = Bid(bid_quantity, bid_value)
+        belief = BeliefState(observer)
+        belief.update(bid)
+        assert belief.probability_correct(bid) == pytest.approx(observer.exact_conditional_probability_correct(bid, bluff_prob), abs=1e-12)
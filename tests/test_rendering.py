@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+from rendering import render_round_figures
+
+
+def round_figure(path, index):
+    return {"observing_probabilities": [0.5, 0.4 + 0.01 * index], "bidding_probabilities": [0.9, 0.7],
+            "bidder_label": ["Me: (1, 2, True)", "Subject: (2, 2, False)"], "observer_label": ["Subject: 0.04", "Me: 0.04"],
+            "title": f"Figure {index}", "path": path}
+
+
+def test_second_render_skips_saved_figures(tmp_path):
+    figures = [round_figure(str(tmp_path / f"figure_{index}.png"), index) for index in range(3)]
+    manifest_path = str(tmp_path / "manifest.json")
+    assert render_round_figures(figures, manifest_path, num_workers=2).wait() == 3
+    assert all(os.path.exists(figure["path"]) for figure in figures)
+    assert render_round_figures(figures, manifest_path, num_workers=2).wait() == 0
+
+    figures[1]["title"] = "Changed"
+    assert render_round_figures(figures, manifest_path, num_workers=2).wait() == 1
+
+
+def test_import_keeps_the_backend():
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import matplotlib; matplotlib.use('svg'); import rendering; assert matplotlib.get_backend() == 'svg', matplotlib.get_backend()"
+    subprocess.run([sys.executable, "-c", code], cwd=repo_root, check=True)
@@ -0,0 +1,48 @@
+import pytest
+import results_cache
+from agents import simulate_game
+from bluff import BluffModel
+from model import LiarsDiceHand
+from results_cache import ResultsCache, game_stats_key, model_fingerprint
+
+
+@pytest.fixture
+def game():
+    return simulate_game("Me", "Subject", "conditional", verbose=False, seed=0)
+
+
+def key_of(game):
+    model_fingerprint.cache.clear()
+    return game_stats_key(game, "Me", "Subject", 1, False, "conditional")
+
+
+def test_key_follows_the_game_and_parameters(game):
+    other_game = simulate_game("Me", "Subject", "conditional", verbose=False, seed=1)
+    assert key_of(game) == key_of(game)
+    assert key_of(game) != key_of(other_game)
+    assert key_of(game) != game_stats_key(game, "Me", "Subject", 1, False, "belief")
+
+
+def test_key_follows_the_model_settings(game, monkeypatch):
+    key = key_of(game)
+    monkeypatch.setattr(results_cache, "CONDITIONAL_TABLE_VERSION", results_cache.CONDITIONAL_TABLE_VERSION + 1)
+    assert key_of(game) != key
+    monkeypatch.undo()
+    assert key_of(game) == key
+
+    parameters = LiarsDiceHand.__init__.__code__.co_varnames[1:LiarsDiceHand.__init__.__code__.co_argcount]
+    defaults = dict(zip(parameters[-len(LiarsDiceHand.__init__.__defaults__):], LiarsDiceHand.__init__.__defaults__))
+    for name, value in (("bluff_model", BluffModel(scale=2.0)), ("user_challenge_threshold", 0.4)):
+        monkeypatch.setattr(LiarsDiceHand.__init__, "__defaults__", tuple(dict(defaults, **{name: value}).values()))
+        assert key_of(game) != key
+        monkeypatch.undo()
+
+
+def test_round_trip(game, tmp_path):
+    cache = ResultsCache(str(tmp_path / "cache"))
+    key = key_of(game)
+    assert cache.get(key, str(tmp_path)) is None
+    game_stats = {"challenge_probs": [0.2], "round_figures": [{"path": str(tmp_path / "round_level" / "figure.png")}]}
+    cache.put(key, game_stats, str(tmp_path))
+    assert cache.get(key, str(tmp_path)) == game_stats
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,18 @@
+import pytest
+from scipy.stats import binomtest, norm
+from tournament import wilson_interval
+
+
+@pytest.mark.parametrize("successes, trials", [(0, 10), (3, 10), (10, 10), (81, 263), (4868, 10000)])
+def test_wilson_interval_matches_scipy(successes, trials):
+    expected = binomtest(successes, trials).proportion_ci(confidence_level=0.95, method="wilson")
+    assert wilson_interval(successes, trials, z=norm.ppf(0.975)) == pytest.approx((expected.low, expected.high), abs=1e-12)
+
+
+def test_wilson_interval_edges():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    lower, upper = wilson_interval(0, 10)
+    assert lower == pytest.approx(0.0, abs=1e-15)
+    assert upper == pytest.approx(1.96 ** 2 / (10 + 1.96 ** 2))
+    # the interval of the complement mirrors it
+    assert wilson_interval(3, 10) == pytest.approx(tuple(1 - bound for bound in reversed(wilson_interval(7, 10))))
@@ -0,0 +1,23 @@
+import random
+import numpy as np
+from cfr import CFRTrainer
+from vector_sim import simulate_games
+
+
+def trained_policy(max_dice=2):
+    configurations = [(player1_num_dice, player2_num_dice) for player1_num_dice in range(1, max_dice + 1) for player2_num_dice in range(1, max_dice + 1)]
+    trainer = CFRTrainer()
+    trainer.train(configurations, 200, np.random.default_rng(0))
+    return trainer.average_policy()
+
+
+def test_seeded_games_with_unvectorized_agents_are_reproducible():
+    policy = trained_policy()
+    runs = []
+    for global_seed in (1, 2):
+        # the global `random` state must not leak into a seeded simulation
+        random.seed(global_seed)
+        simulator = simulate_games(200, policy, "heuristic", seed=7, starting_num_dice=2)
+        runs.append((simulator.winner.copy(), simulator.num_bids.copy()))
+    assert np.array_equal(runs[0][0], runs[1][0])
+    assert np.array_equal(runs[0][1], runs[1][1])
@@ -0,0 +1,227 @@
+from model import *
+from agents import simulate_game
+import math
+import multiprocessing
+import numpy as np
+
+
+def wilson_interval(successes, trials, z=1.96):
+    """
+    successes: int of number of successes
+    trials: int of number of trials
+    z: float of the normal quantile of the interval (default 1.96 for 95%)
+
+    Return tuple (lower, upper) of the Wilson score confidence interval of the success rate
+    """
+    if trials == 0:
+        return (0.0, 1.0)
+    rate = successes / trials
+    denominator = 1 + z ** 2 / trials
+    center = (rate + z ** 2 / (2 * trials)) / denominator
+    half_width = z * math.sqrt(rate * (1 - rate) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    return (center - half_width, center + half_width)
+
+
+def game_result(game, game_index):
+    """
+    game: finished LiarsDiceGame object
+    game_index: int index of the game in the tournament
+
+    Return dictionary summarizing the outcome of `game`
+    """
+    final_round = game.round_number - 1
+    return {"Game": game_index,
+            "Winner": game.game_history[final_round]["Winner"],
+            "Loser": game.game_history[final_round]["Loser"],
+            "Rounds": final_round,
+            "Remaining Dice": len(game.player1_hand_object) + len(game.player2_hand_object)}
+
+
+def game_seed(seed, game_index):
+    """
+    Return the SeedSequence of game `game_index` of the tournament seeded by `seed`. It only depends on the two numbers,
+    so a game is reproduced exactly however the tournament is sharded, and tournaments with the same seed play the same dice
+    """
+    return np.random.SeedSequence(seed, spawn_key=(game_index,))
+
+
+def play_shard(shard):
+    """
+    shard: tuple (first_game_index, num_games, seed, player1_name, player2_name, probability_method, game_kwargs_list)
+
+    Simulate games first_game_index .. first_game_index + num_games - 1 once for every keyword arguments in `game_kwargs_list`,
+    each game seeded by `game_seed`. Return the list of the games' lists of `game_result`s (one per keyword arguments).
+    Runs inside a worker process
+    """
+    first_game_index, num_games, seed, player1_name, player2_name, probability_method, game_kwargs_list = shard
+
+    results = []
+    for game_index in range(first_game_index, first_game_index + num_games):
+        game_results = []
+        for game_kwargs in game_kwargs_list:
+            game = simulate_game(player1_name, player2_name, probability_method, verbose=False, seed=game_seed(seed, game_index), **game_kwargs)
+            game_results.append(game_result(game, game_index))
+        results.append(game_results)
+    return results
+
+
+def iter_shards(num_games, player1_name, player2_name, probability_method, seed, num_workers, games_per_shard, game_kwargs_list):
+    """
+    Yield the results of every game (see `play_shard`) as soon as its shard finishes (shards finish in any order)
+    """
+    shards = []
+    for first_game_index in range(0, num_games, games_per_shard):
+        shard_num_games = min(games_per_shard, num_games - first_game_index)
+        shards.append((first_game_index, shard_num_games, seed, player1_name, player2_name, probability_method, game_kwargs_list))
+
+    # load the conditional probability table once so forked workers share it
+    get_conditional_probability_table()
+
+    with multiprocessing.Pool(num_workers) as pool:
+        for shard_results in pool.imap_unordered(play_shard, shards):
+            for game_results in shard_results:
+                yield game_results
+
+
+def iter_tournament(num_games, player1_name, player2_name, probability_method, seed=0, num_workers=None, games_per_shard=100, **game_kwargs):
+    """
+    num_games: int of number of games to simulate
+    player1_name: str of player name. This is the starting player in round 1 of every game
+    player2_name: str of player name
+    probability_method: str passed to `simulate_game`
+    seed: int of the tournament seed. Game i is seeded by `game_seed(seed, i)`, so results do not depend on `num_workers`
+    num_workers: int of number of worker processes (default os.cpu_count())
+    games_per_shard: int of number of games simulated by a worker before streaming results back
+    game_kwargs: extra keyword arguments of `simulate_game` (e.g. player1_challenge_threshold, common_random_numbers)
+
+    Yield the `game_result` of every game as soon as its shard finishes (shards finish in any order)
+    """
+    for game_results in iter_shards(num_games, player1_name, player2_name, probability_method, seed, num_workers, games_per_shard, [game_kwargs]):
+        yield game_results[0]
+
+
+class TournamentResult:
+    def __init__(self, player1_name, player2_name):
+        """
+        player1_name: str of player name
+        player2_name: str of player name
+
+        Initalize an empty tally of tournament games
+        """
+        self.player1_name = player1_name
+        self.player2_name = player2_name
+        self.num_games = 0
+        self.wins = {player1_name: 0, player2_name: 0}
+        self.total_rounds = 0
+
+    def add(self, result):
+        """
+        result: dictionary returned by `game_result`
+
+        Add one game to the tally
+        """
+        self.num_games += 1
+        self.wins[result["Winner"]] += 1
+        self.total_rounds += result["Rounds"]
+
+    def win_rate(self, player_name):
+        """
+        Return the fraction of games won by `player_name`
+        """
+        return self.wins[player_name] / self.num_games
+
+    def confidence_interval(self, player_name, z=1.96):
+        """
+        Return the Wilson confidence interval of `player_name`s win rate
+        """
+        return wilson_interval(self.wins[player_name], self.num_games, z)
+
+    def __str__(self):
+        """
+        Return a readable summary of the tournament
+        """
+        lines = [f"{self.num_games} games, {self.total_rounds / max(self.num_games, 1):.2f} rounds per game"]
+        for player_name in (self.player1_name, self.player2_name):
+            lower, upper = self.confidence_interval(player_name)
+            lines.append(f"{player_name} win rate: {self.win_rate(player_name):.4f} (95% CI {lower:.4f} - {upper:.4f})")
+        return "\n".join(lines)
+
+
+def run_tournament(num_games, player1_name, player2_name, probability_method, seed=0, num_workers=None, games_per_shard=100, **game_kwargs):
+    """
+    Simulate `num_games` games in parallel and return the aggregated TournamentResult.
+    Arguments are the same as `iter_tournament`
+    """
+    tournament_result = TournamentResult(player1_name, player2_name)
+    for result in iter_tournament(num_games, player1_name, player2_name, probability_method, seed, num_workers, games_per_shard, **game_kwargs):
+        tournament_result.add(result)
+    return tournament_result
+
+
+class PairedResult:
+    def __init__(self, player_name):
+        """
+        player_name: str of the player whose wins are compared
+
+        Initalize an empty tally of games played twice with the same seed, once per configuration
+        """
+        self.player_name = player_name
+        self.num_games = 0
+        self.baseline_wins = 0
+        self.candidate_wins = 0
+        self.sum_squared_differences = 0
+
+    def add(self, baseline_result, candidate_result):
+        """
+        baseline_result: `game_result` of the game played with the baseline configuration
+        candidate_result: `game_result` of the same game played with the candidate configuration
+        """
+        difference = (candidate_result["Winner"] == self.player_name) - (baseline_result["Winner"] == self.player_name)
+        self.num_games += 1
+        self.baseline_wins += baseline_result["Winner"] == self.player_name
+        self.candidate_wins += candidate_result["Winner"] == self.player_name
+        self.sum_squared_differences += difference ** 2
+
+    def difference(self):
+        """
+        Return the candidate's win rate minus the baseline's win rate
+        """
+        return (self.candidate_wins - self.baseline_wins) / self.num_games
+
+    def confidence_interval(self, z=1.96):
+        """
+        Return the normal confidence interval of `difference` from the variance of the paired per game differences
+        """
+        mean = self.difference()
+        variance = max(self.sum_squared_differences / self.num_games - mean ** 2, 0) * self.num_games / max(self.num_games - 1, 1)
+        half_width = z * math.sqrt(variance / self.num_games)
+        return (mean - half_width, mean + half_width)
+
+    def __str__(self):
+        """
+        Return a readable summary of the comparison
+        """
+        lower, upper = self.confidence_interval()
+        return (f"{self.num_games} paired games, {self.player_name} win rate {self.baseline_wins / self.num_games:.4f} -> {self.candidate_wins / self.num_games:.4f}, "
+                f"difference {self.difference():+.4f} (95% CI {lower:+.4f} - {upper:+.4f})")
+
+
+def run_paired_tournament(num_games, player1_name, player2_name, probability_method, baseline_kwargs, candidate_kwargs, seed=0, num_workers=None, games_per_shard=100):
+    """
+    baseline_kwargs: dictionary of keyword arguments of `simulate_game` of the baseline configuration
+    candidate_kwargs: dictionary of keyword arguments of `simulate_game` of the candidate configuration
+    Other arguments are the same as `iter_tournament`
+
+    Play every game with both configurations under common random numbers (the same seed and the same dice)
+    and return the PairedResult of player1's wins
+    """
+    game_kwargs_list = [dict(baseline_kwargs, common_random_numbers=True), dict(candidate_kwargs, common_random_numbers=True)]
+    paired_result = PairedResult(player1_name)
+    for baseline_result, candidate_result in iter_shards(num_games, player1_name, player2_name, probability_method, seed, num_workers, games_per_shard, game_kwargs_list):
+        paired_result.add(baseline_result, candidate_result)
+    return paired_result
+
+
+if __name__ == "__main__":
+    print(run_tournament(1000, "Me", "Subject", "conditional", player2_challenge_threshold=0.4))
+    print(run_paired_tournament(1000, "Me", "Subject", "conditional", {"player1_challenge_threshold": 0.51}, {"player1_challenge_threshold": 0.4}))
@@ -0,0 +1,152 @@
+from agents import DecisionBatch, HeuristicAgent, make_agent
+from bluff import DEFAULT_BLUFF_MODEL
+import time
+import numpy as np
+
+
+class VectorSimulator:
+    def __init__(self, num_games, player1_agent, player2_agent, starting_num_dice=5, player1_challenge_threshold=0.51, player2_challenge_threshold=0.51, rng=None,
+                 player1_bluff_model=DEFAULT_BLUFF_MODEL, player2_bluff_model=DEFAULT_BLUFF_MODEL):
+        """
+        num_games: int of number of games K played in lockstep
+        player1_agent: Agent of player1 (index 0), the starting player in round 1 of every game
+        player2_agent: Agent of player2 (index 1)
+        starting_num_dice: int of number of dice to start each game with for each player
+        player1_challenge_threshold: float challenge threshold of player1
+        player2_challenge_threshold: float challenge threshold of player2
+        rng: numpy Generator rolling the dice and drawing the agents' random choices
+        player1_bluff_model: BluffModel of player1 (see bluff.py)
+        player2_bluff_model: BluffModel of player2
+
+        Initalize K games held as arrays, indexed [game] or [game, player]:
+            num_dice: (K, 2) number of dice of each player
+            counts: (K, 2, 6) quantity of 1,2,..,6 in each player's hand
+            last_quantity, last_value: (K,) last bid of the current round. last_value is 0 before the opening bid
+            turn: (K,) player making the next bid
+            done: (K,) is the game over, winner: (K,) player that won (-1 while playing)
+        Each `step` makes one bid (and the challenge decision on it) in every live game, so agents decide through their batched methods
+        """
+        self.num_games = num_games
+        self.agents = (player1_agent, player2_agent)
+        self.challenge_thresholds = (player1_challenge_threshold, player2_challenge_threshold)
+        self.bluff_models = (player1_bluff_model, player2_bluff_model)
+        self.starting_num_dice = starting_num_dice
+        self.rng = np.random.default_rng() if rng is None else rng
+
+        self.num_dice = np.full((num_games, 2), starting_num_dice, dtype=np.int64)
+        self.counts = np.zeros((num_games, 2, 6), dtype=np.int8)
+        self.last_quantity = np.zeros(num_games, dtype=np.int64)
+        self.last_value = np.zeros(num_games, dtype=np.int64)
+        self.turn = np.zeros(num_games, dtype=np.int64)
+        self.done = np.zeros(num_games, dtype=bool)
+        self.winner = np.full(num_games, -1, dtype=np.int64)
+        self.num_rounds = np.zeros(num_games, dtype=np.int64)
+        self.num_bids = np.zeros(num_games, dtype=np.int64)
+
+        self.roll(np.arange(num_games))
+
+    def roll(self, games):
+        """
+        games: int array of games starting a new round
+
+        Reroll both hands of every game in `games` with one call to the RNG. Dice beyond a player's `num_dice` are masked out
+        """
+        dice = self.rng.integers(1, 7, size=(len(games), 2, self.starting_num_dice))
+        held = np.arange(self.starting_num_dice) < self.num_dice[games][:, :, np.newaxis]
+        self.counts[games] = ((dice[..., np.newaxis] == np.arange(1, 7)) & held[..., np.newaxis]).sum(axis=2)
+
+    def decide(self, games, deciding_players, batch_method):
+        """
+        games: int array of live games
+        deciding_players: int array of the deciding player in each game
+        batch_method: str, "bid_batch" or "challenge_batch"
+
+        Return list of each agent's (mask of `games` it decided, decisions) from one batched call per agent
+        """
+        decisions = []
+        for player, agent in enumerate(self.agents):
+            mask = deciding_players == player
+            if not mask.any():
+                continue
+            player_games = games[mask]
+            batch = DecisionBatch(self.counts[player_games, player], self.num_dice[player_games, 1 - player],
+                                  self.last_quantity[player_games], self.last_value[player_games], self.challenge_thresholds[player],
+                                  bluff_model=self.bluff_models[player])
+            decisions.append((mask, getattr(agent, batch_method)(batch, self.rng)))
+        return decisions
+
+    def step(self):
+        """
+        Make one bid in every live game and let the opponent decide whether to challenge it.
+        Challenged rounds are resolved with masked updates: the loser loses a die and opens the next round, and both hands are rerolled
+        (like `LiarsDiceHand.decrement_and_reroll`). Games end when a player has no dice left
+
+        Return the number of games that were live at the start of the step
+        """
+        games = np.flatnonzero(~self.done)
+        bidders = self.turn[games]
+        observers = 1 - bidders
+
+        for mask, (quantities, values) in self.decide(games, bidders, "bid_batch"):
+            self.last_quantity[games[mask]] = quantities
+            self.last_value[games[mask]] = values
+        self.num_bids[games] += 1
+
+        challenges = np.zeros(len(games), dtype=bool)
+        for mask, player_challenges in self.decide(games, observers, "challenge_batch"):
+            challenges[mask] = player_challenges
+        self.turn[games] = observers
+
+        ended = games[challenges]
+        if len(ended):
+            quantities = self.last_quantity[ended]
+            values = self.last_value[ended]
+            actual_quantity = self.counts[ended, 0, values - 1].astype(np.int64) + self.counts[ended, 1, values - 1]
+            # challenger loses if the bid is correct
+            losers = np.where(actual_quantity >= quantities, observers[challenges], bidders[challenges])
+            self.num_dice[ended, losers] -= 1
+            self.turn[ended] = losers
+            self.last_quantity[ended] = 0
+            self.last_value[ended] = 0
+            self.num_rounds[ended] += 1
+
+            finished = self.num_dice[ended, losers] == 0
+            self.done[ended[finished]] = True
+            self.winner[ended[finished]] = 1 - losers[finished]
+            self.roll(ended[~finished])
+        return len(games)
+
+    def run(self):
+        """
+        Step until every game is over. Return self
+        """
+        while not self.done.all():
+            self.step()
+        return self
+
+    def win_rate(self, player=0):
+        """
+        Return the fraction of finished games won by `player` (0 or 1)
+        """
+        return float(np.mean(self.winner[self.done] == player))
+
+
+def simulate_games(num_games, player1_agent="heuristic", player2_agent="heuristic", seed=0, **simulator_kwargs):
+    """
+    num_games: int of number of games
+    player1_agent: Agent or str name of a registered agent (made with no arguments) of player1
+    player2_agent: Agent or str name of a registered agent of player2
+    seed: int seed of the simulator's RNG
+    simulator_kwargs: extra keyword arguments of VectorSimulator (e.g. player2_challenge_threshold)
+
+    Return the finished VectorSimulator
+    """
+    agents = [make_agent(agent) if isinstance(agent, str) else agent for agent in (player1_agent, player2_agent)]
+    return VectorSimulator(num_games, *agents, rng=np.random.default_rng(seed), **simulator_kwargs).run()
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    simulator = simulate_games(100000, HeuristicAgent("conditional"), HeuristicAgent("conditional"), player2_challenge_threshold=0.4)
+    elapsed = time.perf_counter() - start
+    print(f"{simulator.num_games} games in {elapsed:.2f}s, player1 win rate {simulator.win_rate(0):.4f}, {simulator.num_rounds.mean():.2f} rounds per game")